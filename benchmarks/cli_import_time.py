@@ -0,0 +1,114 @@
+import argparse
+import subprocess
+import sys
+from typing import NamedTuple
+
+DESCRIPTION = """
+Benchmark of the startup time of the mitgcm_inputs command line interface.
+
+For each command, the script runs `python -X importtime -m mitgcm_inputs
+<command> --help` in a new interpreter (so only the modules needed to build
+the parser of the command are imported) and reads the import times written
+by the interpreter. It prints the total import time (the best of several
+runs) and the slowest top-level imports, and it exits with an error if the
+import time of a command exceeds the threshold. In this way, an expensive
+import added to the path of a cheap command can be detected before it
+slows down the launchers (which start the command line interface many
+times for each build).
+
+Usage:
+    poetry run python benchmarks/cli_import_time.py --threshold 1.0
+"""
+
+
+class ImportTime(NamedTuple):
+    module: str
+    cumulative_time: float
+
+
+def argument():
+    parser = argparse.ArgumentParser(description=DESCRIPTION)
+    parser.add_argument(
+        "--commands",
+        nargs="+",
+        default=["exf_albedo"],
+        help="The commands that must start within the threshold",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=1.0,
+        help="The maximum import time (in seconds) of each command",
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--top", type=int, default=5)
+    return parser.parse_args()
+
+
+def top_level_imports(command: str) -> list[ImportTime]:
+    """
+    Execute the command line interface with the -X importtime option and
+    return the import times of the modules imported directly by it (the
+    cumulative time of each module includes the modules that it imports).
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", "mitgcm_inputs"]
+        + [command, "--help"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    # Each line has the form "import time: self | cumulative | module",
+    # where the name of the module is indented according to its depth
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        self_time, cumulative_time, module = line[12:].split("|")
+        if not self_time.strip().isdigit() or module.startswith("  "):
+            continue
+        imports.append(
+            ImportTime(
+                module=module.strip(),
+                cumulative_time=int(cumulative_time) / 1e6,
+            )
+        )
+    return imports
+
+
+def main() -> int:
+    args = argument()
+
+    print(f"{'command':>20} {'import (s)':>11} {'slowest imports'}")
+    failed = []
+    for command in args.commands:
+        runs = [top_level_imports(command) for _ in range(args.repeat)]
+        imports = min(runs, key=lambda r: sum(i.cumulative_time for i in r))
+        total_time = sum(i.cumulative_time for i in imports)
+
+        slowest = sorted(
+            imports, key=lambda i: i.cumulative_time, reverse=True
+        )
+        print(
+            f"{command:>20} {total_time:>11.3f} "
+            + ", ".join(
+                f"{i.module} ({i.cumulative_time:.3f})"
+                for i in slowest[: args.top]
+            )
+        )
+        if total_time > args.threshold:
+            failed.append(command)
+
+    if failed:
+        print(
+            f"The import time of {', '.join(failed)} exceeds the threshold "
+            f"of {args.threshold} s",
+            file=sys.stderr,
+        )
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
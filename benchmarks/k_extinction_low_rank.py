@@ -0,0 +1,89 @@
+import argparse
+import logging
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+import numpy as np
+from synthetic_domain import build_mask
+from synthetic_domain import write_climatology
+
+from mitgcm_inputs.k_extinction.k_extinction import compute_k_extinction
+
+DESCRIPTION = """
+Benchmark of the low-rank mode (`--rank-tolerance`) of the k_extinction
+command.
+
+The script builds a synthetic climatology and a synthetic domain, computes
+the K extinction coefficients with the exact path and with the low-rank
+path for several tolerances, and prints the rank that has been used, the
+time spent and the maximum difference with respect to the exact output.
+
+Usage:
+    poetry run python benchmarks/k_extinction_low_rank.py --ny 1000 --nx 1500
+"""
+
+
+class _RankHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.message = ""
+
+    def emit(self, record):
+        self.message = record.getMessage()
+
+
+def argument():
+    parser = argparse.ArgumentParser(description=DESCRIPTION)
+    parser.add_argument("--ny", type=int, default=600)
+    parser.add_argument("--nx", type=int, default=900)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--noise", type=float, default=1e-5)
+    parser.add_argument(
+        "--tolerances",
+        type=float,
+        nargs="+",
+        default=[1e-2, 1e-3, 1e-4, 1e-6],
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = argument()
+    mask = build_mask(args.ny, args.nx)
+
+    rank_handler = _RankHandler()
+    logging.getLogger("mitgcm_inputs.k_extinction.low_rank").addHandler(
+        rank_handler
+    )
+    logging.getLogger("mitgcm_inputs.k_extinction.low_rank").setLevel(
+        logging.INFO
+    )
+
+    with TemporaryDirectory() as tmp_dir:
+        data_file = write_climatology(
+            Path(tmp_dir) / "kExt_climatology.nc",
+            n_days=args.days,
+            noise=args.noise,
+        )
+
+        start = perf_counter()
+        exact = compute_k_extinction(mask, data_file).kExt.values
+        exact_time = perf_counter() - start
+        print(f"exact: {exact_time:.2f} s")
+
+        for tolerance in args.tolerances:
+            start = perf_counter()
+            approx = compute_k_extinction(
+                mask, data_file, rank_tolerance=tolerance
+            ).kExt.values
+            elapsed = perf_counter() - start
+            error = np.nanmax(np.abs(approx - exact))
+            print(
+                f"tolerance {tolerance:.1e}: {elapsed:.2f} s, "
+                f"max error {error:.3e}; {rank_handler.message}"
+            )
+
+
+if __name__ == "__main__":
+    main()
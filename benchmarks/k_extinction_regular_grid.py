@@ -0,0 +1,99 @@
+import argparse
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+import numpy as np
+from synthetic_domain import build_mask
+from synthetic_domain import write_climatology
+
+from mitgcm_inputs.k_extinction.k_extinction import InterpolationMethod
+from mitgcm_inputs.k_extinction.k_extinction import write_k_extinction
+
+DESCRIPTION = """
+Benchmark of the bilinear (regular grid) interpolation of the k_extinction
+command against the interpolation based on the Delaunay triangulation.
+
+The synthetic climatology has roughly the size of a 1/24° grid of the
+Mediterranean Sea. For each domain size, the script writes the K
+extinction file with both methods, printing the elapsed time and the
+maximum difference between the two outputs.
+
+Usage:
+    poetry run python benchmarks/k_extinction_regular_grid.py
+"""
+
+
+def argument():
+    parser = argparse.ArgumentParser(description=DESCRIPTION)
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[300, 450, 600, 900, 1000, 2000],
+        help="A sequence of ny, nx pairs",
+    )
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--source-ny", type=int, default=380)
+    parser.add_argument("--source-nx", type=int, default=1300)
+    return parser.parse_args()
+
+
+def main():
+    args = argument()
+    sizes = list(zip(args.sizes[::2], args.sizes[1::2]))
+
+    with TemporaryDirectory() as tmp_dir:
+        tmp_dir = Path(tmp_dir)
+        data_file = write_climatology(
+            tmp_dir / "kExt_climatology.nc",
+            n_days=args.days,
+            ny=args.source_ny,
+            nx=args.source_nx,
+            lon_range=(-6.0, 36.5),
+            lat_range=(30.0, 46.0),
+        )
+
+        print(
+            f"{'domain':>12} {'delaunay (s)':>13} {'bilinear (s)':>13} "
+            f"{'speedup':>8} {'max diff':>10}"
+        )
+        for ny, nx in sizes:
+            mask = build_mask(ny, nx, lon_range=(0.0, 30.0))
+            elapsed = {}
+            outputs = {}
+            for method in (
+                InterpolationMethod.DELAUNAY,
+                InterpolationMethod.BILINEAR,
+            ):
+                output_file = tmp_dir / f"kext_{method}.bin"
+                start = perf_counter()
+                write_k_extinction(
+                    mask, output_file, data_file=data_file, method=method
+                )
+                elapsed[method] = perf_counter() - start
+                outputs[method] = np.memmap(
+                    output_file, dtype=np.float32, mode="r"
+                ).reshape(args.days, -1)
+
+            max_diff = max(
+                np.nanmax(
+                    np.abs(
+                        outputs[InterpolationMethod.DELAUNAY][d]
+                        - outputs[InterpolationMethod.BILINEAR][d]
+                    )
+                )
+                for d in range(args.days)
+            )
+            del outputs
+            delaunay_time = elapsed[InterpolationMethod.DELAUNAY]
+            bilinear_time = elapsed[InterpolationMethod.BILINEAR]
+            print(
+                f"{f'{ny}x{nx}':>12} {delaunay_time:>13.2f} "
+                f"{bilinear_time:>13.2f} "
+                f"{delaunay_time / bilinear_time:>8.2f} {max_diff:>10.2e}"
+            )
+
+
+if __name__ == "__main__":
+    main()
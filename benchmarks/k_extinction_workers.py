@@ -0,0 +1,66 @@
+import argparse
+import filecmp
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+from synthetic_domain import build_mask
+from synthetic_domain import write_climatology
+
+from mitgcm_inputs.k_extinction.k_extinction import write_k_extinction
+
+DESCRIPTION = """
+Scaling benchmark of the `--workers` option of the k_extinction command.
+
+The script builds a synthetic climatology and a synthetic domain, writes
+the K extinction file with an increasing number of workers, checks that
+all the files are identical to the serial one and prints the speedup.
+
+Usage:
+    poetry run python benchmarks/k_extinction_workers.py --ny 1000 --nx 1500
+"""
+
+
+def argument():
+    parser = argparse.ArgumentParser(description=DESCRIPTION)
+    parser.add_argument("--ny", type=int, default=600)
+    parser.add_argument("--nx", type=int, default=900)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument(
+        "--workers", type=int, nargs="+", default=[1, 2, 4, 8, 16]
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = argument()
+    mask = build_mask(args.ny, args.nx)
+
+    with TemporaryDirectory() as tmp_dir:
+        tmp_dir = Path(tmp_dir)
+        data_file = write_climatology(
+            tmp_dir / "kExt_climatology.nc", n_days=args.days
+        )
+
+        reference = None
+        reference_time = None
+        print(f"{'workers':>8} {'time (s)':>10} {'speedup':>8} {'identical'}")
+        for n_workers in args.workers:
+            output_file = tmp_dir / f"kext_{n_workers}.bin"
+            start = perf_counter()
+            write_k_extinction(
+                mask, output_file, data_file=data_file, workers=n_workers
+            )
+            elapsed = perf_counter() - start
+
+            if reference is None:
+                reference, reference_time = output_file, elapsed
+            identical = filecmp.cmp(reference, output_file, shallow=False)
+            print(
+                f"{n_workers:>8} {elapsed:>10.2f} "
+                f"{reference_time / elapsed:>8.2f} {identical}"
+            )
+
+
+if __name__ == "__main__":
+    main()
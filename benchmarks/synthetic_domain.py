@@ -0,0 +1,70 @@
+# Helpers that build synthetic inputs for the benchmarks of this directory.
+#
+# The synthetic climatology mimics the structure of `kExt_climatology.nc`
+# (a `kExt` variable with a value for each day and 2D `longitude` and
+# `latitude` coordinates, with NaN on the land cells), while the synthetic
+# meshmask is a regular grid that covers a box inside the climatology.
+from pathlib import Path
+
+import numpy as np
+import xarray as xr
+from bitsea.commons.grid import RegularGrid
+from bitsea.commons.mask import Mask
+
+
+def write_climatology(
+    output_file: Path,
+    n_days: int = 365,
+    ny: int = 200,
+    nx: int = 400,
+    lon_range: tuple[float, float] = (10.0, 20.0),
+    lat_range: tuple[float, float] = (36.0, 46.0),
+    seed: int = 0,
+    noise: float = 0.001,
+) -> Path:
+    rng = np.random.default_rng(seed)
+    lon = np.linspace(*lon_range, nx)
+    lat = np.linspace(*lat_range, ny)
+    lon_2d, lat_2d = np.meshgrid(lon, lat)
+
+    # A smooth seasonal signal plus some noise
+    days = np.arange(1, n_days + 1)
+    seasonal = 0.05 * np.cos(2 * np.pi * days / 365.0)
+    space = 0.1 + 0.02 * np.sin(lon_2d) * np.cos(lat_2d)
+    kext = seasonal[:, None, None] + space[None, :, :]
+    kext += noise * rng.standard_normal(kext.shape)
+    kext = kext.astype(np.float32)
+
+    # A round island in the middle of the domain
+    land = (lon_2d - lon.mean()) ** 2 + (lat_2d - lat.mean()) ** 2 < 1.0
+    kext[:, land] = np.nan
+
+    xr.Dataset(
+        data_vars={"kExt": (("day", "y", "x"), kext)},
+        coords={
+            "longitude": (("y", "x"), lon_2d),
+            "latitude": (("y", "x"), lat_2d),
+        },
+    ).to_netcdf(output_file)
+    return output_file
+
+
+def build_mask(
+    ny: int,
+    nx: int,
+    lon_range: tuple[float, float] = (12.0, 18.0),
+    lat_range: tuple[float, float] = (38.0, 44.0),
+    n_levels: int = 5,
+) -> Mask:
+    lon = np.linspace(*lon_range, nx)
+    lat = np.linspace(*lat_range, ny)
+    grid = RegularGrid(lat=lat, lon=lon)
+
+    lon_2d, lat_2d = np.meshgrid(lon, lat)
+    depth = np.linspace(5.0, 200.0, n_levels)
+    bathymetry = 150.0 * (1.0 + np.sin(lon_2d * 3.0) * np.cos(lat_2d * 2.0))
+    tmask = depth[:, None, None] <= bathymetry[None, :, :]
+    e3t = np.broadcast_to(
+        np.gradient(depth)[:, None, None], tmask.shape
+    ).copy()
+    return Mask(grid, depth, tmask, e3t=e3t)
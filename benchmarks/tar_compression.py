@@ -0,0 +1,128 @@
+import argparse
+import tarfile
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+import numpy as np
+
+from mitgcm_inputs.tools.async_writer import iter_blocks
+from mitgcm_inputs.tools.tar_utils import add_stream_member
+from mitgcm_inputs.tools.tar_utils import open_tar_writer
+from mitgcm_inputs.tools.tar_utils import StreamMember
+
+DESCRIPTION = """
+Benchmark of the parallel gzip compression of the tar archives against the
+single-threaded "w:gz" mode of `tarfile`.
+
+The archive contains some members that mimic the outputs of the FLUXES
+command: daily fields of float32 values that are constant on most of the
+cells (like the bottom fluxes) and smooth fields with some noise (like the
+K extinction coefficients). For each number of threads, the script writes
+the archive, prints the elapsed time, the throughput and the size of the
+archive, and checks that `tarfile` reads back the same content.
+
+Usage:
+    poetry run python benchmarks/tar_compression.py
+"""
+
+
+def argument():
+    parser = argparse.ArgumentParser(description=DESCRIPTION)
+    parser.add_argument("--ny", type=int, default=400)
+    parser.add_argument("--nx", type=int, default=600)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--level", type=int, default=9)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8])
+    return parser.parse_args()
+
+
+def build_members(ny: int, nx: int, n_days: int) -> dict[str, np.ndarray]:
+    rng = np.random.default_rng(0)
+    days = np.arange(n_days)[:, None, None]
+
+    # Not zero only on a small part of the domain
+    sparse = np.zeros((1, ny, nx), dtype=np.float32)
+    sparse[:, : ny // 10, : nx // 10] = rng.random((ny // 10, nx // 10))
+    seasonal = 1.0 + 0.5 * np.cos(2 * np.pi * days / 365.0)
+
+    lat, lon = np.meshgrid(np.linspace(0, 1, ny), np.linspace(0, 1, nx))
+    smooth = (0.1 + 0.02 * np.sin(5 * lon) * np.cos(3 * lat)).T
+    noisy = smooth[None] * seasonal + 0.001 * rng.standard_normal(
+        (n_days, ny, nx)
+    )
+    return {
+        "sparse.bin": (sparse * seasonal).astype(np.float32),
+        "noisy.bin": noisy.astype(np.float32),
+    }
+
+
+def tarfile_archive(members: dict[str, np.ndarray], output_file: Path):
+    with tarfile.open(output_file, "w:gz") as tar:
+        for name, values in members.items():
+            add_stream_member(
+                tar, StreamMember(name, values.nbytes, iter_blocks(values))
+            )
+
+
+def parallel_archive(
+    members: dict[str, np.ndarray],
+    output_file: Path,
+    level: int,
+    threads: int,
+):
+    with open_tar_writer(output_file, level, workers=threads) as tar:
+        for name, values in members.items():
+            add_stream_member(
+                tar, StreamMember(name, values.nbytes, iter_blocks(values))
+            )
+
+
+def check_archive(members: dict[str, np.ndarray], archive: Path):
+    with tarfile.open(archive, "r:gz") as tar:
+        for name, values in members.items():
+            content = tar.extractfile(name).read()
+            if content != values.tobytes():
+                raise ValueError(f"Member {name} of {archive} is corrupted")
+
+
+def main():
+    args = argument()
+    members = build_members(args.ny, args.nx, args.days)
+    total_mb = sum(v.nbytes for v in members.values()) / 1024**2
+    print(f"Archive of {total_mb:.1f} MB, compression level {args.level}")
+
+    with TemporaryDirectory() as tmp_dir:
+        tmp_dir = Path(tmp_dir)
+        print(
+            f"{'writer':>16} {'time (s)':>9} {'MB/s':>8} {'size (MB)':>10} "
+            f"{'speedup':>8}"
+        )
+
+        output_file = tmp_dir / "reference.tar.gz"
+        start = perf_counter()
+        tarfile_archive(members, output_file)
+        reference_time = perf_counter() - start
+        check_archive(members, output_file)
+        print(
+            f"{'tarfile w:gz':>16} {reference_time:>9.2f} "
+            f"{total_mb / reference_time:>8.1f} "
+            f"{output_file.stat().st_size / 1024**2:>10.1f} {1.0:>8.2f}"
+        )
+
+        for threads in args.threads:
+            output_file = tmp_dir / f"parallel_{threads}.tar.gz"
+            start = perf_counter()
+            parallel_archive(members, output_file, args.level, threads)
+            elapsed = perf_counter() - start
+            check_archive(members, output_file)
+            print(
+                f"{f'parallel x{threads}':>16} {elapsed:>9.2f} "
+                f"{total_mb / elapsed:>8.1f} "
+                f"{output_file.stat().st_size / 1024**2:>10.1f} "
+                f"{reference_time / elapsed:>8.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
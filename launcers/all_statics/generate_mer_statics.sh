@@ -12,11 +12,12 @@ DOMAINS_HR="HGT GOR CON PES LAM PAN NAP GAE FOL CAG ISO"
 
 DOMAINS="$DOMAINS_REG $DOMAINS_HR"
 
-MAXJOBS=5   # numero massimo di domini processati in parallelo
+MAXJOBS=5   # numero massimo di domini processati in parallelo da bathytools
+MEMORY_BUDGET="64G"   # memoria totale usata dai domini processati in parallelo
 
 mkdir -p "${OUTPUTDIR}"
 
-process_domain () {
+run_bathytools () {
     set -e
     domain=$1
 
@@ -28,13 +29,6 @@ process_domain () {
     echo "----------^^^-----------  DOMAIN ${domain}  ----------^^^-----------"
     echo
 
-    # Setta SPONGE
-    if [[ " $DOMAINS_HR " =~ " $domain " ]]; then
-        SPONGE=10
-    else
-        SPONGE=16
-    fi
-
     cd "$BATHYTOOLSDIR"
 
     domain_descriptor="$BATHYTOOLSDIR/mer_domains/${domain,,}.yaml"
@@ -43,59 +37,32 @@ process_domain () {
     fi
 
     poetry run bathytools -c "${domain_descriptor}" -o "${domaindir}" --mer
-
-    cd "$MITGCMINPUTSDIR"
-
-    poetry run mitgcm_inputs FLUXES \
-        -m "${domaindir}/meshmask.nc" \
-        -o "${domaindir}/fluxes.tar.gz"
-
-    rpositions="${domaindir}/rivers_positions.json"
-    rcustom="${BATHYTOOLSDIR}/mer_domains/rivers/${domain}.json"
-
-    rbcs_options=""
-    ob_indices_options=""
-
-    if [ -f "$rpositions" ]; then
-        rbcs_options="-p $rpositions -r $BATHYTOOLSDIR/mer_domains/rivers/main.json"
-        ob_indices_options="-p $rpositions -r ${domaindir}/additional_variables.nc"
-
-        if [ -f "${rcustom}" ]; then
-            rbcs_options="${rbcs_options} -d ${rcustom}"
-        fi
-
-        # If there are rivers we also build the cosmetic mask
-        poetry run mitgcm_inputs cosmetic_mask -m "${domaindir}/meshmask.nc" \
-            -r "${domaindir}/additional_variables.nc" \
-            -o "${domaindir}/cmeshmask.nc" --mer
-    else
-        # No rivers? Then the cosmetic mask is equal to the original mask
-        cp -av "${domaindir}/meshmask.nc" "${domaindir}/cmeshmask.nc"
-    fi
-
-    poetry run mitgcm_inputs ob_indices \
-        -m "${domaindir}/meshmask.nc" \
-        -s "$SPONGE" \
-        -o "${domaindir}/rivers_open_boundaries.txt" \
-        -n "${domaindir}/nudging_indices.txt" \
-        ${ob_indices_options}
-
-    poetry run mitgcm_inputs rbcs \
-        -m "${domaindir}/meshmask.nc" \
-        -o "${domaindir}" \
-        ${rbcs_options}
-
 }
 
-export -f process_domain
-export OUTPUTDIR BATHYTOOLSDIR MITGCMINPUTSDIR DOMAINS_HR
+export -f run_bathytools
+export OUTPUTDIR BATHYTOOLSDIR
 
 if command -v parallel >/dev/null 2>&1; then
-    parallel --lb --tag --halt soon,fail=1 -j ${MAXJOBS} process_domain ::: ${DOMAINS}
+    parallel --lb --tag --halt soon,fail=1 -j ${MAXJOBS} run_bathytools ::: ${DOMAINS}
 else
     echo "GNU parallel not found, falling back to serial execution." >&2
     for domain in $DOMAINS
     do
-        process_domain "$domain"
+        run_bathytools "$domain"
     done
 fi
+
+# FLUXES, cosmetic_mask (or a copy of the meshmask if there are no rivers),
+# ob_indices and rbcs for all the domains; the domains are scheduled so that
+# the ones processed at the same time fit inside MEMORY_BUDGET. The
+# generators whose inputs have not changed since the previous run are
+# restored from the build cache
+cd "$MITGCMINPUTSDIR"
+
+poetry run mitgcm_inputs --build-cache batch ${DOMAINS} \
+    -i "${OUTPUTDIR}" \
+    -r "${BATHYTOOLSDIR}/mer_domains/rivers" \
+    -s 16 \
+    --high-resolution-domains ${DOMAINS_HR} \
+    --high-resolution-sponge-extent 10 \
+    --memory-budget "${MEMORY_BUDGET}"
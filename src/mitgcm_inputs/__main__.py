@@ -1,37 +1,16 @@
 import argparse
 import logging
-import tarfile
-from os import fspath
+import sys
+from importlib import import_module
 from pathlib import Path
-from sys import exit as sys_exit
-from tempfile import TemporaryDirectory
 from time import localtime
-from time import time
-
-from bitsea.utilities.argparse_types import existing_file_path
-from bitsea.utilities.argparse_types import path_inside_an_existing_dir
-
-from mitgcm_inputs.bottom_fluxes import COMMAND_NAME as BFLUX_COMMAND_NAME
-from mitgcm_inputs.bottom_fluxes import main as bflux_main
-from mitgcm_inputs.bottom_fluxes import sub_arguments as bflux_sub_arguments
-from mitgcm_inputs.cosmetic_mask import COMMAND_NAME as CMASK_COMMAND_NAME
-from mitgcm_inputs.cosmetic_mask import main as cosmetic_mask_main
-from mitgcm_inputs.cosmetic_mask import sub_arguments as cmask_sub_arguments
-from mitgcm_inputs.exf_albedo import COMMAND_NAME as EXF_ALBEDO_COMMAND_NAME
-from mitgcm_inputs.exf_albedo import main as exf_albedo_main
-from mitgcm_inputs.exf_albedo import sub_arguments as exf_albedo_sub_arguments
-from mitgcm_inputs.k_extinction import COMMAND_NAME as KEXT_COMMAND_NAME
-from mitgcm_inputs.k_extinction import main as kext_main
-from mitgcm_inputs.k_extinction import sub_arguments as kext_sub_arguments
-from mitgcm_inputs.ob_indices import COMMAND_NAME as OB_INDICES_COMMAND_NAME
-from mitgcm_inputs.ob_indices import main as ob_indices_main
-from mitgcm_inputs.ob_indices import sub_arguments as ob_indices_sub_arguments
-from mitgcm_inputs.rbcs import COMMAND_NAME as RBCS_COMMAND_NAME
-from mitgcm_inputs.rbcs import main as rbcs_main
-from mitgcm_inputs.rbcs import sub_arguments as rbcs_sub_arguments
-from mitgcm_inputs.surface_deposition import COMMAND_NAME as SD_COMMAND_NAME
-from mitgcm_inputs.surface_deposition import main as sd_main
-from mitgcm_inputs.surface_deposition import sub_arguments as sd_sub_arguments
+from types import ModuleType
+
+from mitgcm_inputs.commands import COMMAND_MAP
+from mitgcm_inputs.commands import COMMANDS
+from mitgcm_inputs.tools.build_cache import BuildCache
+from mitgcm_inputs.tools.build_cache import default_build_cache_dir
+from mitgcm_inputs.tools.build_cache import run_cached
 
 if __name__ == "__main__" or __name__ == "mitgcm_inputs.__main__":
     LOGGER = logging.getLogger()
@@ -65,153 +44,125 @@ def configure_logger():
     LOGGER.addHandler(handler)
 
 
+def load_command(command_name: str) -> ModuleType:
+    """
+    Import the module that implements a subcommand.
+    """
+    module = import_module(COMMAND_MAP[command_name].module)
+    if module.COMMAND_NAME != command_name:
+        raise ValueError(
+            f"Module {module.__name__} implements command "
+            f"{module.COMMAND_NAME} instead of {command_name}"
+        )
+    return module
+
+
+def main_parser(add_help: bool = True) -> argparse.ArgumentParser:
+    """
+    Return a parser with the options that are shared by all the subcommands
+    """
+    parser = argparse.ArgumentParser(
+        description="Generate MITgcm input files", add_help=add_help
+    )
+    parser.add_argument(
+        "--build-cache",
+        action="store_true",
+        help="""
+        Restore the outputs of the command from the build cache if the
+        command has already been executed with the same inputs (the same
+        arguments and the same content of the input files); otherwise,
+        execute the command and save its outputs inside the cache. The
+        outputs of rbcs are also keyed on the dataset and on the period of
+        the salinity that it downloads; domain and batch restore each
+        generator (FLUXES, cosmetic_mask, ob_indices, rbcs) on its own.
+        bottom_fluxes_budget, which does not write any file, does not use
+        the cache
+        """,
+    )
+    parser.add_argument(
+        "--build-cache-dir",
+        type=Path,
+        default=default_build_cache_dir(),
+        help="The directory of the build cache. Default: %(default)s",
+    )
+    return parser
+
+
+def requested_command(sys_argv: list[str]) -> str | None:
+    """
+    Return the name of the subcommand invoked by the command line, without
+    parsing its arguments; None if the command line does not contain a
+    valid subcommand
+    """
+    parser = main_parser(add_help=False)
+    parser.add_argument("cmd", nargs="?")
+    args, _ = parser.parse_known_args(sys_argv)
+    if args.cmd not in COMMAND_MAP:
+        return None
+    return args.cmd
+
+
 def argument(sys_argv=None):
     """
     Generate a subparser for each type of file that can be produced by this
-    script and delegate the task of configuring the subparser to the
-    corresponding implementation
+    script. Only the subparser of the invoked subcommand is configured by
+    its implementation; the other ones are created from the descriptions in
+    `COMMANDS`, so that their modules are not imported
     """
-    parser = argparse.ArgumentParser(description="Generate MITgcm input files")
+    if sys_argv is None:
+        sys_argv = sys.argv[1:]
+
+    parser = main_parser()
     subparsers = parser.add_subparsers(
         title="static_type",
         dest="cmd",
         required=True,
     )
 
-    kext_sub_arguments(subparsers)
-    sd_sub_arguments(subparsers)
-    bflux_sub_arguments(subparsers)
-    rbcs_sub_arguments(subparsers)
-    ob_indices_sub_arguments(subparsers)
-    cmask_sub_arguments(subparsers)
-    exf_albedo_sub_arguments(subparsers)
-
-    subparser = subparsers.add_parser(
-        "FLUXES",
-        help=f"Execute {BFLUX_COMMAND_NAME}, {KEXT_COMMAND_NAME} and "
-        f"{SD_COMMAND_NAME} and save the output in a single tar.gz file",
-    )
-    subparser.add_argument(
-        "-m",
-        "--mask",
-        required=True,
-        type=existing_file_path,
-        help="The meshmask file that defines the domain",
-    )
-
-    subparser.add_argument(
-        "-o",
-        "--output",
-        required=True,
-        type=path_inside_an_existing_dir,
-        help="""
-        Path of the compressed tar.gz file that will store all the output
-        files
-        """,
-    )
+    invoked_command = requested_command(sys_argv)
+    for command in COMMANDS:
+        if command.name == invoked_command:
+            load_command(command.name).sub_arguments(subparsers)
+        else:
+            subparsers.add_parser(command.name, help=command.help)
 
-    if sys_argv is not None:
-        return parser.parse_args(sys_argv)
-    else:
-        return parser.parse_args()
-
-
-def execute_flux_commands(args: argparse.Namespace):
-    mask_path = args.mask
-    output_file = args.output
-
-    with TemporaryDirectory() as tmp_dir:
-        tmp_dir_path = Path(tmp_dir)
-
-        command_args = {
-            BFLUX_COMMAND_NAME: [
-                BFLUX_COMMAND_NAME,
-                "-m",
-                fspath(mask_path),
-                "-o",
-                fspath(tmp_dir_path),
-            ],
-            SD_COMMAND_NAME: [
-                SD_COMMAND_NAME,
-                "-m",
-                fspath(mask_path),
-                "-o",
-                fspath(tmp_dir_path),
-            ],
-            KEXT_COMMAND_NAME: [
-                KEXT_COMMAND_NAME,
-                "-m",
-                fspath(mask_path),
-                "-o",
-                fspath(tmp_dir_path / "Kext.bin"),
-            ],
-        }
-
-        for command_name, current_args in command_args.items():
-            command = CMD_MAP[command_name]
-            LOGGER.info("Executing %s", command_name)
-            LOGGER.debug(
-                "Executing %s with the following args: %s",
-                command_name,
-                current_args,
-            )
-            command(argument(current_args))
-
-        output_stem = output_file.stem
-        if output_stem.lower().endswith(".tar"):
-            output_stem = Path(output_stem).stem
-
-        LOGGER.info("Compressing data into file %s", output_file)
-        with tarfile.open(output_file, "w:gz") as tar:
-            for file_path in tmp_dir_path.iterdir():
-                tar_relative_path = Path(output_stem) / file_path.name
-                tar.add(
-                    file_path,
-                    arcname=tar_relative_path,
-                )
-
-            # Get one random file inside the tar
-            reference_file = next(iter(tar.getmembers()))
-
-            # Add the directory where the files are stored as a tar object
-            # (otherwise MER produces an error)
-            data_dir = tarfile.TarInfo(name=output_stem)
-            data_dir.type = tarfile.DIRTYPE
-            data_dir.mtime = int(time())
-            data_dir.uid = reference_file.uid
-            data_dir.gid = reference_file.gid
-            data_dir.uname = reference_file.uname
-            data_dir.gname = reference_file.gname
-            data_dir.mode = 0o755
-
-            tar.addfile(data_dir)
-
-        LOGGER.info("Everything done!")
-    return 0
-
-
-CMD_MAP = {
-    BFLUX_COMMAND_NAME: bflux_main,
-    CMASK_COMMAND_NAME: cosmetic_mask_main,
-    SD_COMMAND_NAME: sd_main,
-    KEXT_COMMAND_NAME: kext_main,
-    RBCS_COMMAND_NAME: rbcs_main,
-    OB_INDICES_COMMAND_NAME: ob_indices_main,
-    EXF_ALBEDO_COMMAND_NAME: exf_albedo_main,
-    "FLUXES": execute_flux_commands,
-}
+    return parser.parse_args(sys_argv)
 
 
 def main() -> int:
     args = argument()
     configure_logger()
 
-    def unknown_command(_args: argparse.Namespace):
-        LOGGER.error("Invalid command name: %s", _args.cmd)
+    if args.cmd not in COMMAND_MAP:
+        LOGGER.error("Invalid command name: %s", args.cmd)
         return 1
 
-    return CMD_MAP.get(args.cmd, unknown_command)(args)
+    command_module = load_command(args.cmd)
+
+    # How the outputs of the command depend on its arguments (see
+    # `run_cached`); it is not defined by the commands that can not be
+    # restored from the build cache and by the ones that restore each of
+    # their generators on their own
+    cache_spec = getattr(command_module, "CACHE_SPEC", None)
+    caches_its_generators = getattr(
+        command_module, "CACHES_ITS_GENERATORS", False
+    )
+    if args.build_cache and cache_spec is None and not caches_its_generators:
+        LOGGER.warning(
+            "Command %s does not use the build cache; it is executed "
+            "normally",
+            args.cmd,
+        )
+    elif args.build_cache and cache_spec is not None:
+        return run_cached(
+            BuildCache(args.build_cache_dir),
+            args.cmd,
+            cache_spec,
+            args,
+            command_module.main,
+        )
+    return command_module.main(args)
 
 
 if __name__ == "__main__":
-    sys_exit(main())
+    sys.exit(main())
@@ -0,0 +1,269 @@
+import argparse
+import logging
+import os
+import re
+
+from bitsea.utilities.argparse_types import existing_dir_path
+from bitsea.utilities.argparse_types import existing_file_path
+
+from mitgcm_inputs.batch.scheduler import available_memory
+from mitgcm_inputs.batch.scheduler import BatchDomain
+from mitgcm_inputs.batch.scheduler import estimate_peak_memory
+from mitgcm_inputs.batch.scheduler import run_batch
+from mitgcm_inputs.commands import COMMAND_MAP
+from mitgcm_inputs.domain.pipeline import DomainInputs
+from mitgcm_inputs.rbcs import DEFAULT_SEWAGE_FILE
+from mitgcm_inputs.tools.tar_utils import DEFAULT_COMPRESSION_LEVEL
+
+if __name__ == "__main__":
+    LOGGER = logging.getLogger()
+else:
+    LOGGER = logging.getLogger(__name__)
+
+
+COMMAND_NAME = "batch"
+
+# Like domain, this command has no CACHE_SPEC: with --build-cache, each
+# generator of each domain is restored from the build cache on its own
+CACHES_ITS_GENERATORS = True
+
+# The names of the input files inside the directory of each domain (the
+# names of the files written by bathytools)
+MESHMASK_FILE_NAME = "meshmask.nc"
+RIVERS_POSITIONS_FILE_NAME = "rivers_positions.json"
+RIVER_FILE_NAME = "additional_variables.nc"
+
+# The name of the main configuration file inside the rivers directory; the
+# configuration specific to a domain is named after the domain
+MAIN_RIVER_CONFIG_NAME = "main.json"
+
+MEMORY_UNITS = {"": 1, "K": 1024, "M": 1024**2, "G": 1024**3, "T": 1024**4}
+
+
+def memory_size(value: str) -> int:
+    """
+    Parse a memory size like "512M", "32G" or "1.5T" (a plain number is a
+    number of bytes).
+    """
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([KMGT]?)i?B?\s*", value, re.I)
+    if match is None:
+        raise argparse.ArgumentTypeError(f"Invalid memory size: {value}")
+    number, unit = match.groups()
+    return int(float(number) * MEMORY_UNITS[unit.upper()])
+
+
+def sub_arguments(subparser):
+    parser = subparser.add_parser(
+        COMMAND_NAME, help=COMMAND_MAP[COMMAND_NAME].help
+    )
+
+    parser.add_argument(
+        "domains",
+        nargs="+",
+        help="The names of the domains that must be processed",
+    )
+
+    parser.add_argument(
+        "-i",
+        "--input-root",
+        required=True,
+        type=existing_dir_path,
+        help=f"""
+        The directory that contains a subdirectory for each domain, with the
+        files produced by bathytools ({MESHMASK_FILE_NAME} and, if there are
+        rivers, {RIVERS_POSITIONS_FILE_NAME} and {RIVER_FILE_NAME})
+        """,
+    )
+
+    parser.add_argument(
+        "-o",
+        "--output-root",
+        required=False,
+        type=existing_dir_path,
+        default=None,
+        help="""
+        The directory where a subdirectory for the output files of each
+        domain is created. By default, the outputs are written in the
+        directories of the inputs
+        """,
+    )
+
+    parser.add_argument(
+        "-r",
+        "--rivers-dir",
+        required=False,
+        type=existing_dir_path,
+        default=None,
+        help=f"""
+        The directory with the configuration of the rivers: the main
+        configuration ({MAIN_RIVER_CONFIG_NAME}) and, optionally, a further
+        configuration for each domain (named after the domain, e.g.
+        NAD.json). It is mandatory if some domain has rivers
+        """,
+    )
+
+    parser.add_argument(
+        "-s",
+        "--sponge-extent",
+        required=False,
+        type=int,
+        default=16,
+        help="The extent of the sponge layer in number of cells",
+    )
+
+    parser.add_argument(
+        "--high-resolution-domains",
+        required=False,
+        nargs="+",
+        default=[],
+        help="The domains that use --high-resolution-sponge-extent",
+    )
+
+    parser.add_argument(
+        "--high-resolution-sponge-extent",
+        required=False,
+        type=int,
+        default=10,
+        help="The extent of the sponge layer of the high resolution domains",
+    )
+
+    parser.add_argument(
+        "--sewage",
+        required=False,
+        type=existing_file_path,
+        default=DEFAULT_SEWAGE_FILE,
+        help="The xlsx file with the sewage locations",
+    )
+
+    parser.add_argument(
+        "-M",
+        "--memory-budget",
+        required=False,
+        type=memory_size,
+        default=None,
+        help="""
+        The memory that can be used by all the domains processed at the same
+        time (e.g., 64G). Default: 80%% of the physical memory
+        """,
+    )
+
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        required=False,
+        type=int,
+        default=os.cpu_count() or 1,
+        help="The maximum number of domains processed at the same time",
+    )
+
+    parser.add_argument(
+        "--jobs-per-domain",
+        required=False,
+        type=int,
+        default=4,
+        help="""
+        The maximum number of generators executed at the same time for each
+        domain
+        """,
+    )
+
+    parser.add_argument(
+        "--compression-level",
+        required=False,
+        type=int,
+        choices=range(10),
+        metavar="{0..9}",
+        default=DEFAULT_COMPRESSION_LEVEL,
+        help="The gzip compression level of the output archives",
+    )
+
+    parser.add_argument(
+        "--no-compression",
+        action="store_true",
+        help="Write plain (uncompressed) tar files",
+    )
+
+
+def main(args: argparse.Namespace) -> int:
+    if args.cmd != COMMAND_NAME:
+        LOGGER.error(
+            "%s command has been invoked with command: %s",
+            COMMAND_NAME,
+            args.cmd,
+        )
+        return 1
+
+    if args.jobs < 1 or args.jobs_per_domain < 1:
+        LOGGER.error("The number of jobs must be positive")
+        return 2
+
+    if len(set(args.domains)) != len(args.domains):
+        LOGGER.error("Some domains have been submitted more than once")
+        return 2
+
+    memory_budget = args.memory_budget
+    if memory_budget is None:
+        memory_budget = int(0.8 * available_memory())
+
+    output_root = args.output_root
+    if output_root is None:
+        output_root = args.input_root
+
+    domains = []
+    for domain_name in args.domains:
+        domain_dir = args.input_root / domain_name
+        mask_file = domain_dir / MESHMASK_FILE_NAME
+        if not mask_file.is_file():
+            LOGGER.error("File %s does not exist", mask_file)
+            return 2
+
+        if domain_name in args.high_resolution_domains:
+            sponge_extent = args.high_resolution_sponge_extent
+        else:
+            sponge_extent = args.sponge_extent
+
+        river_options = {}
+        rivers_positions = domain_dir / RIVERS_POSITIONS_FILE_NAME
+        if rivers_positions.is_file():
+            if args.rivers_dir is None:
+                LOGGER.error(
+                    "Domain %s has rivers, but no rivers directory has been "
+                    "provided",
+                    domain_name,
+                )
+                return 2
+            river_domain_file = args.rivers_dir / f"{domain_name}.json"
+            river_options = {
+                "rivers_positions": rivers_positions,
+                "river_file": domain_dir / RIVER_FILE_NAME,
+                "river_config": args.rivers_dir / MAIN_RIVER_CONFIG_NAME,
+                "river_domain_file": (
+                    river_domain_file if river_domain_file.is_file() else None
+                ),
+            }
+
+        inputs = DomainInputs(
+            mask=mask_file,
+            output_dir=output_root / domain_name,
+            sewage_file=args.sewage,
+            sponge_extent=sponge_extent,
+            compression_level=args.compression_level,
+            compress=not args.no_compression,
+            **river_options,
+        )
+        domains.append(
+            BatchDomain(
+                name=domain_name,
+                inputs=inputs,
+                memory_estimate=estimate_peak_memory(mask_file),
+            )
+        )
+
+    success = run_batch(
+        domains,
+        memory_budget=memory_budget,
+        max_workers=args.jobs,
+        jobs_per_domain=args.jobs_per_domain,
+        build_cache_dir=args.build_cache_dir if args.build_cache else None,
+    )
+    return 0 if success else 3
@@ -0,0 +1,309 @@
+import logging
+import multiprocessing
+import os
+import resource
+from collections.abc import Sequence
+from concurrent.futures import FIRST_COMPLETED
+from concurrent.futures import Future
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import wait
+from logging.handlers import QueueHandler
+from logging.handlers import QueueListener
+from pathlib import Path
+from time import localtime
+from time import perf_counter
+from typing import NamedTuple
+
+import xarray as xr
+
+from mitgcm_inputs.domain import COMMAND_NAME as DOMAIN_COMMAND_NAME
+from mitgcm_inputs.domain import domain_arguments
+from mitgcm_inputs.domain import main as domain_main
+from mitgcm_inputs.domain.pipeline import DomainInputs
+
+LOGGER = logging.getLogger(__name__)
+
+
+# The memory used by a worker process before it starts working on a domain
+# (the interpreter and the imported libraries)
+BASE_MEMORY = 512 * 1024**2
+
+# The memory used for each cell of the 3D grid of a domain. The meshmask
+# (tmask, e3t), the spatial description of rbcs and its relaxation fields
+# are 3D arrays that are alive at the same time: this is a conservative
+# upper bound of their total size
+MEMORY_PER_CELL = 64
+
+# The memory used for each water column of a domain: the 2D fields of the
+# bottom fluxes, of the surface deposition and of the K extinction
+# coefficients (with their interpolation weights) and the buffers of the
+# archives
+MEMORY_PER_COLUMN = 4 * 1024
+
+# The tag attached to the log records of the domain processed by the
+# current worker process
+_DOMAIN_TAG = ""
+
+
+class BatchDomain(NamedTuple):
+    """
+    A domain processed by the batch scheduler.
+
+    Attributes:
+        name: The name of the domain; it is used as a tag in the logs.
+        inputs: The inputs of the domain.
+        memory_estimate: The estimated peak memory (in bytes) of the process
+            that handles this domain.
+    """
+
+    name: str
+    inputs: DomainInputs
+    memory_estimate: int
+
+
+class DomainResult(NamedTuple):
+    """
+    The outcome of a domain that has been processed by a worker.
+
+    Attributes:
+        name: The name of the domain.
+        elapsed_time: The time (in seconds) spent by the worker.
+        peak_memory: The peak resident memory (in bytes) of the worker.
+    """
+
+    name: str
+    elapsed_time: float
+    peak_memory: int
+
+
+def meshmask_shape(mask_file: Path) -> tuple[int, ...]:
+    """
+    Return the shape (depth, latitude, longitude) of the tmask of a meshmask
+    file without reading its values.
+    """
+    with xr.open_dataset(mask_file, engine="netcdf4") as ds:
+        return ds["tmask"].shape[-3:]
+
+
+def estimate_peak_memory(mask_file: Path) -> int:
+    """
+    Estimate the peak memory (in bytes) needed to generate all the static
+    files of a domain from the dimensions of its meshmask.
+    """
+    n_levels, n_lat, n_lon = meshmask_shape(mask_file)
+    n_columns = n_lat * n_lon
+    return (
+        BASE_MEMORY
+        + MEMORY_PER_CELL * n_levels * n_columns
+        + MEMORY_PER_COLUMN * n_columns
+    )
+
+
+def available_memory() -> int:
+    """
+    Return the physical memory of this machine (in bytes).
+    """
+    return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+
+
+class _DomainTagFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.domain = _DOMAIN_TAG
+        return True
+
+
+def _init_worker(log_queue, log_level: int):
+    # Every record of the worker is sent to the main process, which writes
+    # it together with the name of the domain
+    handler = QueueHandler(log_queue)
+    handler.addFilter(_DomainTagFilter())
+    root_logger = logging.getLogger()
+    root_logger.handlers.clear()
+    root_logger.addHandler(handler)
+    root_logger.setLevel(log_level)
+
+
+def _process_domain(
+    domain: BatchDomain,
+    jobs_per_domain: int,
+    build_cache_dir: Path | None,
+) -> DomainResult:
+    global _DOMAIN_TAG
+    _DOMAIN_TAG = domain.name
+
+    start_time = perf_counter()
+    domain.inputs.output_dir.mkdir(parents=True, exist_ok=True)
+    args = domain_arguments(domain.inputs, jobs_per_domain, build_cache_dir)
+    return_code = domain_main(args)
+    if return_code != 0:
+        raise RuntimeError(
+            f"The {DOMAIN_COMMAND_NAME} command returned {return_code}"
+        )
+
+    # On Linux, ru_maxrss is expressed in KiB
+    peak_memory = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    return DomainResult(
+        name=domain.name,
+        elapsed_time=perf_counter() - start_time,
+        peak_memory=peak_memory,
+    )
+
+
+def _tagged_log_handler() -> logging.Handler:
+    formatter = logging.Formatter(
+        "%(asctime)s - [%(domain)s] %(name)s - %(levelname)s - %(message)s"
+    )
+    formatter.converter = localtime
+    handler = logging.StreamHandler()
+    handler.setFormatter(formatter)
+    return handler
+
+
+def _pick_next(
+    pending: list[BatchDomain], used_memory: int, memory_budget: int
+) -> BatchDomain | None:
+    # `pending` is sorted from the largest to the smallest domain
+    for domain in pending:
+        if used_memory + domain.memory_estimate <= memory_budget:
+            return domain
+    return None
+
+
+def run_batch(
+    domains: Sequence[BatchDomain],
+    memory_budget: int,
+    max_workers: int,
+    jobs_per_domain: int = 1,
+    build_cache_dir: Path | None = None,
+) -> bool:
+    """
+    Generate the static files of several domains, each one in its own
+    worker process.
+
+    The domains are started from the largest to the smallest (according to
+    their memory estimate), as long as the sum of the estimates of the
+    running domains fits inside `memory_budget` and there are less than
+    `max_workers` running domains. A domain whose estimate alone exceeds
+    the budget is started when no other domain is running.
+
+    The logs of the workers are written by this process, tagged with the
+    name of the domain. As soon as a domain fails, no other domain is
+    started; the domains that are running are completed.
+
+    Args:
+        domains: The domains that must be processed.
+        memory_budget: The memory (in bytes) that can be used by all the
+            workers at the same time.
+        max_workers: The maximum number of domains processed at the same
+            time.
+        jobs_per_domain: The maximum number of generators executed at the
+            same time inside each worker (see the domain command).
+        build_cache_dir: The directory of the build cache used by the
+            generators of the domains, or None to execute all of them.
+
+    Returns:
+        True if all the domains have been processed successfully.
+    """
+    if max_workers < 1 or jobs_per_domain < 1:
+        raise ValueError("The number of workers and of jobs must be positive")
+
+    pending = sorted(domains, key=lambda d: d.memory_estimate, reverse=True)
+    for domain in pending:
+        LOGGER.info(
+            "Domain %s: estimated peak memory %.2f GiB",
+            domain.name,
+            domain.memory_estimate / 1024**3,
+        )
+        if domain.memory_estimate > memory_budget:
+            LOGGER.warning(
+                "Domain %s needs more than the memory budget (%.2f GiB); it "
+                "will be processed alone",
+                domain.name,
+                memory_budget / 1024**3,
+            )
+
+    # The workers are spawned (instead of forked) because this process runs
+    # the logging thread; each worker handles only one domain, so the memory
+    # of a domain is given back to the system when it is completed
+    context = multiprocessing.get_context("spawn")
+    manager = context.Manager()
+    log_queue = manager.Queue()
+    listener = QueueListener(log_queue, _tagged_log_handler())
+    listener.start()
+
+    start_time = perf_counter()
+    running: dict[Future, BatchDomain] = {}
+    results: list[DomainResult] = []
+    failed: list[str] = []
+    used_memory = 0
+    try:
+        with ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(log_queue, logging.getLogger().getEffectiveLevel()),
+            max_tasks_per_child=1,
+        ) as executor:
+            while running or (pending and not failed):
+                while pending and not failed and len(running) < max_workers:
+                    if running:
+                        domain = _pick_next(
+                            pending, used_memory, memory_budget
+                        )
+                    else:
+                        domain = pending[0]
+                    if domain is None:
+                        break
+                    pending.remove(domain)
+                    used_memory += domain.memory_estimate
+                    LOGGER.info(
+                        "Starting domain %s (%.2f GiB of %.2f GiB in use)",
+                        domain.name,
+                        used_memory / 1024**3,
+                        memory_budget / 1024**3,
+                    )
+                    future = executor.submit(
+                        _process_domain,
+                        domain,
+                        jobs_per_domain,
+                        build_cache_dir,
+                    )
+                    running[future] = domain
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    domain = running.pop(future)
+                    used_memory -= domain.memory_estimate
+                    try:
+                        result = future.result()
+                    except Exception:
+                        LOGGER.exception("Domain %s failed", domain.name)
+                        failed.append(domain.name)
+                        continue
+                    LOGGER.info(
+                        "Domain %s completed in %.2f s (peak memory %.2f "
+                        "GiB, estimated %.2f GiB)",
+                        domain.name,
+                        result.elapsed_time,
+                        result.peak_memory / 1024**3,
+                        domain.memory_estimate / 1024**3,
+                    )
+                    results.append(result)
+    finally:
+        listener.stop()
+        manager.shutdown()
+
+    LOGGER.info(
+        "%s domains completed in %.2f s",
+        len(results),
+        perf_counter() - start_time,
+    )
+    if failed:
+        LOGGER.error("Failed domains: %s", ", ".join(failed))
+        if pending:
+            LOGGER.error(
+                "Domains not processed: %s",
+                ", ".join(d.name for d in pending),
+            )
+        return False
+    return True
@@ -5,9 +5,14 @@ import numpy as np
 from bitsea.utilities.argparse_types import dir_to_be_created_if_not_exists
 from bitsea.utilities.argparse_types import existing_file_path
 
-from mitgcm_inputs.bottom_fluxes.bottom_fluxes import compute_bottom_fluxes
+from mitgcm_inputs.bottom_fluxes.bottom_fluxes import write_bottom_fluxes
+from mitgcm_inputs.bottom_fluxes.budget import compute_budgets
+from mitgcm_inputs.bottom_fluxes.budget import log_budgets
+from mitgcm_inputs.bottom_fluxes.scenarios import read_scenarios
+from mitgcm_inputs.bottom_fluxes.scenarios import write_scenarios
+from mitgcm_inputs.commands import COMMAND_MAP
+from mitgcm_inputs.tools.build_cache import CacheSpec
 from mitgcm_inputs.tools.read_mesh_mask import read_mesh_mask
-from mitgcm_inputs.tools.save_dataset import save_dataset
 
 if __name__ == "__main__":
     LOGGER = logging.getLogger()
@@ -17,10 +22,12 @@ else:
 
 COMMAND_NAME = "bottom_fluxes"
 
+CACHE_SPEC = CacheSpec(output_dirs=("output",))
+
 
 def sub_arguments(subparser):
     parser = subparser.add_parser(
-        "bottom_fluxes", help="Generate vertical fluxes"
+        COMMAND_NAME, help=COMMAND_MAP[COMMAND_NAME].help
     )
 
     parser.add_argument(
@@ -48,6 +55,20 @@ def sub_arguments(subparser):
         help="Name of the output files",
     )
 
+    parser.add_argument(
+        "--scenarios",
+        required=False,
+        type=existing_file_path,
+        default=None,
+        help="""
+        A JSON file with a list of scenarios, i.e. sets of values of the
+        benthic fluxes and of the parameters of their depth variability.
+        The meshmask is read only once and all the scenarios are computed
+        together; the files of each scenario are written in a subdirectory
+        of the output directory named after the scenario.
+        """,
+    )
+
 
 def main(args: argparse.Namespace) -> int:
     if args.cmd != COMMAND_NAME:
@@ -56,17 +77,44 @@ def main(args: argparse.Namespace) -> int:
         )
         return 1
 
+    scenarios = None
+    if args.scenarios is not None:
+        scenarios = read_scenarios(args.scenarios)
+        LOGGER.info(
+            "%s scenarios read from %s", len(scenarios), args.scenarios
+        )
+
     mask = read_mesh_mask(args.mask)
 
-    bottom_fluxes_ds = compute_bottom_fluxes(mask)
     output_dtype = np.float32
 
-    save_dataset(
-        bottom_fluxes_ds,
+    if scenarios is not None:
+        write_scenarios(
+            mask,
+            scenarios,
+            args.output,
+            args.output_name,
+            output_dtype,
+        )
+        LOGGER.info("Execution completed!")
+        return 0
+
+    # The bathymetry is shared by the fluxes and by their budget
+    depth = mask.bathymetry()
+
+    # The fluxes are written one day at a time, so that the 3D arrays of the
+    # benthic variables are never kept in memory
+    write_bottom_fluxes(
+        mask,
         args.output,
         args.output_name,
         output_dtype,
+        depth,
     )
+
+    # The budget is computed from the spatial and time factors, without
+    # reading the files back
+    log_budgets(compute_budgets(mask, depth))
     LOGGER.info("Execution completed!")
 
     return 0
@@ -1,11 +1,17 @@
 import logging
+from collections.abc import Iterator
 from enum import StrEnum
 from numbers import Real
+from pathlib import Path
 from types import MappingProxyType
+from typing import NamedTuple
 
 import numpy as np
 import xarray as xr
 from bitsea.commons.mask import Mask
+from numpy.typing import DTypeLike
+
+from mitgcm_inputs.tools.async_writer import AsyncWriter
 
 LOGGER = logging.getLogger(__name__)
 
@@ -68,6 +74,11 @@ BENTHIC_FLUXES = MappingProxyType(
 )
 
 
+# The depth below which the benthic fluxes are zero, for the variables that
+# do not specify a different value inside FLUX_PARAMETERS
+DEFAULT_DEPTH_ZERO_FLUX = 75.0
+
+
 FLUX_PARAMETERS = {
     BenthicVar.N: {
         "depth_start_decay": 25.0,
@@ -116,9 +127,10 @@ def depth_variability_factor(
     depth: np.ndarray | Real,
     benthic_var: BenthicVar,
     depth_start_decay: float = 25.0,
-    depth_zero_flux: float = 75.0,
+    depth_zero_flux: float = DEFAULT_DEPTH_ZERO_FLUX,
     exp_coeff: int = 4,
     multiplication_factor: float = 1.0,
+    benthic_flux: float | None = None,
 ):
     """
     Compute a coefficient that represents the vertical variability of benthic
@@ -142,6 +154,11 @@ def depth_variability_factor(
             and so on.
         multiplication_factor: If this value is different from 1, the output
             of this function will be multiplied by this value.
+        benthic_flux: The reference flux of the variable; if it is None, the
+            value stored in the `BENTHIC_FLUXES` map is used.
+
+    All the parameters are broadcast together, so several sets of parameters
+    can be evaluated at once by passing them as arrays.
 
     Returns:
         The value of the benthic flux at the given depth.
@@ -157,21 +174,166 @@ def depth_variability_factor(
         depth_zero_flux - depth_start_decay
     )
 
-    benthic_flux = BENTHIC_FLUXES[benthic_var]
+    if benthic_flux is None:
+        benthic_flux = BENTHIC_FLUXES[benthic_var]
     main_coeff = depth_fraction**exp_coeff
 
     return benthic_flux * main_coeff * multiplication_factor
 
 
-def compute_bottom_fluxes(meshmask: Mask):
-    n_days = 365
+# The number of days of the output files
+N_DAYS = 365
+
+
+class SparseField(NamedTuple):
+    """
+    A 2D field that is zero on all the water cells except a few ones.
+
+    Attributes:
+        indices: The flat (C order) indices of the active cells, i.e. the
+            cells where the field is not zero.
+        values: A float32 array with the values of the active cells.
+        background: A 2D float32 array with the values of all the other
+            cells: `FILL_VALUE` on land, a zero on water (see
+            `background_fields`).
+    """
+
+    indices: np.ndarray
+    values: np.ndarray
+    background: np.ndarray
+
+    @property
+    def is_zero(self) -> bool:
+        return len(self.indices) == 0
+
+    def to_dense(self) -> np.ndarray:
+        output = self.background.copy()
+        output.reshape(-1)[self.indices] = self.values
+        return output
+
+
+def background_fields(meshmask: Mask) -> dict[bool, np.ndarray]:
+    """
+    Return the values of the bottom fluxes outside the active cells:
+    `FILL_VALUE` on land and a zero on water.
+
+    On the water cells, the zero has the same sign of the reference flux of
+    the variable: it is the value of `depth_variability_factor` below
+    `depth_zero_flux`, i.e. the reference flux multiplied by zero (so the
+    files of the variables with a negative flux contain -0.0 on the water
+    cells where the flux vanishes). Therefore, two fields are returned,
+    indexed by the sign bit of their zero (see `zero_flux`).
+    """
+    backgrounds = {}
+    for water_value in (np.float32(0.0), np.float32(-0.0)):
+        background = np.full(meshmask.shape[1:], FILL_VALUE, dtype=np.float32)
+        background[meshmask[0]] = water_value
+        backgrounds[bool(np.signbit(water_value))] = background
+    return backgrounds
+
 
+def zero_flux(benthic_var: BenthicVar, **flux_parameters) -> np.ndarray:
+    """
+    Return the value of `depth_variability_factor` on the cells that are
+    deeper than `depth_zero_flux`: a zero (or an array of zeros, if the
+    parameters are arrays) with the sign of the reference flux.
+    """
+    return np.asarray(
+        depth_variability_factor(np.inf, benthic_var, **flux_parameters),
+        dtype=np.float32,
+    )
+
+
+def sparse_spatial_factor(
+    meshmask: Mask,
+    benthic_var: BenthicVar,
+    depth: np.ndarray | None = None,
+    backgrounds: dict[bool, np.ndarray] | None = None,
+) -> SparseField:
+    """
+    Compute the 2D field that, multiplied by the time coefficients returned
+    by `time_coefficients`, gives the bottom fluxes of `benthic_var`.
+
+    The fluxes are zero for the variables whose reference flux is zero and
+    on all the cells deeper than `depth_zero_flux`; therefore, the
+    depth factor is evaluated only on the shallow water cells and only the
+    cells where it is not zero are stored.
+
+    Args:
+        meshmask: The meshmask that defines the domain.
+        benthic_var: The benthic variable.
+        depth: The bathymetry of the meshmask; if it is None, it is computed
+            from the meshmask.
+        backgrounds: The values of the inactive cells returned by
+            `background_fields`; if it is None, they are computed from the
+            meshmask.
+    """
+    if backgrounds is None:
+        backgrounds = background_fields(meshmask)
+    flux_parameters = FLUX_PARAMETERS.get(benthic_var, {})
+    background = backgrounds[
+        bool(np.signbit(zero_flux(benthic_var, **flux_parameters)))
+    ]
+
+    if BENTHIC_FLUXES[benthic_var] == 0:
+        LOGGER.debug("The bottom fluxes of %s are always zero", benthic_var)
+        return SparseField(
+            indices=np.empty(0, dtype=np.intp),
+            values=np.empty(0, dtype=np.float32),
+            background=background,
+        )
+
+    if depth is None:
+        depth = meshmask.bathymetry()
+
+    depth_zero_flux = flux_parameters.get(
+        "depth_zero_flux", DEFAULT_DEPTH_ZERO_FLUX
+    )
+    shallow_cells = np.flatnonzero(
+        meshmask[0].reshape(-1) & (depth.reshape(-1) < depth_zero_flux)
+    )
+    values = depth_variability_factor(
+        depth.reshape(-1)[shallow_cells], benthic_var, **flux_parameters
+    ).astype(np.float32)
+
+    active = values != 0
+    LOGGER.debug(
+        "The bottom fluxes of %s are not zero on %s cells out of %s",
+        benthic_var,
+        np.count_nonzero(active),
+        np.count_nonzero(meshmask[0]),
+    )
+    return SparseField(
+        indices=shallow_cells[active],
+        values=values[active],
+        background=background,
+    )
+
+
+def spatial_factor(
+    meshmask: Mask, benthic_var: BenthicVar, depth: np.ndarray | None = None
+) -> np.ndarray:
+    """
+    Return the same field of `sparse_spatial_factor` as a dense 2D float32
+    array; the cells that do not contain water are set to `FILL_VALUE`.
+    """
+    return sparse_spatial_factor(meshmask, benthic_var, depth).to_dense()
+
+
+def time_coefficients(benthic_var: BenthicVar) -> np.ndarray:
+    """
+    Return the coefficients of the yearly variability of `benthic_var` for
+    each day of the year.
+    """
+    return time_variability_factor(np.arange(1, N_DAYS + 1), benthic_var)
+
+
+def compute_bottom_fluxes(meshmask: Mask):
     depth = meshmask.bathymetry()
-    water_cells = meshmask[0]
 
     dataset = xr.Dataset(
         coords={
-            "day": np.arange(1, n_days + 1),
+            "day": np.arange(1, N_DAYS + 1),
             "latitude": (("x", "y"), meshmask.ylevels),
             "longitude": (("x", "y"), meshmask.xlevels),
         },
@@ -179,15 +341,127 @@ def compute_bottom_fluxes(meshmask: Mask):
 
     for variable in BenthicVar:
         LOGGER.debug("Computing bottom fluxes for %s", variable)
-        data = np.full(depth.shape, FILL_VALUE, dtype=np.float32)
-        data[water_cells] = depth_variability_factor(
-            depth[water_cells], variable, **FLUX_PARAMETERS.get(variable, {})
-        )
-        time_coefficients = time_variability_factor(
-            np.arange(1, 366), variable
-        )
+        data = spatial_factor(meshmask, variable, depth)
         dataset[variable] = xr.DataArray(
-            data=time_coefficients[:, np.newaxis, np.newaxis] * data,
+            data=time_coefficients(variable)[:, np.newaxis, np.newaxis] * data,
             dims=("day", "x", "y"),
         )
     return dataset
+
+
+def iter_bottom_fluxes(
+    meshmask: Mask,
+    output_dtype: DTypeLike = np.float32,
+    depth: np.ndarray | None = None,
+) -> Iterator[tuple[BenthicVar, Iterator[np.ndarray]]]:
+    """
+    Compute the bottom fluxes of each benthic variable one day at a time.
+
+    For each benthic variable, this generator yields the variable together
+    with an iterator over the 2D fields of its days (see
+    `iter_sparse_field`); the iterator of a variable must be consumed before
+    requesting the next variable.
+
+    Args:
+        meshmask: The meshmask that defines the domain.
+        output_dtype: The dtype of the yielded fields.
+        depth: The bathymetry of the meshmask; if it is None, it is computed
+            from the meshmask.
+    """
+    if depth is None:
+        depth = meshmask.bathymetry()
+    backgrounds = background_fields(meshmask)
+
+    for variable in BenthicVar:
+        LOGGER.debug("Computing bottom fluxes for %s", variable)
+        field = sparse_spatial_factor(meshmask, variable, depth, backgrounds)
+        yield variable, iter_sparse_field(
+            field, time_coefficients(variable), output_dtype
+        )
+
+
+def write_bottom_fluxes(
+    meshmask: Mask,
+    output_dir: Path,
+    output_name_mask: str,
+    output_dtype: DTypeLike = np.float32,
+    depth: np.ndarray | None = None,
+):
+    """
+    Compute the bottom fluxes and write them on binary files, one for each
+    benthic variable, without ever building the 3D (day, x, y) arrays.
+
+    The fluxes are the product of a 2D spatial factor and of a time
+    coefficient for each day (see `sparse_spatial_factor` and
+    `time_coefficients`), and the spatial factor is not zero only on the
+    shallow cells. Therefore, each day is computed only on these cells (in
+    float64, and then converted to `output_dtype`, exactly as
+    `compute_bottom_fluxes` followed by `save_dataset`) and scattered into
+    a buffer of one day whose other cells never change. The variables that
+    are zero everywhere are written without any computation. The days are
+    written in the background by an `AsyncWriter`, so the computation of
+    the following days overlaps with the I/O.
+
+    Args:
+        meshmask: The meshmask that defines the domain.
+        output_dir: The directory where the files will be written.
+        output_name_mask: The name of the output files; the string "${VAR}"
+            is replaced by the name of the benthic variable.
+        output_dtype: The dtype of the values saved on the files.
+        depth: The bathymetry of the meshmask; if it is None, it is computed
+            from the meshmask.
+    """
+    # The days are written by a pool of threads while the next ones are
+    # computed
+    with AsyncWriter() as writer:
+        for variable, days in iter_bottom_fluxes(
+            meshmask, output_dtype, depth
+        ):
+            file_output_path = Path(output_dir) / output_name_mask.replace(
+                "${VAR}", variable
+            )
+            for day_output in days:
+                writer.write(file_output_path, day_output)
+
+
+def iter_sparse_field(
+    field: SparseField,
+    coefficients: np.ndarray,
+    output_dtype: DTypeLike = np.float32,
+) -> Iterator[np.ndarray]:
+    """
+    Yield the product of a spatial factor and of a time coefficient for
+    each day, as a 2D array of `output_dtype`.
+
+    Each day is computed only on the active cells of `field` (in float64,
+    and then converted to `output_dtype`) and scattered into a buffer of one
+    day whose other cells never change. Beware that the same buffer is
+    yielded for all the days: if the caller needs to keep the values of a
+    day, it must copy them before requesting the next one.
+    """
+    day_output = field.background.astype(output_dtype)
+    flat_output = day_output.reshape(-1)
+    active_values = field.values.astype(np.float64)
+    day_values = np.empty_like(active_values)
+
+    for coefficient in coefficients:
+        if not field.is_zero:
+            np.multiply(coefficient, active_values, out=day_values)
+            flat_output[field.indices] = day_values
+        yield day_output
+
+
+def write_sparse_field(
+    field: SparseField,
+    coefficients: np.ndarray,
+    file_output_path: Path,
+    writer: AsyncWriter,
+    output_dtype: DTypeLike = np.float32,
+):
+    """
+    Write on a binary file the product of a spatial factor and of a time
+    coefficient for each day (see `iter_sparse_field`); each day is
+    submitted to `writer`, which writes a copy of it in the background.
+    """
+    for day_output in iter_sparse_field(field, coefficients, output_dtype):
+        writer.write(file_output_path, day_output)
@@ -0,0 +1,177 @@
+import logging
+from os import PathLike
+from typing import NamedTuple
+
+import numpy as np
+from bitsea.commons.mask import Mask
+from numpy.typing import DTypeLike
+
+from mitgcm_inputs.bottom_fluxes.bottom_fluxes import ATOMIC_WEIGHTS
+from mitgcm_inputs.bottom_fluxes.bottom_fluxes import BenthicVar
+from mitgcm_inputs.bottom_fluxes.bottom_fluxes import N_DAYS
+from mitgcm_inputs.bottom_fluxes.bottom_fluxes import sparse_spatial_factor
+from mitgcm_inputs.bottom_fluxes.bottom_fluxes import SparseField
+from mitgcm_inputs.bottom_fluxes.bottom_fluxes import time_coefficients
+
+LOGGER = logging.getLogger(__name__)
+
+
+SECONDS_PER_DAY = 86400
+
+# Conversion factor from milligrams to tonnes
+MG_TO_TONNES = 1e-9
+
+
+class FluxBudget(NamedTuple):
+    """
+    The bottom fluxes of a variable integrated over the whole domain.
+
+    Attributes:
+        variable: The benthic variable.
+        daily_flux: The area-integrated flux of each day (mmol s−1).
+        annual_budget: The total flux over the year (t yr−1).
+    """
+
+    variable: BenthicVar
+    daily_flux: np.ndarray
+    annual_budget: float
+
+
+def cell_areas(meshmask: Mask) -> np.ndarray:
+    """
+    Return the horizontal area (m²) of the cells of the meshmask.
+    """
+    return np.asarray(meshmask.e1t, dtype=np.float64) * np.asarray(
+        meshmask.e2t, dtype=np.float64
+    )
+
+
+def annual_budget(daily_flux: np.ndarray, variable: BenthicVar) -> float:
+    """
+    Convert the area-integrated flux of each day (mmol s−1) into the total
+    mass exchanged during the year (t yr−1).
+    """
+    return float(
+        np.sum(daily_flux)
+        * SECONDS_PER_DAY
+        * ATOMIC_WEIGHTS[variable]
+        * MG_TO_TONNES
+    )
+
+
+def compute_budget(
+    meshmask: Mask,
+    variable: BenthicVar,
+    field: SparseField | None = None,
+    areas: np.ndarray | None = None,
+) -> FluxBudget:
+    """
+    Compute the budget of the bottom fluxes of a variable.
+
+    Since the fluxes are the product of a spatial factor and of a time
+    coefficient, the integral of each day is the time coefficient
+    multiplied by the integral of the spatial factor, which is computed
+    only once (and only on its active cells).
+
+    Args:
+        meshmask: The meshmask that defines the domain.
+        variable: The benthic variable.
+        field: The spatial factor of the variable; if it is None, it is
+            computed with `sparse_spatial_factor`.
+        areas: The areas of the cells; if it is None, they are computed with
+            `cell_areas`.
+    """
+    if field is None:
+        field = sparse_spatial_factor(meshmask, variable)
+    if areas is None:
+        areas = cell_areas(meshmask)
+
+    spatial_integral = np.sum(
+        field.values.astype(np.float64) * areas.reshape(-1)[field.indices]
+    )
+    daily_flux = time_coefficients(variable) * spatial_integral
+    return FluxBudget(
+        variable=variable,
+        daily_flux=daily_flux,
+        annual_budget=annual_budget(daily_flux, variable),
+    )
+
+
+def compute_budgets(
+    meshmask: Mask, depth: np.ndarray | None = None
+) -> dict[BenthicVar, FluxBudget]:
+    """
+    Compute the budget of the bottom fluxes of all the benthic variables.
+
+    Args:
+        meshmask: The meshmask that defines the domain.
+        depth: The bathymetry of the meshmask; if it is None, it is computed
+            from the meshmask.
+    """
+    if depth is None:
+        depth = meshmask.bathymetry()
+    areas = cell_areas(meshmask)
+    budgets = {}
+    for variable in BenthicVar:
+        field = sparse_spatial_factor(meshmask, variable, depth)
+        budgets[variable] = compute_budget(meshmask, variable, field, areas)
+    return budgets
+
+
+def read_budget(
+    file_path: PathLike,
+    variable: BenthicVar,
+    meshmask: Mask,
+    areas: np.ndarray | None = None,
+    file_dtype: DTypeLike = np.float32,
+) -> FluxBudget:
+    """
+    Compute the budget of the bottom fluxes saved on a binary file.
+
+    The file is memory-mapped and the days are integrated one at a time, so
+    the memory required does not depend on the number of days. Only the
+    water cells are integrated (the land cells contain `FILL_VALUE`).
+    """
+    if areas is None:
+        areas = cell_areas(meshmask)
+    water_cells = meshmask[0]
+    water_areas = areas[water_cells]
+
+    day_shape = meshmask.shape[1:]
+    day_size = int(np.prod(day_shape)) * np.dtype(file_dtype).itemsize
+    frames = np.memmap(file_path, dtype=file_dtype, mode="r")
+    if frames.size * frames.itemsize % day_size != 0:
+        raise ValueError(
+            f"The size of file {file_path} is not a multiple of the size "
+            f"of a day ({day_size} bytes)"
+        )
+    frames = frames.reshape((-1,) + day_shape)
+    if frames.shape[0] != N_DAYS:
+        LOGGER.warning(
+            "File %s contains %s days instead of %s",
+            file_path,
+            frames.shape[0],
+            N_DAYS,
+        )
+
+    daily_flux = np.empty(frames.shape[0], dtype=np.float64)
+    for d, frame in enumerate(frames):
+        daily_flux[d] = np.dot(
+            frame[water_cells].astype(np.float64), water_areas
+        )
+    return FluxBudget(
+        variable=variable,
+        daily_flux=daily_flux,
+        annual_budget=annual_budget(daily_flux, variable),
+    )
+
+
+def log_budgets(budgets: dict[BenthicVar, FluxBudget]):
+    for variable, budget in budgets.items():
+        LOGGER.info(
+            "%s: %.3e [t/yr] (daily flux between %.3e and %.3e [mmol/s])",
+            variable,
+            budget.annual_budget,
+            np.min(budget.daily_flux),
+            np.max(budget.daily_flux),
+        )
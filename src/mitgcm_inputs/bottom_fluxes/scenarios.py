@@ -0,0 +1,248 @@
+import inspect
+import json
+import logging
+from collections.abc import Mapping
+from collections.abc import Sequence
+from os import PathLike
+from pathlib import Path
+from types import MappingProxyType
+from typing import NamedTuple
+
+import numpy as np
+from bitsea.commons.mask import Mask
+from numpy.typing import DTypeLike
+
+from mitgcm_inputs.bottom_fluxes.bottom_fluxes import background_fields
+from mitgcm_inputs.bottom_fluxes.bottom_fluxes import BENTHIC_FLUXES
+from mitgcm_inputs.bottom_fluxes.bottom_fluxes import BenthicVar
+from mitgcm_inputs.bottom_fluxes.bottom_fluxes import depth_variability_factor
+from mitgcm_inputs.bottom_fluxes.bottom_fluxes import FLUX_PARAMETERS
+from mitgcm_inputs.bottom_fluxes.bottom_fluxes import SparseField
+from mitgcm_inputs.bottom_fluxes.bottom_fluxes import time_coefficients
+from mitgcm_inputs.bottom_fluxes.bottom_fluxes import write_sparse_field
+from mitgcm_inputs.bottom_fluxes.bottom_fluxes import zero_flux
+from mitgcm_inputs.tools.async_writer import AsyncWriter
+
+LOGGER = logging.getLogger(__name__)
+
+
+# The parameters of `depth_variability_factor` that can be changed by a
+# scenario, with their default values
+_SCENARIO_PARAMETERS = (
+    "depth_start_decay",
+    "depth_zero_flux",
+    "exp_coeff",
+    "multiplication_factor",
+)
+DEFAULT_PARAMETERS = MappingProxyType(
+    {
+        name: inspect.signature(depth_variability_factor)
+        .parameters[name]
+        .default
+        for name in _SCENARIO_PARAMETERS
+    }
+)
+
+
+class Scenario(NamedTuple):
+    """
+    A set of parameters of the bottom fluxes.
+
+    Attributes:
+        name: The name of the scenario; it is also the name of the directory
+            where its files are written.
+        benthic_fluxes: The reference flux of each variable (in mmol m−2
+            s−1, as in `BENTHIC_FLUXES`).
+        flux_parameters: The parameters of `depth_variability_factor` for
+            each variable.
+    """
+
+    name: str
+    benthic_fluxes: Mapping[BenthicVar, float]
+    flux_parameters: Mapping[BenthicVar, Mapping[str, float]]
+
+
+def _parse_scenario(description: Mapping) -> Scenario:
+    name = description.get("name", "")
+    if not isinstance(name, str) or name in ("", ".", ".."):
+        raise ValueError(f"Invalid scenario name: {name!r}")
+    if "/" in name or "\\" in name:
+        raise ValueError(f"Scenario name {name!r} contains a path separator")
+
+    unknown_keys = set(description) - {
+        "name",
+        "benthic_fluxes",
+        "flux_parameters",
+    }
+    if unknown_keys:
+        raise ValueError(
+            f"Unknown keys in scenario {name}: {sorted(unknown_keys)}"
+        )
+
+    benthic_fluxes = dict(BENTHIC_FLUXES)
+    for var_name, flux_per_day in description.get(
+        "benthic_fluxes", {}
+    ).items():
+        benthic_fluxes[BenthicVar(var_name)] = float(flux_per_day) / 86400
+
+    flux_parameters = {}
+    parameter_overrides = {
+        BenthicVar(var_name): overrides
+        for var_name, overrides in description.get(
+            "flux_parameters", {}
+        ).items()
+    }
+    for variable in BenthicVar:
+        parameters = dict(DEFAULT_PARAMETERS)
+        parameters.update(FLUX_PARAMETERS.get(variable, {}))
+        for parameter_name, value in parameter_overrides.get(
+            variable, {}
+        ).items():
+            if parameter_name not in DEFAULT_PARAMETERS:
+                raise ValueError(
+                    f"Unknown parameter {parameter_name} for variable "
+                    f"{variable} in scenario {name}"
+                )
+            parameters[parameter_name] = value
+        flux_parameters[variable] = parameters
+
+    return Scenario(
+        name=name,
+        benthic_fluxes=benthic_fluxes,
+        flux_parameters=flux_parameters,
+    )
+
+
+def read_scenarios(file_path: PathLike) -> list[Scenario]:
+    """
+    Read a list of scenarios from a JSON file.
+
+    The file must contain a list of objects; each object has a "name" and,
+    optionally, the values that differ from the default ones:
+
+        [
+            {"name": "reference"},
+            {
+                "name": "deep_decay",
+                "benthic_fluxes": {"O": -10.0},
+                "flux_parameters": {"N": {"depth_zero_flux": 100.0}}
+            }
+        ]
+
+    The values of "benthic_fluxes" are in mmol m−2 d−1; the keys of
+    "flux_parameters" are the arguments of `depth_variability_factor`.
+    """
+    with open(file_path) as f:
+        descriptions = json.load(f)
+    if not isinstance(descriptions, list) or len(descriptions) == 0:
+        raise ValueError(
+            f"File {file_path} must contain a non-empty list of scenarios"
+        )
+
+    scenarios = [_parse_scenario(description) for description in descriptions]
+    names = [scenario.name for scenario in scenarios]
+    if len(set(names)) != len(names):
+        raise ValueError(f"File {file_path} contains duplicated scenarios")
+    return scenarios
+
+
+def batch_sparse_spatial_factors(
+    scenarios: Sequence[Scenario],
+    benthic_var: BenthicVar,
+    water_cells: np.ndarray,
+    depth: np.ndarray,
+    backgrounds: dict[bool, np.ndarray],
+) -> list[SparseField]:
+    """
+    Compute the spatial factor of `benthic_var` (see
+    `bottom_fluxes.sparse_spatial_factor`) for several scenarios at once.
+
+    The parameters of all the scenarios are stacked along a new axis and
+    `depth_variability_factor` is evaluated once, on the water cells that
+    are shallower than the largest `depth_zero_flux` among the scenarios.
+    """
+    benthic_flux = np.array(
+        [s.benthic_fluxes[benthic_var] for s in scenarios]
+    )[:, np.newaxis]
+    parameters = {
+        name: np.array(
+            [s.flux_parameters[benthic_var][name] for s in scenarios]
+        )[:, np.newaxis]
+        for name in DEFAULT_PARAMETERS
+    }
+
+    # The scenarios where the flux is zero do not have any active cell
+    max_zero_depth = np.max(
+        np.where(benthic_flux != 0, parameters["depth_zero_flux"], -np.inf)
+    )
+    shallow_cells = np.flatnonzero(
+        water_cells.reshape(-1) & (depth.reshape(-1) < max_zero_depth)
+    )
+    values = depth_variability_factor(
+        depth.reshape(-1)[shallow_cells],
+        benthic_var,
+        benthic_flux=benthic_flux,
+        **parameters,
+    ).astype(np.float32)
+    values = np.broadcast_to(values, (len(scenarios), len(shallow_cells)))
+    zeros = zero_flux(benthic_var, benthic_flux=benthic_flux, **parameters)
+
+    fields = []
+    for scenario_values, scenario_zero in zip(values, zeros.reshape(-1)):
+        active = scenario_values != 0
+        fields.append(
+            SparseField(
+                indices=shallow_cells[active],
+                values=scenario_values[active],
+                background=backgrounds[bool(np.signbit(scenario_zero))],
+            )
+        )
+    return fields
+
+
+def write_scenarios(
+    meshmask: Mask,
+    scenarios: Sequence[Scenario],
+    output_dir: Path,
+    output_name_mask: str,
+    output_dtype: DTypeLike = np.float32,
+):
+    """
+    Write the bottom fluxes of several scenarios.
+
+    The bathymetry of the meshmask is computed only once and the spatial
+    factors of all the scenarios are computed together (see
+    `batch_sparse_spatial_factors`); the files of each scenario are written
+    in the subdirectory of `output_dir` that has the same name of the
+    scenario, using `output_name_mask` as in `write_bottom_fluxes`.
+    """
+    depth = meshmask.bathymetry()
+    water_cells = meshmask[0]
+    backgrounds = background_fields(meshmask)
+
+    scenario_dirs = []
+    for scenario in scenarios:
+        scenario_dir = Path(output_dir) / scenario.name
+        scenario_dir.mkdir(parents=True, exist_ok=True)
+        scenario_dirs.append(scenario_dir)
+
+    with AsyncWriter() as writer:
+        for variable in BenthicVar:
+            LOGGER.debug(
+                "Computing bottom fluxes for %s in %s scenarios",
+                variable,
+                len(scenarios),
+            )
+            fields = batch_sparse_spatial_factors(
+                scenarios, variable, water_cells, depth, backgrounds
+            )
+            coefficients = time_coefficients(variable)
+            for scenario_dir, field in zip(scenario_dirs, fields):
+                file_name = output_name_mask.replace("${VAR}", variable)
+                write_sparse_field(
+                    field,
+                    coefficients,
+                    scenario_dir / file_name,
+                    writer,
+                    output_dtype,
+                )
@@ -0,0 +1,119 @@
+import argparse
+import logging
+
+import numpy as np
+from bitsea.utilities.argparse_types import existing_dir_path
+from bitsea.utilities.argparse_types import existing_file_path
+
+from mitgcm_inputs.bottom_fluxes.budget import cell_areas
+from mitgcm_inputs.bottom_fluxes.budget import compute_budgets
+from mitgcm_inputs.bottom_fluxes.budget import log_budgets
+from mitgcm_inputs.bottom_fluxes.budget import read_budget
+from mitgcm_inputs.commands import COMMAND_MAP
+from mitgcm_inputs.tools.read_mesh_mask import read_mesh_mask
+
+if __name__ == "__main__":
+    LOGGER = logging.getLogger()
+else:
+    LOGGER = logging.getLogger(__name__)
+
+
+COMMAND_NAME = "bottom_fluxes_budget"
+
+
+def sub_arguments(subparser):
+    parser = subparser.add_parser(
+        COMMAND_NAME, help=COMMAND_MAP[COMMAND_NAME].help
+    )
+
+    parser.add_argument(
+        "-m",
+        "--mask",
+        required=True,
+        type=existing_file_path,
+        help="The meshmask file that defines the domain",
+    )
+
+    parser.add_argument(
+        "-i",
+        "--input-dir",
+        required=False,
+        type=existing_dir_path,
+        default=None,
+        help="""
+        The directory with the files written by the bottom_fluxes command;
+        if it is submitted, the budget of these files is computed and
+        compared with the expected one
+        """,
+    )
+
+    parser.add_argument(
+        "-z",
+        "--input-name",
+        required=False,
+        default="${VAR}_bottom_fluxes.bin",
+        type=str,
+        help="Name of the files inside the input directory",
+    )
+
+    parser.add_argument(
+        "--rtol",
+        required=False,
+        type=float,
+        default=1e-5,
+        help="""
+        The maximum relative difference between the daily fluxes of the
+        files and the expected ones
+        """,
+    )
+
+
+def main(args: argparse.Namespace) -> int:
+    if args.cmd != COMMAND_NAME:
+        LOGGER.error(
+            "Bottom fluxes budget command has been invoked with command: %s",
+            args.cmd,
+        )
+        return 1
+
+    mask = read_mesh_mask(args.mask)
+
+    budgets = compute_budgets(mask)
+    log_budgets(budgets)
+
+    if args.input_dir is None:
+        LOGGER.info("Execution completed!")
+        return 0
+
+    areas = cell_areas(mask)
+    errors = 0
+    for variable, budget in budgets.items():
+        file_name = args.input_name.replace("${VAR}", variable)
+        file_path = args.input_dir / file_name
+        LOGGER.debug("Reading file %s", file_path)
+        file_budget = read_budget(file_path, variable, mask, areas)
+
+        scale = np.max(np.abs(budget.daily_flux))
+        if len(file_budget.daily_flux) != len(budget.daily_flux):
+            difference = np.inf
+        else:
+            difference = np.max(
+                np.abs(file_budget.daily_flux - budget.daily_flux)
+            )
+        if difference > args.rtol * scale:
+            LOGGER.error(
+                "%s: the budget of file %s is %.3e [t/yr] instead of %.3e",
+                variable,
+                file_path,
+                file_budget.annual_budget,
+                budget.annual_budget,
+            )
+            errors += 1
+        else:
+            LOGGER.info("%s: file %s is consistent", variable, file_path)
+
+    if errors > 0:
+        return 3
+
+    LOGGER.info("Execution completed!")
+    return 0
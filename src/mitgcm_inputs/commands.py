@@ -0,0 +1,100 @@
+from typing import NamedTuple
+
+
+class Command(NamedTuple):
+    """
+    The description of a subcommand, used to build the command line parser
+    without importing the module that implements the subcommand (some of
+    them import heavy libraries like copernicusmarine, dask or scipy).
+
+    Attributes:
+        name: The name of the subcommand; it must be equal to the
+            COMMAND_NAME of its module.
+        module: The module that implements the subcommand, i.e. that defines
+            `sub_arguments`, `main` and (if its outputs can be restored from
+            the build cache) `CACHE_SPEC`, or `CACHES_ITS_GENERATORS` if
+            its `main` restores each of its generators on its own.
+        help: A short description of the subcommand.
+    """
+
+    name: str
+    module: str
+    help: str
+
+
+# The only description of each subcommand: the modules that implement them
+# read their help from here, so this module must not import them
+COMMANDS = (
+    Command(
+        "k_extinction",
+        "mitgcm_inputs.k_extinction",
+        "Generate K extinction coefficients",
+    ),
+    Command(
+        "surface_deposition",
+        "mitgcm_inputs.surface_deposition",
+        "Generate the surface deposition climatological data",
+    ),
+    Command(
+        "bottom_fluxes",
+        "mitgcm_inputs.bottom_fluxes",
+        "Generate vertical fluxes",
+    ),
+    Command(
+        "bottom_fluxes_budget",
+        "mitgcm_inputs.bottom_fluxes_budget",
+        "Compute the budget (in tonnes per year) of the bottom fluxes and, "
+        "optionally, check the files written by the bottom_fluxes command",
+    ),
+    Command(
+        "rbcs",
+        "mitgcm_inputs.rbcs",
+        "Generate the files conc.tar.gz and relax.tar.gz that store the "
+        "relaxation and concentration values for the tracers",
+    ),
+    Command(
+        "ob_indices",
+        "mitgcm_inputs.ob_indices",
+        "Generate OB indices for rivers and sponge layers",
+    ),
+    Command(
+        "cosmetic_mask",
+        "mitgcm_inputs.cosmetic_mask",
+        "Generate a new meshmask file that has no rivers and that can be "
+        "used to produce plots without the rivers stems",
+    ),
+    Command(
+        "exf_albedo",
+        "mitgcm_inputs.exf_albedo",
+        "Compute the EXF albedo for a specific domain",
+    ),
+    Command(
+        "kext_climatology",
+        "mitgcm_inputs.kext_climatology",
+        "Build a day-of-year climatology of the K extinction coefficients "
+        "(compatible with the one used by the k_extinction command) from one "
+        "or more daily time series",
+    ),
+    Command(
+        "FLUXES",
+        "mitgcm_inputs.fluxes",
+        "Execute bottom_fluxes, k_extinction and surface_deposition and save "
+        "the output in a single tar.gz file",
+    ),
+    Command(
+        "domain",
+        "mitgcm_inputs.domain",
+        "Generate all the static files of a domain (the outputs of the "
+        "FLUXES, cosmetic_mask, ob_indices and rbcs commands) in a single "
+        "process, reading the meshmask and the rivers description only once",
+    ),
+    Command(
+        "batch",
+        "mitgcm_inputs.batch",
+        "Generate all the static files of several domains (see the domain "
+        "command), processing more domains at the same time as long as their "
+        "estimated memory fits inside a memory budget",
+    ),
+)
+
+COMMAND_MAP = {command.name: command for command in COMMANDS}
@@ -1,12 +1,13 @@
 import argparse
 import logging
 
-import numpy as np
 import xarray as xr
-from bitsea.commons.mask import MaskWithRivers
 from bitsea.utilities.argparse_types import existing_file_path
 from bitsea.utilities.argparse_types import path_inside_an_existing_dir
 
+from mitgcm_inputs.commands import COMMAND_MAP
+from mitgcm_inputs.cosmetic_mask.cosmetic_mask import write_cosmetic_mask
+from mitgcm_inputs.tools.build_cache import CacheSpec
 from mitgcm_inputs.tools.read_mesh_mask import read_mesh_mask
 
 if __name__ == "__main__":
@@ -17,12 +18,12 @@ else:
 
 COMMAND_NAME = "cosmetic_mask"
 
+CACHE_SPEC = CacheSpec(output_files=("output",))
+
 
 def sub_arguments(subparser):
     parser = subparser.add_parser(
-        COMMAND_NAME,
-        help="Generate a new meshmask file that has no rivers and that can be "
-        "used to produce plots without the rivers stems",
+        COMMAND_NAME, help=COMMAND_MAP[COMMAND_NAME].help
     )
 
     parser.add_argument(
@@ -86,71 +87,6 @@ def main(args: argparse.Namespace) -> int:
     with xr.open_dataset(file_with_river, engine="netcdf4") as river_ds:
         river_map = river_ds["rivers"].load()
 
-    river_mask = MaskWithRivers(
-        grid=domain_mask.grid,
-        zlevels=domain_mask.zlevels,
-        mask_array=domain_mask[:],
-        river_positions=river_map,
-    )
-
-    if args.mer:
-        mesh_mask_coords = {
-            "depth": (
-                ("depth",),
-                river_mask.zlevels,
-                {
-                    "units": "m",
-                    "positive": "down",
-                    "standard_name": "depth",
-                    "axis": "Z",
-                },
-            ),
-            "latitude": (
-                ("latitude",),
-                river_mask.lat,
-                {
-                    "units": "degrees_north",
-                    "standard_name": "latitude",
-                    "axis": "Y",
-                },
-            ),
-            "longitude": (
-                ("longitude",),
-                river_mask.lon,
-                {
-                    "units": "degrees_east",
-                    "standard_name": "longitude",
-                    "axis": "X",
-                },
-            ),
-        }
-        e1t = xr.DataArray(data=river_mask.e1t, dims=("latitude", "longitude"))
-        e2t = xr.DataArray(data=river_mask.e2t, dims=("latitude", "longitude"))
-        e3t = xr.DataArray(
-            data=river_mask.e3t, dims=("depth", "latitude", "longitude")
-        )
-        del_z = xr.DataArray(
-            data=river_mask.zlevels,
-            dims=("depth",),
-        )
-        tmask = xr.DataArray(
-            data=np.asarray(river_mask, dtype=np.int8),
-            dims=("depth", "latitude", "longitude"),
-        )
-
-        mask_array = xr.Dataset(
-            data_vars={
-                "e1t": e1t,
-                "e2t": e2t,
-                "e3t": e3t,
-                "delZ": del_z,
-                "tmask": tmask,
-            },
-            coords=mesh_mask_coords,
-            attrs={"mer_mesh_mask_version": "1.0"},
-        )
-        mask_array.to_netcdf(args.output)
-    else:
-        river_mask.save_as_netcdf(args.output)
+    write_cosmetic_mask(domain_mask, river_map, args.output, args.mer)
 
     return 0
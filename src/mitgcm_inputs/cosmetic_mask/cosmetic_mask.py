@@ -0,0 +1,96 @@
+import logging
+from pathlib import Path
+
+import numpy as np
+import xarray as xr
+from bitsea.commons.mask import Mask
+from bitsea.commons.mask import MaskWithRivers
+
+LOGGER = logging.getLogger(__name__)
+
+
+def write_cosmetic_mask(
+    domain_mask: Mask,
+    river_map: xr.DataArray,
+    output_file: Path,
+    mer: bool = False,
+):
+    """
+    Write a meshmask without the cells occupied by the rivers.
+
+    Args:
+        domain_mask: The meshmask of the domain.
+        river_map: A map that associates each river cell with its river id
+            (the "rivers" variable of the meshmask or of an auxiliary file).
+        output_file: The path of the NetCDF file that will be written.
+        mer: If True, the meshmask is written in the (CF-1.4 compliant)
+            format used by the MER project.
+    """
+    river_mask = MaskWithRivers(
+        grid=domain_mask.grid,
+        zlevels=domain_mask.zlevels,
+        mask_array=domain_mask[:],
+        river_positions=river_map,
+    )
+
+    if mer:
+        mesh_mask_coords = {
+            "depth": (
+                ("depth",),
+                river_mask.zlevels,
+                {
+                    "units": "m",
+                    "positive": "down",
+                    "standard_name": "depth",
+                    "axis": "Z",
+                },
+            ),
+            "latitude": (
+                ("latitude",),
+                river_mask.lat,
+                {
+                    "units": "degrees_north",
+                    "standard_name": "latitude",
+                    "axis": "Y",
+                },
+            ),
+            "longitude": (
+                ("longitude",),
+                river_mask.lon,
+                {
+                    "units": "degrees_east",
+                    "standard_name": "longitude",
+                    "axis": "X",
+                },
+            ),
+        }
+        e1t = xr.DataArray(data=river_mask.e1t, dims=("latitude", "longitude"))
+        e2t = xr.DataArray(data=river_mask.e2t, dims=("latitude", "longitude"))
+        e3t = xr.DataArray(
+            data=river_mask.e3t, dims=("depth", "latitude", "longitude")
+        )
+        del_z = xr.DataArray(
+            data=river_mask.zlevels,
+            dims=("depth",),
+        )
+        tmask = xr.DataArray(
+            data=np.asarray(river_mask, dtype=np.int8),
+            dims=("depth", "latitude", "longitude"),
+        )
+
+        mask_array = xr.Dataset(
+            data_vars={
+                "e1t": e1t,
+                "e2t": e2t,
+                "e3t": e3t,
+                "delZ": del_z,
+                "tmask": tmask,
+            },
+            coords=mesh_mask_coords,
+            attrs={"mer_mesh_mask_version": "1.0"},
+        )
+        LOGGER.info("Writing cosmetic mask %s (MER format)", output_file)
+        mask_array.to_netcdf(output_file)
+    else:
+        LOGGER.info("Writing cosmetic mask %s", output_file)
+        river_mask.save_as_netcdf(output_file)
@@ -0,0 +1,227 @@
+import argparse
+import logging
+from pathlib import Path
+from time import perf_counter
+
+from bitsea.utilities.argparse_types import dir_to_be_created_if_not_exists
+from bitsea.utilities.argparse_types import existing_file_path
+
+from mitgcm_inputs.commands import COMMAND_MAP
+from mitgcm_inputs.domain.pipeline import build_domain_tasks
+from mitgcm_inputs.domain.pipeline import DomainInputs
+from mitgcm_inputs.rbcs import DEFAULT_SEWAGE_FILE
+from mitgcm_inputs.tools.build_cache import BuildCache
+from mitgcm_inputs.tools.cache_utils import default_cache_dir
+from mitgcm_inputs.tools.tar_utils import DEFAULT_COMPRESSION_LEVEL
+from mitgcm_inputs.tools.task_graph import run_task_graph
+from mitgcm_inputs.tools.weights_cache import WeightsCache
+
+if __name__ == "__main__":
+    LOGGER = logging.getLogger()
+else:
+    LOGGER = logging.getLogger(__name__)
+
+
+COMMAND_NAME = "domain"
+
+# This command has no CACHE_SPEC: with --build-cache, each generator is
+# restored from the build cache on its own (see `build_domain_tasks`)
+CACHES_ITS_GENERATORS = True
+
+
+def sub_arguments(subparser):
+    parser = subparser.add_parser(
+        COMMAND_NAME, help=COMMAND_MAP[COMMAND_NAME].help
+    )
+
+    parser.add_argument(
+        "-m",
+        "--mask",
+        required=True,
+        type=existing_file_path,
+        help="The meshmask file that defines the domain",
+    )
+
+    parser.add_argument(
+        "-o",
+        "--output",
+        required=True,
+        type=dir_to_be_created_if_not_exists,
+        help="Path of the directory where the output files will be written",
+    )
+
+    parser.add_argument(
+        "-s",
+        "--sponge-extent",
+        required=False,
+        default=0,
+        type=int,
+        help="The extent of the sponge layer in number of cells",
+    )
+
+    parser.add_argument(
+        "-p",
+        "--rivers-positions",
+        required=False,
+        type=existing_file_path,
+        default=None,
+        help="The json file that describe the position of the mouths of the "
+        "rivers. If this file is not provided, we will assume that there are "
+        "no rivers on the domain (and the cosmetic mask will be a copy of the "
+        "meshmask)",
+    )
+
+    parser.add_argument(
+        "-a",
+        "--river-file",
+        required=False,
+        default=None,
+        type=existing_file_path,
+        help="An auxiliary file that contains a map that associates each "
+        "river cell with its river id. If it is not provided, we will assume "
+        "that this information is stored inside the meshmask file (in a "
+        'variable named "rivers")',
+    )
+
+    parser.add_argument(
+        "-r",
+        "--river-config",
+        required=False,
+        type=existing_file_path,
+        default=None,
+        help="The main configuration file for the rivers; it is mandatory if "
+        "a river positions file is provided",
+    )
+
+    parser.add_argument(
+        "-d",
+        "--river-domain-file",
+        required=False,
+        type=existing_file_path,
+        default=None,
+        help="A further configuration for the rivers, specific to the current "
+        "domain",
+    )
+
+    parser.add_argument(
+        "--sewage",
+        required=False,
+        type=existing_file_path,
+        default=DEFAULT_SEWAGE_FILE,
+        help="The xlsx file with the sewage locations",
+    )
+
+    parser.add_argument(
+        "--compression-level",
+        required=False,
+        type=int,
+        choices=range(10),
+        metavar="{0..9}",
+        default=DEFAULT_COMPRESSION_LEVEL,
+        help="The gzip compression level of the output archives",
+    )
+
+    parser.add_argument(
+        "--no-compression",
+        action="store_true",
+        help="Write plain (uncompressed) tar files",
+    )
+
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        required=False,
+        type=int,
+        default=4,
+        help="The maximum number of generators executed at the same time",
+    )
+
+
+def domain_arguments(
+    inputs: DomainInputs, jobs: int, build_cache_dir: Path | None = None
+) -> argparse.Namespace:
+    """
+    Build the arguments of this command that process the domain described
+    by `inputs` (the inverse of the conversion performed by `main`); the
+    build cache is used only if `build_cache_dir` is not None.
+    """
+    return argparse.Namespace(
+        cmd=COMMAND_NAME,
+        mask=inputs.mask,
+        output=inputs.output_dir,
+        sponge_extent=inputs.sponge_extent,
+        rivers_positions=inputs.rivers_positions,
+        river_file=inputs.river_file,
+        river_config=inputs.river_config,
+        river_domain_file=inputs.river_domain_file,
+        sewage=inputs.sewage_file,
+        compression_level=inputs.compression_level,
+        no_compression=not inputs.compress,
+        jobs=jobs,
+        build_cache=build_cache_dir is not None,
+        build_cache_dir=build_cache_dir,
+    )
+
+
+def main(args: argparse.Namespace) -> int:
+    if args.cmd != COMMAND_NAME:
+        LOGGER.error(
+            "%s command has been invoked with command: %s",
+            COMMAND_NAME,
+            args.cmd,
+        )
+        return 1
+
+    if args.jobs < 1:
+        LOGGER.error("The number of jobs must be positive: %s", args.jobs)
+        return 2
+
+    if args.rivers_positions is not None and args.river_config is None:
+        LOGGER.error(
+            "If river positions are provided, a river config must be provided"
+        )
+        return 2
+    if args.rivers_positions is None:
+        for option, value in (
+            ("--river-file", args.river_file),
+            ("--river-config", args.river_config),
+            ("--river-domain-file", args.river_domain_file),
+        ):
+            if value is not None:
+                LOGGER.error(
+                    "%s can be used only together with --rivers-positions",
+                    option,
+                )
+                return 2
+
+    inputs = DomainInputs(
+        mask=args.mask,
+        output_dir=args.output,
+        sewage_file=args.sewage,
+        sponge_extent=args.sponge_extent,
+        rivers_positions=args.rivers_positions,
+        river_file=args.river_file,
+        river_config=args.river_config,
+        river_domain_file=args.river_domain_file,
+        compression_level=args.compression_level,
+        compress=not args.no_compression,
+    )
+
+    build_cache = None
+    if args.build_cache:
+        build_cache = BuildCache(args.build_cache_dir)
+
+    start_time = perf_counter()
+    run_task_graph(
+        build_domain_tasks(
+            inputs, WeightsCache(default_cache_dir()), build_cache
+        ),
+        max_workers=args.jobs,
+    )
+    LOGGER.info(
+        "Domain %s completed in %.2f s",
+        args.output,
+        perf_counter() - start_time,
+    )
+
+    return 0
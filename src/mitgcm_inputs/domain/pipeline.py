@@ -0,0 +1,381 @@
+import argparse
+import json
+import logging
+import shutil
+from collections import OrderedDict
+from collections.abc import Callable
+from collections.abc import Sequence
+from pathlib import Path
+from typing import Any
+from typing import NamedTuple
+
+import xarray as xr
+from ogs_riverger.read_config import RiverConfig
+
+from mitgcm_inputs.cosmetic_mask.cosmetic_mask import write_cosmetic_mask
+from mitgcm_inputs.fluxes.fluxes import iter_flux_members
+from mitgcm_inputs.fluxes.fluxes import write_archive
+from mitgcm_inputs.k_extinction.k_extinction import DATA_FILE
+from mitgcm_inputs.ob_indices.ob_indices import write_ob_indices
+from mitgcm_inputs.rbcs.rbcs_gen import spatial_description_from_mask
+from mitgcm_inputs.rbcs.rbcs_gen import write_rbcs_files
+from mitgcm_inputs.rbcs.scarichi_json_gen import read_sewage_positions
+from mitgcm_inputs.rbcs.scarichi_json_gen import SALINITY_REMOTE_INPUTS
+from mitgcm_inputs.tools.build_cache import BuildCache
+from mitgcm_inputs.tools.build_cache import CacheSpec
+from mitgcm_inputs.tools.build_cache import run_cached
+from mitgcm_inputs.tools.domain import Domain
+from mitgcm_inputs.tools.tar_utils import DEFAULT_COMPRESSION_LEVEL
+from mitgcm_inputs.tools.task_graph import Task
+from mitgcm_inputs.tools.weights_cache import WeightsCache
+
+LOGGER = logging.getLogger(__name__)
+
+
+# The names of the files written inside the output directory (the same
+# names used by generate_mer_statics.sh)
+FLUXES_ARCHIVE_NAME = "fluxes"
+COSMETIC_MASK_FILE_NAME = "cmeshmask.nc"
+OB_INDICES_FILE_NAME = "rivers_open_boundaries.txt"
+NUDGE_INDICES_FILE_NAME = "nudging_indices.txt"
+
+# The names of the files written by `write_rbcs_files`
+RBCS_CONC_ARCHIVE_NAME = "conc"
+RBCS_RELAX_ARCHIVE_NAME = "relax"
+RBCS_NAMES_FILE_NAME = "RBCS_names.txt"
+
+# The generators are stored inside the build cache as if they were the
+# commands "domain/<generator>"; the specs describe how their outputs
+# depend on their arguments (see `run_generator`)
+BUILD_CACHE_PREFIX = "domain"
+FLUXES_CACHE_SPEC = CacheSpec(
+    output_files=("output",), implicit_inputs=(DATA_FILE,)
+)
+COSMETIC_MASK_CACHE_SPEC = CacheSpec(output_files=("output",))
+OB_INDICES_CACHE_SPEC = CacheSpec(output_files=("ob_indices", "nudge_indices"))
+RBCS_CACHE_SPEC = CacheSpec(
+    output_files=("conc", "relax", "names"),
+    remote_inputs=SALINITY_REMOTE_INPUTS,
+)
+
+
+class DomainInputs(NamedTuple):
+    """
+    The input files of a domain.
+
+    Attributes:
+        mask: The meshmask file.
+        output_dir: The directory where the outputs are written.
+        sewage_file: The xlsx file with the sewage locations.
+        sponge_extent: The extent of the sponge layer in number of cells.
+        rivers_positions: The json file that describes the position of the
+            mouths of the rivers; if it is None, there are no rivers on the
+            domain.
+        river_file: The file with the "rivers" variable that associates
+            each river cell with its river id; if it is None, the variable
+            is read from the meshmask.
+        river_config: The main configuration file of the rivers; it is
+            mandatory if `rivers_positions` is not None.
+        river_domain_file: A further configuration of the rivers, specific
+            to this domain.
+        compression_level: The gzip compression level of the archives.
+        compress: If False, the archives are plain (uncompressed) tar files.
+    """
+
+    mask: Path
+    output_dir: Path
+    sewage_file: Path
+    sponge_extent: int = 0
+    rivers_positions: Path | None = None
+    river_file: Path | None = None
+    river_config: Path | None = None
+    river_domain_file: Path | None = None
+    compression_level: int = DEFAULT_COMPRESSION_LEVEL
+    compress: bool = True
+
+
+class Rivers(NamedTuple):
+    """
+    The description of the rivers of a domain, read once and shared by all
+    the generators.
+
+    Attributes:
+        positions: The content of the rivers positions json file.
+        config: The configuration of the rivers.
+        river_map: The "rivers" variable, read without applying its fill
+            value and its scale factor; None if there are no rivers.
+    """
+
+    positions: Sequence[dict[str, Any]]
+    config: RiverConfig
+    river_map: xr.DataArray | None
+
+    @property
+    def decoded_river_map(self) -> xr.DataArray:
+        """
+        The "rivers" variable with its fill value and scale factor applied,
+        i.e., as it is returned by `xr.open_dataset` with the default
+        options.
+        """
+        return xr.decode_cf(self.river_map.to_dataset())[self.river_map.name]
+
+
+def read_domain(inputs: DomainInputs) -> Domain:
+    domain = Domain.from_file(inputs.mask)
+    # The bathymetry is used by more than one generator; it is computed here
+    # so that they do not wait for each other
+    domain.bathymetry
+    return domain
+
+
+def read_rivers(inputs: DomainInputs) -> Rivers:
+    if inputs.rivers_positions is None:
+        LOGGER.info("No rivers positions file: there are no rivers")
+        return Rivers(
+            positions=(),
+            config=RiverConfig(root=OrderedDict()),
+            river_map=None,
+        )
+
+    positions = json.loads(inputs.rivers_positions.read_text())
+    config = RiverConfig.from_json(
+        inputs.river_config, inputs.river_domain_file
+    )
+
+    if inputs.river_file is not None:
+        file_with_river = inputs.river_file
+    else:
+        file_with_river = inputs.mask
+    with xr.open_dataset(
+        file_with_river, mask_and_scale=False, engine="netcdf4"
+    ) as river_ds:
+        river_map = river_ds["rivers"].load()
+
+    return Rivers(positions=positions, config=config, river_map=river_map)
+
+
+def _archive_suffix(inputs: DomainInputs) -> str:
+    return ".tar.gz" if inputs.compress else ".tar"
+
+
+def run_generator(
+    build_cache: BuildCache | None,
+    name: str,
+    spec: CacheSpec,
+    arguments: dict[str, Any],
+    generator: Callable[[], Any],
+):
+    """
+    Execute a generator of the domain or, if `build_cache` is not None and
+    the generator has already been executed with the same inputs, restore
+    its outputs from the build cache (see `run_cached`).
+
+    Args:
+        build_cache: The build cache, or None to always execute the
+            generator.
+        name: The name of the generator.
+        spec: How the outputs of the generator depend on `arguments`.
+        arguments: The inputs and the outputs of the generator, described
+            like the arguments of a command.
+        generator: The function that writes the outputs.
+    """
+    if build_cache is None:
+        generator()
+        return
+
+    def main(_: argparse.Namespace) -> int:
+        generator()
+        return 0
+
+    run_cached(
+        build_cache,
+        f"{BUILD_CACHE_PREFIX}/{name}",
+        spec,
+        argparse.Namespace(**arguments),
+        main,
+    )
+
+
+def run_fluxes(
+    inputs: DomainInputs,
+    domain: Domain,
+    cache: WeightsCache,
+    build_cache: BuildCache | None = None,
+):
+    output_file = (
+        inputs.output_dir / f"{FLUXES_ARCHIVE_NAME}{_archive_suffix(inputs)}"
+    )
+    run_generator(
+        build_cache,
+        "FLUXES",
+        FLUXES_CACHE_SPEC,
+        {
+            "mask": inputs.mask,
+            "compression_level": inputs.compression_level,
+            "compress": inputs.compress,
+            "output": output_file,
+        },
+        lambda: write_archive(
+            iter_flux_members(domain, cache),
+            output_file,
+            compression_level=inputs.compression_level,
+            compress=inputs.compress,
+        ),
+    )
+
+
+def run_cosmetic_mask(
+    inputs: DomainInputs,
+    domain: Domain,
+    rivers: Rivers,
+    build_cache: BuildCache | None = None,
+):
+    output_file = inputs.output_dir / COSMETIC_MASK_FILE_NAME
+    run_generator(
+        build_cache,
+        "cosmetic_mask",
+        COSMETIC_MASK_CACHE_SPEC,
+        {
+            "mask": inputs.mask,
+            "rivers_positions": inputs.rivers_positions,
+            "river_file": inputs.river_file,
+            "output": output_file,
+        },
+        lambda: _write_cosmetic_mask(inputs, domain, rivers, output_file),
+    )
+
+
+def _write_cosmetic_mask(
+    inputs: DomainInputs, domain: Domain, rivers: Rivers, output_file: Path
+):
+    if rivers.river_map is None:
+        # No rivers? Then the cosmetic mask is equal to the original mask
+        LOGGER.info("Copying %s into %s", inputs.mask, output_file)
+        shutil.copy2(inputs.mask, output_file)
+        return
+    write_cosmetic_mask(
+        domain.meshmask, rivers.decoded_river_map, output_file, mer=True
+    )
+
+
+def run_ob_indices(
+    inputs: DomainInputs,
+    domain: Domain,
+    rivers: Rivers,
+    build_cache: BuildCache | None = None,
+):
+    ob_indices_file = inputs.output_dir / OB_INDICES_FILE_NAME
+    nudge_indices_file = inputs.output_dir / NUDGE_INDICES_FILE_NAME
+    run_generator(
+        build_cache,
+        "ob_indices",
+        OB_INDICES_CACHE_SPEC,
+        {
+            "mask": inputs.mask,
+            "sponge_extent": inputs.sponge_extent,
+            "rivers_positions": inputs.rivers_positions,
+            "river_file": inputs.river_file,
+            "ob_indices": ob_indices_file,
+            "nudge_indices": nudge_indices_file,
+        },
+        lambda: write_ob_indices(
+            domain.meshmask,
+            sponge_extent=inputs.sponge_extent,
+            river_map=rivers.river_map,
+            rivers_positions=rivers.positions,
+            ob_indices_file=ob_indices_file,
+            nudge_indices_file=nudge_indices_file,
+        ),
+    )
+
+
+def run_rbcs(
+    inputs: DomainInputs,
+    domain: Domain,
+    rivers: Rivers,
+    build_cache: BuildCache | None = None,
+):
+    # The sewage positions are read (downloading the salinity) only if the
+    # files are not restored from the build cache
+    archive_suffix = _archive_suffix(inputs)
+    run_generator(
+        build_cache,
+        "rbcs",
+        RBCS_CACHE_SPEC,
+        {
+            "mask": inputs.mask,
+            "sewage_file": inputs.sewage_file,
+            "rivers_positions": inputs.rivers_positions,
+            "river_config": inputs.river_config,
+            "river_domain_file": inputs.river_domain_file,
+            "compression_level": inputs.compression_level,
+            "compress": inputs.compress,
+            "conc": inputs.output_dir
+            / f"{RBCS_CONC_ARCHIVE_NAME}{archive_suffix}",
+            "relax": inputs.output_dir
+            / f"{RBCS_RELAX_ARCHIVE_NAME}{archive_suffix}",
+            "names": inputs.output_dir / RBCS_NAMES_FILE_NAME,
+        },
+        lambda: write_rbcs_files(
+            spatial_description=spatial_description_from_mask(
+                domain.meshmask, domain.bathymetry
+            ),
+            sewage_positions=read_sewage_positions(
+                inputs.sewage_file, domain.meshmask
+            ),
+            rivers_config=rivers.config,
+            river_positions=rivers.positions,
+            output_dir=inputs.output_dir,
+            compression_level=inputs.compression_level,
+            compress=inputs.compress,
+        ),
+    )
+
+
+def build_domain_tasks(
+    inputs: DomainInputs,
+    cache: WeightsCache | None = None,
+    build_cache: BuildCache | None = None,
+) -> list[Task]:
+    """
+    Build the graph of the tasks that generate all the static files of a
+    domain, i.e., the same files written by the FLUXES, cosmetic_mask,
+    ob_indices and rbcs commands in generate_mer_statics.sh.
+
+    The meshmask and the description of the rivers are read by their own
+    tasks, and their results are shared by all the generators that need
+    them. If `build_cache` is not None, the outputs of each generator are
+    restored from the build cache when its inputs have not changed (see
+    `run_generator`); the outputs of rbcs are also keyed on the salinity
+    that it downloads.
+    """
+    return [
+        Task("meshmask", lambda: read_domain(inputs)),
+        Task("rivers", lambda: read_rivers(inputs)),
+        Task(
+            "FLUXES",
+            lambda domain: run_fluxes(inputs, domain, cache, build_cache),
+            ("meshmask",),
+        ),
+        Task(
+            "cosmetic_mask",
+            lambda domain, rivers: run_cosmetic_mask(
+                inputs, domain, rivers, build_cache
+            ),
+            ("meshmask", "rivers"),
+        ),
+        Task(
+            "ob_indices",
+            lambda domain, rivers: run_ob_indices(
+                inputs, domain, rivers, build_cache
+            ),
+            ("meshmask", "rivers"),
+        ),
+        Task(
+            "rbcs",
+            lambda domain, rivers: run_rbcs(
+                inputs, domain, rivers, build_cache
+            ),
+            ("meshmask", "rivers"),
+        ),
+    ]
@@ -5,6 +5,9 @@ import xarray as xr
 from bitsea.utilities.argparse_types import existing_file_path
 from bitsea.utilities.argparse_types import path_inside_an_existing_dir
 
+from mitgcm_inputs.commands import COMMAND_MAP
+from mitgcm_inputs.tools.build_cache import CacheSpec
+
 if __name__ == "__main__":
     LOGGER = logging.getLogger()
 else:
@@ -13,10 +16,12 @@ else:
 
 COMMAND_NAME = "exf_albedo"
 
+CACHE_SPEC = CacheSpec(output_files=("output",))
+
 
 def sub_arguments(subparser):
     parser = subparser.add_parser(
-        COMMAND_NAME, help="Compute the EXF albedo for a specific domain"
+        COMMAND_NAME, help=COMMAND_MAP[COMMAND_NAME].help
     )
 
     parser.add_argument(
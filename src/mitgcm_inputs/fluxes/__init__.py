@@ -0,0 +1,159 @@
+import argparse
+import logging
+from pathlib import Path
+from time import perf_counter
+
+from bitsea.utilities.argparse_types import existing_file_path
+from bitsea.utilities.argparse_types import path_inside_an_existing_dir
+
+from mitgcm_inputs.commands import COMMAND_MAP
+from mitgcm_inputs.fluxes.fluxes import iter_flux_members
+from mitgcm_inputs.fluxes.fluxes import iter_parallel_flux_members
+from mitgcm_inputs.fluxes.fluxes import STAGE_BUFFER_SIZE
+from mitgcm_inputs.fluxes.fluxes import write_archive
+from mitgcm_inputs.k_extinction.k_extinction import DATA_FILE
+from mitgcm_inputs.tools.build_cache import CacheSpec
+from mitgcm_inputs.tools.cache_utils import default_cache_dir
+from mitgcm_inputs.tools.domain import Domain
+from mitgcm_inputs.tools.tar_utils import DEFAULT_COMPRESSION_LEVEL
+from mitgcm_inputs.tools.weights_cache import WeightsCache
+
+if __name__ == "__main__":
+    LOGGER = logging.getLogger()
+else:
+    LOGGER = logging.getLogger(__name__)
+
+
+COMMAND_NAME = "FLUXES"
+
+CACHE_SPEC = CacheSpec(
+    output_files=("output",),
+    ignored=("cache_dir", "jobs", "no_cache"),
+    implicit_inputs=(DATA_FILE,),
+)
+
+
+def sub_arguments(subparser):
+    parser = subparser.add_parser(
+        COMMAND_NAME, help=COMMAND_MAP[COMMAND_NAME].help
+    )
+
+    parser.add_argument(
+        "-m",
+        "--mask",
+        required=True,
+        type=existing_file_path,
+        help="The meshmask file that defines the domain",
+    )
+
+    parser.add_argument(
+        "-o",
+        "--output",
+        required=True,
+        type=path_inside_an_existing_dir,
+        help="""
+        Path of the compressed tar.gz file that will store all the output
+        files
+        """,
+    )
+
+    parser.add_argument(
+        "--compression-level",
+        required=False,
+        type=int,
+        choices=range(10),
+        metavar="{0..9}",
+        default=DEFAULT_COMPRESSION_LEVEL,
+        help="The gzip compression level of the output file",
+    )
+
+    parser.add_argument(
+        "--no-compression",
+        action="store_true",
+        help="Write a plain (uncompressed) tar file",
+    )
+
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        required=False,
+        type=int,
+        default=1,
+        help=f"""
+        The number of worker processes that compute the bottom fluxes, the
+        surface deposition and the K extinction coefficients at the same
+        time (there are three stages, so more than three jobs are not
+        used). With more than one job, the workers send their files to the
+        archive through bounded queues: each running stage keeps at most
+        {STAGE_BUFFER_SIZE // 1024**2} MiB of its files waiting to be
+        compressed, and it stops when its
+        queue is full. Nothing is written on the disk or in shared memory.
+        Default: 1 (the files are computed one after the other while they
+        are compressed)
+        """,
+    )
+
+    parser.add_argument(
+        "--cache-dir",
+        required=False,
+        type=Path,
+        default=None,
+        help=f"""
+        Directory where the interpolation weights of the K extinction
+        coefficients of each domain are stored, so that they can be reused
+        by the following executions. By default, it is {default_cache_dir()}
+        """,
+    )
+
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Do not read or write the cache of the interpolation weights",
+    )
+
+
+def main(args: argparse.Namespace) -> int:
+    if args.cmd != COMMAND_NAME:
+        LOGGER.error(
+            "Fluxes command has been invoked with command: %s", args.cmd
+        )
+        return 1
+
+    if args.jobs < 1:
+        LOGGER.error("The number of jobs must be positive: %s", args.jobs)
+        return 2
+
+    start_time = perf_counter()
+
+    # The meshmask is read only once and shared by all the generators
+    domain = Domain.from_file(args.mask)
+
+    if args.no_cache:
+        cache = None
+    else:
+        cache_dir = args.cache_dir
+        if cache_dir is None:
+            cache_dir = default_cache_dir()
+        LOGGER.debug("Using cache directory %s", cache_dir)
+        cache = WeightsCache(cache_dir)
+
+    # In both cases, the files are streamed into the archive while it is
+    # compressed, so they are never written on the disk
+    if args.jobs == 1:
+        members = iter_flux_members(domain, cache)
+    else:
+        members = iter_parallel_flux_members(domain, args.jobs, cache)
+    write_archive(
+        members,
+        args.output,
+        compression_level=args.compression_level,
+        compress=not args.no_compression,
+    )
+
+    LOGGER.info(
+        "Archive %s written in %.2f s",
+        args.output,
+        perf_counter() - start_time,
+    )
+    LOGGER.info("Everything done!")
+    return 0
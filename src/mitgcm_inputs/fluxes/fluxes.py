@@ -0,0 +1,495 @@
+import logging
+import multiprocessing
+import tarfile
+from collections.abc import Iterable
+from collections.abc import Iterator
+from concurrent.futures import Future
+from concurrent.futures import ProcessPoolExecutor
+from enum import StrEnum
+from multiprocessing.queues import Queue
+from multiprocessing.synchronize import Event
+from os import PathLike
+from pathlib import Path
+from queue import Empty
+from queue import Full
+from time import perf_counter
+from typing import NamedTuple
+
+import numpy as np
+from numpy.typing import DTypeLike
+
+from mitgcm_inputs.bottom_fluxes.bottom_fluxes import iter_bottom_fluxes
+from mitgcm_inputs.bottom_fluxes.bottom_fluxes import N_DAYS
+from mitgcm_inputs.bottom_fluxes.budget import compute_budgets
+from mitgcm_inputs.bottom_fluxes.budget import log_budgets
+from mitgcm_inputs.k_extinction.k_extinction import climatology_n_days
+from mitgcm_inputs.k_extinction.k_extinction import DATA_FILE
+from mitgcm_inputs.k_extinction.k_extinction import iter_k_extinction
+from mitgcm_inputs.surface_deposition.surface_deposition import (
+    compute_surface_deposition,
+)
+from mitgcm_inputs.tools.async_writer import AsyncWriter
+from mitgcm_inputs.tools.async_writer import iter_blocks
+from mitgcm_inputs.tools.domain import Domain
+from mitgcm_inputs.tools.tar_utils import add_stream_member
+from mitgcm_inputs.tools.tar_utils import DEFAULT_COMPRESSION_LEVEL
+from mitgcm_inputs.tools.tar_utils import open_tar_writer
+from mitgcm_inputs.tools.tar_utils import set_tar_file_ownerships
+from mitgcm_inputs.tools.tar_utils import STREAM_BUFFER_SIZE
+from mitgcm_inputs.tools.tar_utils import StreamMember
+from mitgcm_inputs.tools.weights_cache import WeightsCache
+
+LOGGER = logging.getLogger(__name__)
+
+
+# The names of the files produced by each generator (the same default names
+# of the corresponding commands)
+BOTTOM_FLUXES_NAME = "${VAR}_bottom_fluxes.bin"
+SURFACE_DEPOSITION_NAME = "${VAR}_surface_fluxes.bin"
+K_EXTINCTION_NAME = "Kext.bin"
+
+
+class FluxStage(StrEnum):
+    """
+    The independent generators executed by the FLUXES command.
+    """
+
+    BOTTOM_FLUXES = "bottom_fluxes"
+    SURFACE_DEPOSITION = "surface_deposition"
+    K_EXTINCTION = "k_extinction"
+
+
+class QueuedMember(NamedTuple):
+    """
+    A file computed by a worker process, whose content is sent to the
+    parent process through the queue of its stage.
+
+    Attributes:
+        stage: The stage that computes the file.
+        name: The name of the file.
+        size: The size of the file, in bytes.
+    """
+
+    stage: FluxStage
+    name: str
+    size: int
+
+
+class StageReport(NamedTuple):
+    """
+    The result of a stage executed by a worker process.
+
+    Attributes:
+        stage: The stage.
+        compute_time: The time (in seconds) spent by the worker.
+    """
+
+    stage: FluxStage
+    compute_time: float
+
+
+def iter_stage_members(
+    stage: FluxStage,
+    domain: Domain,
+    cache: WeightsCache | None = None,
+    output_dtype: DTypeLike = np.float32,
+    data_file: PathLike = DATA_FILE,
+) -> Iterator[StreamMember]:
+    """
+    Yield the files produced by one of the generators of the FLUXES
+    command, as members whose content is computed while it is read.
+
+    The size of each member is known in advance from the shape of the
+    meshmask and from the number of days. The blocks of each member must be
+    consumed before requesting the next member.
+
+    Args:
+        stage: The generator.
+        domain: The domain.
+        cache: The cache of the interpolation weights of the K extinction
+            coefficients.
+        output_dtype: The dtype of the values saved on the files.
+        data_file: The climatology of the K extinction coefficients.
+    """
+    meshmask = domain.meshmask
+    output_dtype = np.dtype(output_dtype)
+    frame_size = int(np.prod(meshmask.shape[1:])) * output_dtype.itemsize
+
+    match FluxStage(stage):
+        case FluxStage.BOTTOM_FLUXES:
+            for variable, days in iter_bottom_fluxes(
+                meshmask, output_dtype, domain.bathymetry
+            ):
+                yield StreamMember(
+                    name=BOTTOM_FLUXES_NAME.replace("${VAR}", variable),
+                    size=N_DAYS * frame_size,
+                    blocks=days,
+                )
+            log_budgets(compute_budgets(meshmask, domain.bathymetry))
+
+        case FluxStage.SURFACE_DEPOSITION:
+            surface_deposition = compute_surface_deposition(meshmask)
+            for var_name in surface_deposition.data_vars:
+                values = surface_deposition[var_name].values
+                yield StreamMember(
+                    name=SURFACE_DEPOSITION_NAME.replace("${VAR}", var_name),
+                    size=values.size * output_dtype.itemsize,
+                    blocks=iter_blocks(values, output_dtype),
+                )
+
+        case FluxStage.K_EXTINCTION:
+            yield StreamMember(
+                name=K_EXTINCTION_NAME,
+                size=climatology_n_days(data_file) * frame_size,
+                blocks=iter_k_extinction(
+                    meshmask, data_file, cache, output_dtype
+                ),
+            )
+
+
+def iter_flux_members(
+    domain: Domain,
+    cache: WeightsCache | None = None,
+    output_dtype: DTypeLike = np.float32,
+    data_file: PathLike = DATA_FILE,
+) -> Iterator[StreamMember]:
+    """
+    Yield the files of the bottom fluxes, of the surface deposition and of
+    the K extinction coefficients of a domain (see `iter_stage_members`),
+    computing them one after the other in the current process.
+
+    All the generators receive the same meshmask, which is therefore read
+    only once, and the fields derived from it (e.g., the bathymetry) are
+    shared through `domain`.
+    """
+    for stage in FluxStage:
+        start_time = perf_counter()
+        yield from iter_stage_members(
+            stage, domain, cache, output_dtype, data_file
+        )
+        LOGGER.info(
+            "Stage %s completed in %.2f s", stage, perf_counter() - start_time
+        )
+
+
+# How many bytes of the files of each stage can wait inside its queue to be
+# added to the archive; when the queue is full, the worker of the stage
+# stops until the parent process reads it
+STAGE_BUFFER_SIZE = 16 * STREAM_BUFFER_SIZE
+
+# How often (in seconds) the processes that wait on a queue check whether
+# the other side has failed
+POLL_INTERVAL = 0.5
+
+
+class _StageAborted(Exception):
+    """
+    Raised inside a worker process when the parent process does not read
+    the files of the stages anymore.
+    """
+
+
+# The domain and the queues used by the worker processes; they are set
+# before the workers are forked, so that they share the memory of the
+# parent process
+_WORKER_DOMAIN: Domain | None = None
+_WORKER_READY_QUEUE: Queue | None = None
+_WORKER_STAGE_QUEUES: dict[FluxStage, Queue] = {}
+_WORKER_ABORT: Event | None = None
+
+
+def _set_worker_state(
+    domain: Domain,
+    ready_queue: Queue,
+    stage_queues: dict[FluxStage, Queue],
+    abort: Event,
+):
+    global _WORKER_DOMAIN, _WORKER_READY_QUEUE, _WORKER_ABORT
+    global _WORKER_STAGE_QUEUES
+    _WORKER_DOMAIN = domain
+    _WORKER_READY_QUEUE = ready_queue
+    _WORKER_STAGE_QUEUES = stage_queues
+    _WORKER_ABORT = abort
+
+    # The parent process reads everything that the workers send before
+    # shutting them down, unless it has aborted; in that case, the data
+    # that is still inside the queues must not keep the workers alive
+    ready_queue.cancel_join_thread()
+    for queue in stage_queues.values():
+        queue.cancel_join_thread()
+
+
+def _put(queue: Queue, item):
+    while True:
+        if _WORKER_ABORT.is_set():
+            raise _StageAborted()
+        try:
+            queue.put(item, timeout=POLL_INTERVAL)
+            return
+        except Full:
+            pass
+
+
+def _iter_chunks(member: StreamMember) -> Iterator[bytes]:
+    """
+    Copy the blocks of a member into chunks of STREAM_BUFFER_SIZE bytes
+    (the last one may be shorter), checking that the member has the size
+    that it declares.
+    """
+    buffer = bytearray()
+    offset = 0
+    for block in member.blocks:
+        if isinstance(block, np.ndarray):
+            block = np.ascontiguousarray(block).reshape(-1).view(np.uint8)
+        data = memoryview(block).cast("B")
+        offset += len(data)
+        if offset > member.size:
+            raise ValueError(
+                f"Member {member.name} contains more than {member.size} bytes"
+            )
+        buffer += data
+        while len(buffer) >= STREAM_BUFFER_SIZE:
+            yield bytes(buffer[slice(0, STREAM_BUFFER_SIZE)])
+            del buffer[slice(0, STREAM_BUFFER_SIZE)]
+    if offset != member.size:
+        raise ValueError(
+            f"Member {member.name} contains {offset} bytes instead of "
+            f"{member.size}"
+        )
+    if buffer:
+        yield bytes(buffer)
+
+
+def _compute_stage(
+    stage: FluxStage,
+    cache: WeightsCache | None,
+    output_dtype: DTypeLike,
+    data_file: PathLike,
+):
+    start_time = perf_counter()
+    stage_queue = _WORKER_STAGE_QUEUES[stage]
+    try:
+        for member in iter_stage_members(
+            stage, _WORKER_DOMAIN, cache, output_dtype, data_file
+        ):
+            _put(
+                _WORKER_READY_QUEUE,
+                QueuedMember(stage, member.name, member.size),
+            )
+            for chunk in _iter_chunks(member):
+                _put(stage_queue, chunk)
+    except _StageAborted:
+        return
+    _put(_WORKER_READY_QUEUE, StageReport(stage, perf_counter() - start_time))
+
+
+def _get(queue: Queue, futures: Iterable[Future]):
+    while True:
+        try:
+            return queue.get(timeout=POLL_INTERVAL)
+        except Empty:
+            # If a worker has failed, its data will never arrive
+            for future in futures:
+                if future.done() and future.exception() is not None:
+                    raise future.exception()
+
+
+def _iter_queued_blocks(
+    member: QueuedMember,
+    queue: Queue,
+    futures: Iterable[Future],
+) -> Iterator[bytes]:
+    received = 0
+    while received < member.size:
+        chunk = _get(queue, futures)
+        received += len(chunk)
+        yield chunk
+
+
+def iter_parallel_flux_members(
+    domain: Domain,
+    jobs: int,
+    cache: WeightsCache | None = None,
+    output_dtype: DTypeLike = np.float32,
+    data_file: PathLike = DATA_FILE,
+) -> Iterator[StreamMember]:
+    """
+    Compute the same members of `iter_flux_members`, executing the stages
+    at the same time in a pool of `jobs` worker processes (at most one for
+    each stage).
+
+    The workers are forked from the current process, so they share the
+    memory pages of the decoded meshmask and of its derived fields (which
+    are computed before the workers are created) instead of receiving a
+    pickled copy. Each worker announces the files of its stage as soon as
+    it starts computing them, and it sends their content to this process
+    through a bounded queue, one chunk of STREAM_BUFFER_SIZE bytes at a
+    time; the members are yielded in the order in which they are announced
+    and their blocks are read directly from the queues. Nothing is written
+    on the disk or in shared memory.
+
+    When the queue of a stage is full (it contains STAGE_BUFFER_SIZE
+    bytes), its worker waits until the archive reaches its files: the
+    memory used by the files that are waiting is at most
+    `jobs * STAGE_BUFFER_SIZE`, on top of the working memory of each
+    generator. The cost is that a stage that completes its files while the
+    archive is busy with the files of another stage can not run ahead of
+    it by more than its buffer; the wall-clock time is still set by the
+    slowest stage when (as usual) its computation is slower than the
+    compression of the other files.
+
+    If the "fork" start method is not available on this platform, the
+    stages are executed one after the other by `iter_flux_members`.
+    """
+    if jobs < 1:
+        raise ValueError(f"The number of jobs must be positive: {jobs}")
+    if "fork" not in multiprocessing.get_all_start_methods():
+        LOGGER.warning(
+            "Worker processes can not share the meshmask on this platform; "
+            "the stages are executed one after the other"
+        )
+        yield from iter_flux_members(domain, cache, output_dtype, data_file)
+        return
+
+    # The workers inherit the derived fields only if they have already been
+    # computed
+    domain.bathymetry
+
+    context = multiprocessing.get_context("fork")
+    ready_queue = context.Queue()
+    stage_queues = {
+        stage: context.Queue(maxsize=STAGE_BUFFER_SIZE // STREAM_BUFFER_SIZE)
+        for stage in FluxStage
+    }
+    abort = context.Event()
+
+    # All the workers are forked when the first stage is submitted, i.e.
+    # when the first member is requested and before the archive writer
+    # starts its compression threads
+    start_time = perf_counter()
+    reports = []
+    with ProcessPoolExecutor(
+        max_workers=min(jobs, len(FluxStage)),
+        mp_context=context,
+        initializer=_set_worker_state,
+        initargs=(domain, ready_queue, stage_queues, abort),
+    ) as executor:
+        futures = [
+            executor.submit(
+                _compute_stage,
+                stage,
+                cache,
+                output_dtype,
+                data_file,
+            )
+            for stage in FluxStage
+        ]
+        try:
+            while len(reports) < len(futures):
+                item = _get(ready_queue, futures)
+                if isinstance(item, StageReport):
+                    ready_time = perf_counter() - start_time
+                    LOGGER.info(
+                        "Stage %s computed in %.2f s; its files have been "
+                        "sent after %.2f s",
+                        item.stage,
+                        item.compute_time,
+                        ready_time,
+                    )
+                    reports.append((item, ready_time))
+                    continue
+                yield StreamMember(
+                    name=item.name,
+                    size=item.size,
+                    blocks=_iter_queued_blocks(
+                        item, stage_queues[item.stage], futures
+                    ),
+                )
+            for future in futures:
+                future.result()
+        except BaseException:
+            # The workers that are waiting for this process to read their
+            # files stop as soon as they notice the abort
+            abort.set()
+            executor.shutdown(wait=True, cancel_futures=True)
+            raise
+
+    LOGGER.info("Timing of the stages (%s jobs):", jobs)
+    for report, ready_time in reports:
+        LOGGER.info(
+            "    %-20s computed in %8.2f s, sent after %8.2f s",
+            report.stage,
+            report.compute_time,
+            ready_time,
+        )
+    LOGGER.info(
+        "    all the stages archived after %.2f s", perf_counter() - start_time
+    )
+
+
+def write_fluxes(
+    domain: Domain,
+    output_dir: Path,
+    cache: WeightsCache | None = None,
+    output_dtype: DTypeLike = np.float32,
+    data_file: PathLike = DATA_FILE,
+):
+    """
+    Write the files produced by `iter_flux_members` inside a directory.
+    """
+    output_dir = Path(output_dir)
+    with AsyncWriter() as writer:
+        for member in iter_flux_members(
+            domain, cache, output_dtype, data_file
+        ):
+            for block in member.blocks:
+                writer.write(output_dir / member.name, block)
+
+
+def write_archive(
+    members: Iterable[StreamMember],
+    output_file: Path,
+    compression_level: int = DEFAULT_COMPRESSION_LEVEL,
+    compress: bool = True,
+):
+    """
+    Save some members inside a tar.gz archive, streaming their content
+    directly into the archive (without temporary files). The archive is
+    compressed by several threads (see `open_tar_writer`).
+
+    Inside the archive, the members are stored in a directory named after
+    the archive (without the ".tar.gz" suffix); the directory itself is also
+    added as a member of the archive, otherwise MER produces an error.
+
+    Args:
+        members: The members of the archive.
+        output_file: The path of the archive.
+        compression_level: The gzip compression level (from 0 to 9).
+        compress: If False, the archive is a plain (uncompressed) tar file.
+    """
+    output_stem = output_file.stem
+    if output_stem.lower().endswith(".tar"):
+        output_stem = Path(output_stem).stem
+
+    LOGGER.info("Writing data into archive %s", output_file)
+    with open_tar_writer(output_file, compression_level, compress) as tar:
+        for member in members:
+            start_time = perf_counter()
+            add_stream_member(
+                tar, member, arcname=f"{output_stem}/{member.name}"
+            )
+            LOGGER.info(
+                "%s (%.1f MB) computed and compressed in %.2f s",
+                member.name,
+                member.size / 1024**2,
+                perf_counter() - start_time,
+            )
+
+        # Add the directory where the files are stored as a tar object
+        # (otherwise MER produces an error)
+        data_dir = tarfile.TarInfo(name=output_stem)
+        data_dir.type = tarfile.DIRTYPE
+        set_tar_file_ownerships(data_dir)
+        data_dir.mode = 0o755
+
+        tar.addfile(data_dir)
@@ -1,12 +1,19 @@
 import argparse
 import logging
+from pathlib import Path
 
 import numpy as np
 from bitsea.utilities.argparse_types import existing_file_path
 from bitsea.utilities.argparse_types import path_inside_an_existing_dir
 
-from mitgcm_inputs.k_extinction.k_extinction import compute_k_extinction
+from mitgcm_inputs.commands import COMMAND_MAP
+from mitgcm_inputs.k_extinction.k_extinction import DATA_FILE
+from mitgcm_inputs.k_extinction.k_extinction import InterpolationMethod
+from mitgcm_inputs.k_extinction.k_extinction import write_k_extinction
+from mitgcm_inputs.tools.build_cache import CacheSpec
+from mitgcm_inputs.tools.cache_utils import default_cache_dir
 from mitgcm_inputs.tools.read_mesh_mask import read_mesh_mask
+from mitgcm_inputs.tools.weights_cache import WeightsCache
 
 if __name__ == "__main__":
     LOGGER = logging.getLogger()
@@ -16,10 +23,16 @@ else:
 
 COMMAND_NAME = "k_extinction"
 
+CACHE_SPEC = CacheSpec(
+    output_files=("output",),
+    ignored=("cache_dir", "no_cache", "workers"),
+    implicit_inputs=(DATA_FILE,),
+)
+
 
 def sub_arguments(subparser):
     parser = subparser.add_parser(
-        COMMAND_NAME, help="Generate K extinction coefficients"
+        COMMAND_NAME, help=COMMAND_MAP[COMMAND_NAME].help
     )
 
     parser.add_argument(
@@ -38,6 +51,99 @@ def sub_arguments(subparser):
         help="Path of the output file",
     )
 
+    parser.add_argument(
+        "--cache-dir",
+        required=False,
+        type=Path,
+        default=None,
+        help=f"""
+        Directory where the triangulation of the climatological data and the
+        interpolation weights of each domain are stored, so that they can be
+        reused by the following executions. By default, it is
+        {default_cache_dir()}
+        """,
+    )
+
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Do not read or write the cache of the interpolation weights",
+    )
+
+    parser.add_argument(
+        "--interpolation",
+        required=False,
+        type=InterpolationMethod,
+        choices=tuple(InterpolationMethod),
+        default=InterpolationMethod.DELAUNAY,
+        help="""
+        The algorithm used to interpolate the climatological data. The
+        default ("delaunay") triangulates the water cells of the
+        climatology as the previous versions did; when the whole
+        climatology is used (i.e., without --crop-margin) it reproduces
+        their outputs, up to the rounding of the last bit. "bilinear" (or
+        "auto", that uses it when the climatological grid is rectilinear)
+        is much faster, but its values are different from the ones of the
+        Delaunay triangulation on every cell (the triangles split each cell
+        of the climatology along a diagonal, while the bilinear
+        interpolation uses its four corners).
+        Default: %(default)s
+        """,
+    )
+
+    parser.add_argument(
+        "--crop-margin",
+        required=False,
+        type=int,
+        default=None,
+        help="""
+        If this option is submitted, only the cells of the climatology that
+        are inside the bounding box of the domain, plus CROP_MARGIN cells on
+        each side, are triangulated (the margin is enlarged automatically if
+        some points of the domain are not covered). This is faster on large
+        climatologies, but the Delaunay triangulation of a regular grid is
+        not unique, and the triangulation of the crop may split some cells
+        along the other diagonal: the values inside these cells are
+        different from the ones obtained with the whole climatology, which
+        is used by default.
+        """,
+    )
+
+    parser.add_argument(
+        "-w",
+        "--workers",
+        required=False,
+        type=int,
+        default=1,
+        help="""
+        Number of threads that compute the days of the year; each thread
+        writes its days directly into the output file. The output does not
+        depend on this value.
+        """,
+    )
+
+    parser.add_argument(
+        "--rank-tolerance",
+        required=False,
+        type=float,
+        default=None,
+        help="""
+        If this option is submitted, the climatology is approximated by its
+        leading spatial modes (the ones that explain at least 1 -
+        RANK_TOLERANCE of its variance) and only these modes are
+        interpolated on the domain; the error of the output, estimated on a
+        few days that are also interpolated exactly, is reported in the log.
+        This mode is seldom worth using: in the benchmark
+        (benchmarks/k_extinction_low_rank.py) it is slower than the exact
+        interpolation, which applies only a few weights to each cell, while
+        the reconstruction costs one operation per mode for each cell and
+        day and needs the whole climatology in memory. It can pay off only
+        when the climatology is explained by very few modes and reading it
+        day by day is expensive. By default, every day is interpolated
+        exactly.
+        """,
+    )
+
 
 def main(args: argparse.Namespace) -> int:
     if args.cmd != COMMAND_NAME:
@@ -46,14 +152,44 @@ def main(args: argparse.Namespace) -> int:
         )
         return 1
 
+    if args.workers < 1:
+        LOGGER.error("The number of workers must be positive")
+        return 2
+
+    if args.crop_margin is not None and args.crop_margin < 0:
+        LOGGER.error("The crop margin must be a non-negative integer")
+        return 2
+
+    if args.rank_tolerance is not None and not 0 <= args.rank_tolerance < 1:
+        LOGGER.error("The rank tolerance must be between 0 and 1")
+        return 2
+
     mask = read_mesh_mask(args.mask)
 
-    output_data = compute_k_extinction(mask)
+    if args.no_cache:
+        cache = None
+    else:
+        cache_dir = args.cache_dir
+        if cache_dir is None:
+            cache_dir = default_cache_dir()
+        LOGGER.debug("Using cache directory %s", cache_dir)
+        cache = WeightsCache(cache_dir)
+
     output_dtype = np.float32
 
+    # The days are written as soon as they are computed, so that we never
+    # need to keep the whole year in memory
     LOGGER.info("Writing output file: %s", args.output)
-    with open(args.output, "wb") as fw:
-        fw.write(output_data.kExt.values.astype(output_dtype).tobytes())
+    write_k_extinction(
+        mask,
+        args.output,
+        cache=cache,
+        output_dtype=output_dtype,
+        workers=args.workers,
+        crop_margin=args.crop_margin,
+        method=args.interpolation,
+        rank_tolerance=args.rank_tolerance,
+    )
     LOGGER.info("Execution completed!")
 
     return 0
@@ -1,56 +1,194 @@
 import logging
+import os
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from enum import StrEnum
 from os import PathLike
 from pathlib import Path
+from typing import NamedTuple
 
 import numpy as np
 import xarray as xr
 from bitsea.commons.mask import Mask
-from scipy.interpolate import LinearNDInterpolator
+from numpy.typing import DTypeLike
+from scipy.sparse import csr_matrix
 from scipy.spatial import Delaunay
+from scipy.spatial import QhullError
+
+from mitgcm_inputs.k_extinction.low_rank import decompose
+from mitgcm_inputs.tools.cache_utils import fingerprint_file
+from mitgcm_inputs.tools.interpolation import barycentric_interpolator
+from mitgcm_inputs.tools.interpolation import bilinear_interpolator
+from mitgcm_inputs.tools.interpolation import change_sources
+from mitgcm_inputs.tools.interpolation import neighbour_cells
+from mitgcm_inputs.tools.interpolation import rectilinear_axes
+from mitgcm_inputs.tools.interpolation import replace_invalid_rows
+from mitgcm_inputs.tools.interpolation import SparseInterpolator
+from mitgcm_inputs.tools.weights_cache import fingerprint_arrays
+from mitgcm_inputs.tools.weights_cache import WeightsCache
 
 DATA_FILE = Path(__file__).resolve().parent / "data" / "kExt_climatology.nc"
 
+# This number is part of the keys of the objects saved inside the cache; it
+# must be increased every time the way in which the interpolation weights are
+# computed changes, so that the old entries of the cache are not used anymore
+CACHE_VERSION = 3
+
+# How many days of the climatology are read from the data file at once
+DEFAULT_CHUNK_DAYS = 32
+
+# How many days (equally spaced along the year) are interpolated both
+# exactly and with the low-rank approximation to estimate the error of the
+# latter on the meshmask
+ERROR_SAMPLE_DAYS = 8
+
 
 LOGGER = logging.getLogger(__name__)
 
 
-def compute_k_extinction(
-    meshmask: Mask, data_file: PathLike = DATA_FILE
-) -> xr.Dataset:
+class InterpolationMethod(StrEnum):
     """
-    Compute the K extinction coefficients by interpolating climatological
-    values precomputed on a coarse but larger grid. The function produces a
-    map of K extinction coefficients for each day of the year.
+    The algorithms that can be used to interpolate the climatology.
 
-    Parameters:
-    meshmask (Mask): The meshmask defining the domain.
-    data_file (PathLike): Path to the climatological K extinction data file.
+    Attributes:
+        AUTO: Use the bilinear interpolation if the climatological grid is
+            rectilinear, the Delaunay triangulation otherwise
+        BILINEAR: Always use the bilinear interpolation; the climatological
+            grid must be rectilinear
+        DELAUNAY: Always use the piecewise linear interpolation on the
+            Delaunay triangulation of the water cells of the climatology
+            (the default; on the whole climatology, it reproduces the
+            historical outputs)
+    """
 
-    Returns:
-    xr.Dataset: Dataset containing K extinction coefficients
+    AUTO = "auto"
+    BILINEAR = "bilinear"
+    DELAUNAY = "delaunay"
+
+
+class Climatology(NamedTuple):
     """
-    LOGGER.info("Computing K extinction coefficients")
+    The part of the climatological data that is needed to interpolate the
+    K extinction coefficients on a specific domain.
 
-    LOGGER.debug("Meshmask shape: %s", meshmask.shape)
+    The values of the climatology are not kept in memory: they are read from
+    the data file only when they are needed, a block of days at a time (see
+    `iter_water_values`).
+
+    Attributes:
+        data_file: The path of the climatological data file.
+        n_days: The number of time steps of the climatology.
+        dtype: The dtype of the climatological values.
+        water_cells: A 2D boolean array that is True on the water cells of
+            the (cropped) climatological grid.
+        longitude: A 2D array with the longitude of the cropped grid.
+        latitude: A 2D array with the latitude of the cropped grid.
+        crop: The two slices that select the cropped grid inside the grid
+            of the data file.
+    """
+
+    data_file: Path
+    n_days: int
+    dtype: np.dtype
+    water_cells: np.ndarray
+    longitude: np.ndarray
+    latitude: np.ndarray
+    crop: tuple[slice, slice]
+
+    @property
+    def n_water_cells(self) -> int:
+        return int(np.count_nonzero(self.water_cells))
+
+    def read_water_values(self, days: range | None = None) -> np.ndarray:
+        """
+        Read the values of the water cells for some days.
 
-    LOGGER.debug("Reading data file: %s", data_file)
-    climatological_data = xr.load_dataset(data_file, engine="netcdf4")
+        Returns:
+            A 2D array; the first index is the day, the second one is the
+            water cell.
+        """
+        if days is None:
+            days = range(self.n_days)
+        with xr.open_dataset(self.data_file, engine="netcdf4") as data:
+            return self._read_days(data, days)
 
-    data_lon_min = np.min(climatological_data.longitude.values)
-    data_lon_max = np.max(climatological_data.longitude.values)
-    data_lat_min = np.min(climatological_data.latitude.values)
-    data_lat_max = np.max(climatological_data.latitude.values)
+    def iter_water_values(
+        self, chunk_days: int = DEFAULT_CHUNK_DAYS
+    ) -> Iterator[tuple[range, np.ndarray]]:
+        """
+        Read the values of the water cells `chunk_days` days at a time.
+
+        While the caller processes a block of days, a background thread
+        already reads the following one from the data file; in this way, at
+        most two blocks are in memory at the same time, no matter how many
+        time steps the climatology has.
+
+        Yields:
+            The range of the days of each block and a 2D array with their
+            values (the first index is the day, the second one is the water
+            cell).
+        """
+        if chunk_days < 1:
+            raise ValueError(
+                f"The number of days of each chunk must be positive: "
+                f"{chunk_days}"
+            )
+        day_blocks = [
+            range(start, min(start + chunk_days, self.n_days))
+            for start in range(0, self.n_days, chunk_days)
+        ]
+        if not day_blocks:
+            return
+
+        with xr.open_dataset(self.data_file, engine="netcdf4") as data:
+            with ThreadPoolExecutor(max_workers=1) as prefetcher:
+                next_block = prefetcher.submit(
+                    self._read_days, data, day_blocks[0]
+                )
+                for i, days in enumerate(day_blocks):
+                    values = next_block.result()
+                    if i + 1 < len(day_blocks):
+                        next_block = prefetcher.submit(
+                            self._read_days, data, day_blocks[i + 1]
+                        )
+                    yield days, values
+
+    def _read_days(self, data: xr.Dataset, days: range) -> np.ndarray:
+        LOGGER.debug(
+            "Reading days from %s to %s of %s",
+            days.start + 1,
+            days.stop,
+            self.data_file,
+        )
+        kext = data["kExt"]
+        spatial_dims = data.longitude.dims
+        selection = dict(zip(spatial_dims, self.crop))
+        selection[kext.dims[0]] = slice(days.start, days.stop)
+        return kext.isel(selection).values[:, self.water_cells]
+
+
+def _check_bounds(
+    grid_lon: np.ndarray,
+    grid_lat: np.ndarray,
+    mesh_lon: np.ndarray,
+    mesh_lat: np.ndarray,
+):
+    """
+    Raise a ValueError if the points of the meshmask are outside the range of
+    the climatological grid.
+    """
+    data_lon_min = np.min(grid_lon)
+    data_lon_max = np.max(grid_lon)
+    data_lat_min = np.min(grid_lat)
+    data_lat_max = np.max(grid_lat)
     LOGGER.debug(
-        "Data file loaded; grid lat: (%s, %s), grid lon: (%s, %s)",
+        "Data file opened; grid lat: (%s, %s), grid lon: (%s, %s)",
         data_lat_min,
         data_lat_max,
         data_lon_min,
         data_lon_max,
     )
 
-    mesh_lon = meshmask.xlevels[meshmask[0]]
-    mesh_lat = meshmask.ylevels[meshmask[0]]
-
     if (min_mesh_lon := np.min(mesh_lon)) < data_lon_min:
         raise ValueError(
             f"The minimum longitude of the meshmask ({min_mesh_lon:.2f}) is "
@@ -76,33 +214,545 @@ def compute_k_extinction(
             f"(from {data_lat_min:.2f} to {data_lat_max:.2f})"
         )
 
-    climatological_kext = climatological_data["kExt"].to_masked_array()
-    water_data_cells = ~np.ma.getmaskarray(climatological_kext[0, :, :])
 
-    grid_point_lon = climatological_data.longitude.values[water_data_cells]
-    grid_point_lat = climatological_data.latitude.values[water_data_cells]
+def _crop_slices(
+    grid_lon: np.ndarray,
+    grid_lat: np.ndarray,
+    mesh_lon: np.ndarray,
+    mesh_lat: np.ndarray,
+    margin: int,
+) -> tuple[slice, slice]:
+    """
+    Find the smallest rectangle of the climatological grid that contains all
+    the cells that are inside the bounding box of the meshmask, and then
+    enlarge it by `margin` cells on each side.
+    """
+    inside_bbox = (
+        (grid_lon >= np.min(mesh_lon))
+        & (grid_lon <= np.max(mesh_lon))
+        & (grid_lat >= np.min(mesh_lat))
+        & (grid_lat <= np.max(mesh_lat))
+    )
 
-    n_days = climatological_kext.shape[0]
-    output_shape = (n_days,) + meshmask.shape[1:]
-    LOGGER.debug("Output shape: %s", output_shape)
-    output = np.full(output_shape, np.nan, dtype=climatological_kext.dtype)
+    if not np.any(inside_bbox):
+        # The meshmask is smaller than a cell of the climatology; we start
+        # from the cell that is closest to its center
+        center_distance = np.abs(grid_lon - np.mean(mesh_lon)) + np.abs(
+            grid_lat - np.mean(mesh_lat)
+        )
+        inside_bbox = np.zeros_like(inside_bbox)
+        inside_bbox.flat[np.argmin(center_distance)] = True
 
-    triangulation = Delaunay(np.column_stack((grid_point_lon, grid_point_lat)))
+    crop = []
+    for axis in range(2):
+        indices = np.flatnonzero(inside_bbox.any(axis=1 - axis))
+        start = max(int(indices[0]) - margin, 0)
+        stop = min(int(indices[-1]) + margin + 1, inside_bbox.shape[axis])
+        crop.append(slice(start, stop))
+    return crop[0], crop[1]
 
-    for d in range(n_days):
-        LOGGER.debug("Processing day %s of %s", d + 1, n_days)
-        # It would be really nice if we could compute the interpolation once
-        # and then just change its values using the `set_values` method.
-        # Unfortunately, at the time being, the pull request
-        # https://github.com/scipy/scipy/pull/18376/commits/3b0bf8bc2b010d5d4f7bde5da75df6de8403d3c8
-        # is not released yet. So let's rebuild the same interpolator for 365
-        # times!
-        interpolator = LinearNDInterpolator(
-            triangulation, climatological_kext.data[d, water_data_cells]
+
+def _triangulation_interpolator(
+    grid_lon: np.ndarray,
+    grid_lat: np.ndarray,
+    water_cells: np.ndarray,
+    mesh_lon: np.ndarray,
+    mesh_lat: np.ndarray,
+    crop: tuple[slice, slice],
+    data_fingerprint: str | None,
+    cache: WeightsCache | None,
+) -> SparseInterpolator:
+    """
+    Triangulate the water cells of the climatology inside the crop and
+    compute the barycentric weights of the mesh points. The triangulation is
+    read from (and saved into) the cache if a cache is provided.
+    """
+    triangulation = None
+    triangulation_key = None
+    if cache is not None:
+        crop_description = "_".join(f"{s.start}-{s.stop}" for s in crop)
+        triangulation_key = (
+            f"kext_v{CACHE_VERSION}_tri_{data_fingerprint[:32]}_"
+            f"{crop_description}"
         )
-        day_data = interpolator(mesh_lon, mesh_lat)
+        triangulation = cache.get_object(triangulation_key)
 
-        output[d, meshmask[0]] = day_data
+    if triangulation is None:
+        LOGGER.debug("Triangulating the climatological grid")
+        cropped_water = water_cells[crop]
+        triangulation = Delaunay(
+            np.column_stack(
+                (grid_lon[crop][cropped_water], grid_lat[crop][cropped_water])
+            )
+        )
+        if cache is not None:
+            cache.put_object(triangulation_key, triangulation)
+
+    return barycentric_interpolator(
+        triangulation, np.column_stack((mesh_lon, mesh_lat))
+    )
+
+
+def _local_triangulation_interpolator(
+    axes: tuple[np.ndarray, np.ndarray],
+    water_cells: np.ndarray,
+    target_lon: np.ndarray,
+    target_lat: np.ndarray,
+    initial_radius: int = 2,
+) -> SparseInterpolator:
+    """
+    Interpolate some points of a rectilinear grid using the triangulation of
+    the water cells that surround them.
+
+    Only the water cells that are within a certain radius from the targets
+    are triangulated; the radius is doubled until all the targets are inside
+    the triangulation or until all the water cells are used. The columns of
+    the returned interpolator refer to all the water cells of the grid.
+    """
+    grid_lon, grid_lat = np.meshgrid(*axes)
+    water_indices = np.full(water_cells.shape, -1, dtype=np.int64)
+    water_indices[water_cells] = np.arange(np.count_nonzero(water_cells))
+
+    radius = initial_radius
+    while True:
+        near = water_cells & neighbour_cells(
+            axes[0], axes[1], target_lon, target_lat, radius
+        )
+        used_all = np.count_nonzero(near) == np.count_nonzero(water_cells)
+        try:
+            triangulation = Delaunay(
+                np.column_stack((grid_lon[near], grid_lat[near]))
+            )
+        except (QhullError, ValueError):
+            # Too few (or aligned) points to build a triangulation
+            triangulation = None
+
+        if triangulation is not None:
+            interpolator = barycentric_interpolator(
+                triangulation, np.column_stack((target_lon, target_lat))
+            )
+            if used_all or np.all(interpolator.valid):
+                return change_sources(
+                    interpolator,
+                    water_indices[near],
+                    np.count_nonzero(water_cells),
+                )
+        elif used_all:
+            return SparseInterpolator(
+                csr_matrix((len(target_lon), np.count_nonzero(water_cells))),
+                np.zeros(len(target_lon), dtype=bool),
+            )
+        radius *= 2
+
+
+def _crop_interpolator(
+    grid_lon: np.ndarray,
+    grid_lat: np.ndarray,
+    water_cells: np.ndarray,
+    mesh_lon: np.ndarray,
+    mesh_lat: np.ndarray,
+    crop: tuple[slice, slice],
+    method: InterpolationMethod,
+    data_fingerprint: str | None,
+    cache: WeightsCache | None,
+) -> SparseInterpolator:
+    """
+    Compute the interpolation weights of the mesh points with respect to the
+    water cells of the climatology inside the crop.
+
+    On a rectilinear grid, the bilinear weights are computed separately on
+    each axis; the mesh points that are surrounded only by land cells are
+    then interpolated using the Delaunay triangulation of the water cells
+    that are close to them.
+    """
+    if method != InterpolationMethod.DELAUNAY:
+        axes = rectilinear_axes(grid_lon[crop], grid_lat[crop])
+        if axes is None and method == InterpolationMethod.BILINEAR:
+            raise ValueError(
+                "The bilinear interpolation requires a rectilinear "
+                "climatological grid"
+            )
+        if axes is not None:
+            LOGGER.debug("Computing the bilinear interpolation weights")
+            interpolator = bilinear_interpolator(
+                axes[0], axes[1], water_cells[crop], mesh_lon, mesh_lat
+            )
+            missing = ~interpolator.valid
+            if np.any(missing):
+                LOGGER.debug(
+                    "%s points have no water cell around them; they will be "
+                    "interpolated with a triangulation",
+                    np.count_nonzero(missing),
+                )
+                fallback = _local_triangulation_interpolator(
+                    axes,
+                    water_cells[crop],
+                    mesh_lon[missing],
+                    mesh_lat[missing],
+                )
+                interpolator = replace_invalid_rows(interpolator, fallback)
+            return interpolator
+
+    return _triangulation_interpolator(
+        grid_lon,
+        grid_lat,
+        water_cells,
+        mesh_lon,
+        mesh_lat,
+        crop,
+        data_fingerprint,
+        cache,
+    )
+
+
+def _build_interpolator(
+    meshmask: Mask,
+    data_file: PathLike,
+    cache: WeightsCache | None,
+    crop_margin: int | None,
+    method: InterpolationMethod,
+) -> tuple[tuple[slice, slice], SparseInterpolator]:
+    """
+    Build the operator that interpolates the values of the climatological
+    water cells on the surface water cells of the meshmask.
+
+    This function reads only the coordinates and the land-sea mask of the
+    climatology. If `crop_margin` is not None, the climatological grid is
+    cut around the bounding box of the meshmask (see `_crop_slices`); if
+    some points of the meshmask fall outside the triangulation of the
+    cropped grid (for example, because there is a large portion of land
+    near the domain), the margin is enlarged until all the points are
+    covered or until the whole grid is used.
+
+    The crop is not the default because the Delaunay triangulation of a
+    regular grid is not unique: the four corners of each cell lie on the
+    same circle, and Qhull may split a cell of the cropped grid along the
+    other diagonal with respect to the triangulation of the whole grid. The
+    values of the points inside these cells change, so only the whole grid
+    reproduces the outputs of the previous versions.
+
+    The weights are computed with the algorithm specified by `method` (see
+    `InterpolationMethod`).
+
+    If a cache is provided, the interpolator is read from the cache when
+    possible, and it is written inside the cache otherwise.
+
+    Returns:
+        A tuple with the slices that define the cropped grid and the
+        interpolator; the columns of the interpolator refer to the water
+        cells of the cropped grid.
+    """
+    method = InterpolationMethod(method)
+    mesh_lon = meshmask.xlevels[meshmask[0]]
+    mesh_lat = meshmask.ylevels[meshmask[0]]
+
+    LOGGER.debug("Opening data file: %s", data_file)
+    with xr.open_dataset(data_file, engine="netcdf4") as climatological_data:
+        grid_lon = climatological_data.longitude.values
+        grid_lat = climatological_data.latitude.values
+
+        _check_bounds(grid_lon, grid_lat, mesh_lon, mesh_lat)
+
+        data_fingerprint = None
+        weights_key = None
+        if cache is not None:
+            data_fingerprint = fingerprint_file(data_file)
+            mesh_fingerprint = fingerprint_arrays(
+                meshmask.xlevels, meshmask.ylevels, meshmask[0]
+            )
+            weights_key = (
+                f"kext_v{CACHE_VERSION}_weights_{data_fingerprint[:32]}_"
+                f"{mesh_fingerprint[:32]}_{method}_margin{crop_margin}"
+            )
+            interpolator = cache.get_interpolator(weights_key)
+            crop = cache.get_object(weights_key + "_crop")
+            if interpolator is not None and crop is not None:
+                LOGGER.info(
+                    "Interpolation weights found in cache %s", cache.cache_dir
+                )
+                return crop, interpolator
+
+        # The land-sea mask of the climatology is read from the first day
+        kext = climatological_data["kExt"]
+        first_day = kext.isel({kext.dims[0]: 0}).to_masked_array()
+        water_cells = ~np.ma.getmaskarray(first_day)
+
+    full_grid = (slice(0, grid_lon.shape[0]), slice(0, grid_lon.shape[1]))
+    margin = crop_margin
+    while True:
+        if margin is None:
+            crop = full_grid
+        else:
+            crop = _crop_slices(grid_lon, grid_lat, mesh_lon, mesh_lat, margin)
+        LOGGER.debug(
+            "Cropping the climatology from shape %s to %s",
+            grid_lon.shape,
+            tuple(s.stop - s.start for s in crop),
+        )
+
+        interpolator = _crop_interpolator(
+            grid_lon,
+            grid_lat,
+            water_cells,
+            mesh_lon,
+            mesh_lat,
+            crop,
+            method,
+            data_fingerprint,
+            cache,
+        )
+        if crop == full_grid or np.all(interpolator.valid):
+            break
+
+        margin = 2 * margin + 1
+        LOGGER.debug(
+            "%s points are outside the cropped grid; the margin is enlarged "
+            "to %s cells",
+            np.count_nonzero(~interpolator.valid),
+            margin,
+        )
+
+    if cache is not None:
+        cache.put_interpolator(weights_key, interpolator)
+        cache.put_object(weights_key + "_crop", crop)
+
+    return crop, interpolator
+
+
+def climatology_n_days(data_file: PathLike = DATA_FILE) -> int:
+    """
+    Return the number of time steps of the climatological data file (i.e.,
+    the number of days produced by `iter_k_extinction`) without reading its
+    values.
+    """
+    with xr.open_dataset(data_file, engine="netcdf4") as climatological_data:
+        return climatological_data["kExt"].shape[0]
+
+
+def open_climatology(
+    data_file: PathLike = DATA_FILE,
+    crop: tuple[slice, slice] | None = None,
+) -> Climatology:
+    """
+    Open the climatological data inside a rectangle of its grid.
+
+    Only the coordinates and the land-sea mask (taken from the first day)
+    are read; the values are read later, a block of days at a time, by the
+    methods of the returned object. Therefore, the memory required by this
+    function scales with the size of the crop and it does not depend on the
+    number of time steps of the climatology.
+
+    Parameters:
+    data_file (PathLike): Path to the climatological K extinction data file.
+    crop (tuple[slice, slice] | None): The slices that select the rectangle
+        of the grid that must be read; if it is None, the whole grid is
+        read.
+
+    Returns:
+    Climatology: The cropped climatological data
+    """
+    LOGGER.debug("Opening data file: %s", data_file)
+    with xr.open_dataset(data_file, engine="netcdf4") as climatological_data:
+        grid_lon = climatological_data.longitude.values
+        grid_lat = climatological_data.latitude.values
+        if crop is None:
+            crop = (slice(0, grid_lon.shape[0]), slice(0, grid_lon.shape[1]))
+
+        spatial_dims = climatological_data.longitude.dims
+        climatological_kext = climatological_data["kExt"].isel(
+            dict(zip(spatial_dims, crop))
+        )
+        first_day = climatological_kext.isel(
+            {climatological_kext.dims[0]: 0}
+        ).to_masked_array()
+        n_days = climatological_kext.shape[0]
+        dtype = climatological_kext.dtype
+
+    return Climatology(
+        data_file=Path(data_file),
+        n_days=n_days,
+        dtype=dtype,
+        water_cells=~np.ma.getmaskarray(first_day),
+        longitude=grid_lon[crop],
+        latitude=grid_lat[crop],
+        crop=crop,
+    )
+
+
+class _DailyInterpolation:
+    """
+    Produce the values of the K extinction coefficients on the surface water
+    cells of the meshmask, one block of days at a time.
+
+    If `rank_tolerance` is None, each day is obtained by applying the
+    interpolator to the climatological values of that day, which are read
+    from the data file `chunk_days` days at a time. Otherwise, the
+    climatology is first decomposed into a few spatial modes (see
+    `low_rank.decompose`); only the mean and the modes are interpolated, and
+    each day is rebuilt as a linear combination of the interpolated modes.
+    The error of the output is estimated by interpolating a few days (see
+    `ERROR_SAMPLE_DAYS`) also with the exact path, and it is reported in the
+    log. The decomposition needs all the climatological values at the same
+    time, so in this case the whole (cropped) climatology is loaded in
+    memory.
+    """
+
+    def __init__(
+        self,
+        climatology: Climatology,
+        interpolator: SparseInterpolator,
+        rank_tolerance: float | None = None,
+        chunk_days: int = DEFAULT_CHUNK_DAYS,
+    ):
+        self.n_days = climatology.n_days
+        self.dtype = climatology.dtype
+        self._climatology = climatology
+        self._interpolator = interpolator
+        self._chunk_days = chunk_days
+
+        if rank_tolerance is None:
+            self._decomposition = None
+            return
+
+        values = climatology.read_water_values()
+        self._decomposition = decompose(values, rank_tolerance)
+        self._mean = interpolator.apply(self._decomposition.mean)
+        self._modes = interpolator.apply(self._decomposition.modes.T)
+
+        sample_days = np.unique(
+            np.linspace(
+                0, self.n_days - 1, min(ERROR_SAMPLE_DAYS, self.n_days)
+            ).astype(int)
+        )
+        exact = interpolator.apply(values[sample_days].T)
+        approximation = self.interpolate(
+            self._decomposition.coefficients[sample_days]
+        )
+        error = np.abs(approximation - exact)
+        LOGGER.info(
+            "Low-rank reconstruction: on %s sampled days, the error on the "
+            "meshmask is at most %.3e (rms %.3e)",
+            len(sample_days),
+            float(np.max(error)) if error.size else 0.0,
+            float(np.sqrt(np.mean(error**2))) if error.size else 0.0,
+        )
+
+    def iter_chunks(self) -> Iterator[tuple[range, np.ndarray]]:
+        """
+        Yield the range of the days of each block together with a 2D array
+        whose rows are the inputs of `interpolate` for these days.
+        """
+        if self._decomposition is None:
+            yield from self._climatology.iter_water_values(self._chunk_days)
+            return
+
+        coefficients = self._decomposition.coefficients
+        for start in range(0, self.n_days, self._chunk_days):
+            days = range(start, min(start + self._chunk_days, self.n_days))
+            yield days, coefficients[slice(days.start, days.stop)]
+
+    def interpolate(self, day_inputs: np.ndarray) -> np.ndarray:
+        """
+        Compute the values on the meshmask from one row (one day) or from
+        several rows of a block produced by `iter_chunks`.
+
+        Returns:
+            A 1D array with a value for each water cell of the meshmask if
+            `day_inputs` is a single row, otherwise a 2D array whose first
+            index is the cell and the second one is the day.
+        """
+        if self._decomposition is None:
+            return self._interpolator.apply(day_inputs.T)
+        return (day_inputs @ self._modes.T + self._mean).T
+
+
+def _prepare(
+    meshmask: Mask,
+    data_file: PathLike,
+    cache: WeightsCache | None,
+    crop_margin: int | None,
+    method: InterpolationMethod,
+    rank_tolerance: float | None,
+    chunk_days: int,
+) -> _DailyInterpolation:
+    LOGGER.info("Computing K extinction coefficients")
+    LOGGER.debug("Meshmask shape: %s", meshmask.shape)
+
+    # The position of the mesh points inside the triangulation does not depend
+    # on the day, so we compute the interpolation weights only once and then
+    # we apply them to all the days
+    crop, interpolator = _build_interpolator(
+        meshmask, data_file, cache, crop_margin, method
+    )
+    climatology = open_climatology(data_file, crop)
+
+    if climatology.n_water_cells != interpolator.n_source:
+        raise ValueError(
+            f"The interpolator expects {interpolator.n_source} water cells "
+            f"but {climatology.n_water_cells} have been read from "
+            f"{data_file}"
+        )
+    return _DailyInterpolation(
+        climatology, interpolator, rank_tolerance, chunk_days
+    )
+
+
+def compute_k_extinction(
+    meshmask: Mask,
+    data_file: PathLike = DATA_FILE,
+    cache: WeightsCache | None = None,
+    crop_margin: int | None = None,
+    method: InterpolationMethod = InterpolationMethod.DELAUNAY,
+    rank_tolerance: float | None = None,
+    chunk_days: int = DEFAULT_CHUNK_DAYS,
+) -> xr.Dataset:
+    """
+    Compute the K extinction coefficients by interpolating climatological
+    values precomputed on a coarse but larger grid. The function produces a
+    map of K extinction coefficients for each day of the year.
+
+    Parameters:
+    meshmask (Mask): The meshmask defining the domain.
+    data_file (PathLike): Path to the climatological K extinction data file.
+    cache (WeightsCache | None): If it is not None, the interpolation weights
+        are read from (or saved into) this cache, so that the geometric part
+        of the computation is executed only once for each domain.
+    crop_margin (int | None): How many cells of the climatology are kept
+        around the bounding box of the meshmask; if it is None (the
+        default), the whole climatology is used (see `_build_interpolator`).
+    method (InterpolationMethod): The interpolation algorithm.
+    rank_tolerance (float | None): If it is not None, only the leading
+        spatial modes of the climatology (the ones that explain at least
+        `1 - rank_tolerance` of its variance) are interpolated, and each day
+        is rebuilt from them.
+    chunk_days (int): How many days of the climatology are read from the
+        data file at once.
+
+    Returns:
+    xr.Dataset: Dataset containing K extinction coefficients
+    """
+    daily_interpolation = _prepare(
+        meshmask,
+        data_file,
+        cache,
+        crop_margin,
+        method,
+        rank_tolerance,
+        chunk_days,
+    )
+
+    n_days = daily_interpolation.n_days
+    output_shape = (n_days,) + meshmask.shape[1:]
+    LOGGER.debug("Output shape: %s", output_shape)
+    output = np.full(output_shape, np.nan, dtype=daily_interpolation.dtype)
+
+    # All the days of a block are interpolated at the same time
+    for days, day_inputs in daily_interpolation.iter_chunks():
+        LOGGER.debug(
+            "Interpolating days from %s to %s", days.start + 1, days.stop
+        )
+        day_data = daily_interpolation.interpolate(day_inputs)
+        output[slice(days.start, days.stop), meshmask[0]] = day_data.T
 
     LOGGER.debug("All days have been computed")
 
@@ -116,3 +766,182 @@ def compute_k_extinction(
             "longitude": (("x", "y"), meshmask.xlevels),
         },
     )
+
+
+def iter_k_extinction(
+    meshmask: Mask,
+    data_file: PathLike = DATA_FILE,
+    cache: WeightsCache | None = None,
+    output_dtype: DTypeLike = np.float32,
+    crop_margin: int | None = None,
+    method: InterpolationMethod = InterpolationMethod.DELAUNAY,
+    rank_tolerance: float | None = None,
+    chunk_days: int = DEFAULT_CHUNK_DAYS,
+) -> Iterator[np.ndarray]:
+    """
+    Compute the same K extinction coefficients of `compute_k_extinction`,
+    but one day at a time.
+
+    This generator yields a 2D array (with the same shape of the surface of
+    the meshmask) for each day of the year, already converted to
+    `output_dtype`. The memory required does not depend on the number of
+    days, so this is the function that must be used when the output is
+    written on a file.
+
+    Beware that the same array is reused for all the days: if the caller
+    needs to keep the values of a day, it must copy them before requesting
+    the next one.
+
+    Parameters:
+    meshmask (Mask): The meshmask defining the domain.
+    data_file (PathLike): Path to the climatological K extinction data file.
+    cache (WeightsCache | None): The cache of the interpolation weights (see
+        `compute_k_extinction`).
+    output_dtype (DTypeLike): The dtype of the yielded arrays.
+    crop_margin (int | None): How many cells of the climatology are kept
+        around the bounding box of the meshmask; if it is None (the
+        default), the whole climatology is used (see `_build_interpolator`).
+    method (InterpolationMethod): The interpolation algorithm.
+    rank_tolerance (float | None): If it is not None, only the leading
+        spatial modes of the climatology (the ones that explain at least
+        `1 - rank_tolerance` of its variance) are interpolated, and each day
+        is rebuilt from them.
+    chunk_days (int): How many days of the climatology are read from the
+        data file at once.
+
+    Yields:
+    np.ndarray: The K extinction coefficients of each day
+    """
+    daily_interpolation = _prepare(
+        meshmask,
+        data_file,
+        cache,
+        crop_margin,
+        method,
+        rank_tolerance,
+        chunk_days,
+    )
+
+    n_days = daily_interpolation.n_days
+    water_cells = meshmask[0]
+    day_output = np.full(meshmask.shape[1:], np.nan, dtype=output_dtype)
+    for days, day_inputs in daily_interpolation.iter_chunks():
+        for d, single_day_inputs in zip(days, day_inputs):
+            LOGGER.debug("Processing day %s of %s", d + 1, n_days)
+            day_output[water_cells] = daily_interpolation.interpolate(
+                single_day_inputs
+            )
+            yield day_output
+
+    LOGGER.debug("All days have been computed")
+
+
+def write_k_extinction(
+    meshmask: Mask,
+    output_file: PathLike,
+    data_file: PathLike = DATA_FILE,
+    cache: WeightsCache | None = None,
+    output_dtype: DTypeLike = np.float32,
+    workers: int = 1,
+    crop_margin: int | None = None,
+    method: InterpolationMethod = InterpolationMethod.DELAUNAY,
+    rank_tolerance: float | None = None,
+    chunk_days: int = DEFAULT_CHUNK_DAYS,
+):
+    """
+    Compute the K extinction coefficients and write them on a binary file.
+
+    The file contains the fields of all the days, one after the other, as
+    produced by `iter_k_extinction`. If `workers` is greater than 1, the days
+    of each chunk of the climatology are split in contiguous blocks that are
+    computed by a pool of threads;
+    each thread writes its days directly in the right position of the
+    output file, using a private buffer of one day. Every day is computed
+    exactly in the same way by the serial and by the parallel path, so the
+    output file does not depend on the number of workers.
+
+    Parameters:
+    meshmask (Mask): The meshmask defining the domain.
+    output_file (PathLike): The path of the binary file that will be written
+    data_file (PathLike): Path to the climatological K extinction data file.
+    cache (WeightsCache | None): The cache of the interpolation weights (see
+        `compute_k_extinction`).
+    output_dtype (DTypeLike): The dtype of the values saved on the file.
+    workers (int): The number of threads that compute the days.
+    crop_margin (int | None): How many cells of the climatology are kept
+        around the bounding box of the meshmask; if it is None (the
+        default), the whole climatology is used (see `_build_interpolator`).
+    method (InterpolationMethod): The interpolation algorithm.
+    rank_tolerance (float | None): If it is not None, only the leading
+        spatial modes of the climatology (the ones that explain at least
+        `1 - rank_tolerance` of its variance) are interpolated, and each day
+        is rebuilt from them.
+    chunk_days (int): How many days of the climatology are read from the
+        data file at once.
+    """
+    if workers < 1:
+        raise ValueError(f"The number of workers must be positive: {workers}")
+
+    if workers == 1:
+        with open(output_file, "wb") as fw:
+            for day_data in iter_k_extinction(
+                meshmask,
+                data_file,
+                cache,
+                output_dtype,
+                crop_margin,
+                method,
+                rank_tolerance,
+                chunk_days,
+            ):
+                fw.write(day_data.data)
+        return
+
+    LOGGER.debug("Using %s workers", workers)
+    daily_interpolation = _prepare(
+        meshmask,
+        data_file,
+        cache,
+        crop_margin,
+        method,
+        rank_tolerance,
+        chunk_days,
+    )
+
+    n_days = daily_interpolation.n_days
+    water_cells = meshmask[0]
+    day_shape = meshmask.shape[1:]
+    day_size = int(np.prod(day_shape)) * np.dtype(output_dtype).itemsize
+
+    def compute_block(fd: int, days: range, day_inputs: np.ndarray):
+        day_output = np.full(day_shape, np.nan, dtype=output_dtype)
+        for d, single_day_inputs in zip(days, day_inputs):
+            LOGGER.debug("Processing day %s of %s", d + 1, n_days)
+            day_output[water_cells] = daily_interpolation.interpolate(
+                single_day_inputs
+            )
+            os.pwrite(fd, day_output.data, d * day_size)
+
+    with open(output_file, "wb") as fw:
+        fw.truncate(n_days * day_size)
+        fd = fw.fileno()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # The climatology is read one chunk at a time (the next chunk is
+            # read while the workers process the current one); the days of
+            # each chunk are split among the workers
+            for days, day_inputs in daily_interpolation.iter_chunks():
+                block_size = max(1, -(-len(days) // workers))
+                blocks = [
+                    slice(i, i + block_size)
+                    for i in range(0, len(days), block_size)
+                ]
+                futures = [
+                    executor.submit(
+                        compute_block, fd, days[block], day_inputs[block]
+                    )
+                    for block in blocks
+                ]
+                for future in futures:
+                    future.result()
+
+    LOGGER.debug("All days have been computed")
@@ -0,0 +1,122 @@
+import logging
+from typing import NamedTuple
+
+import numpy as np
+
+LOGGER = logging.getLogger(__name__)
+
+
+class LowRankDecomposition(NamedTuple):
+    """
+    A low-rank approximation of a time series of spatial fields.
+
+    The approximation of the field of the day `d` is
+    `mean + coefficients[d] @ modes`.
+
+    Attributes:
+        mean: The temporal mean of the fields, with shape (n_cells,)
+        modes: The spatial modes (EOFs), with shape (rank, n_cells)
+        coefficients: The time coefficients of the modes, with shape
+            (n_days, rank)
+        explained_variance: The fraction of the variance of the fields
+            (around their mean) that is explained by the modes
+        max_error: The maximum absolute difference between the fields and
+            their approximation (on the cells of the fields, i.e. before any
+            interpolation)
+        rms_error: The root-mean-square difference between the fields and
+            their approximation (on the cells of the fields)
+    """
+
+    mean: np.ndarray
+    modes: np.ndarray
+    coefficients: np.ndarray
+    explained_variance: float
+    max_error: float
+    rms_error: float
+
+    @property
+    def rank(self) -> int:
+        return self.modes.shape[0]
+
+
+def decompose(
+    values: np.ndarray, tolerance: float, max_rank: int | None = None
+) -> LowRankDecomposition:
+    """
+    Decompose a time series of spatial fields into spatial modes and time
+    coefficients using a truncated singular value decomposition (empirical
+    orthogonal functions).
+
+    The rank is the smallest number of modes that explains at least
+    `1 - tolerance` of the variance of the fields around their temporal
+    mean.
+
+    Args:
+        values: A 2D array with shape (n_days, n_cells)
+        tolerance: The fraction of the variance that can be left
+            unexplained; it must be between 0 and 1
+        max_rank: If it is not None, the rank is never greater than this
+            value, even if the tolerance is not reached
+
+    Returns:
+        The low-rank decomposition of `values`
+    """
+    if not 0 <= tolerance < 1:
+        raise ValueError(
+            f"The tolerance must be between 0 and 1; received {tolerance}"
+        )
+
+    values = np.asarray(values, dtype=np.float64)
+    mean = values.mean(axis=0)
+    anomalies = values - mean
+
+    # The number of days is much smaller than the number of cells, so we
+    # compute the eigenvectors of the (n_days, n_days) Gram matrix of the
+    # anomalies instead of their full SVD; the eigenvalues are the squares
+    # of the singular values
+    LOGGER.debug("Decomposing a matrix of shape %s", values.shape)
+    gram = anomalies @ anomalies.T
+    variance, u = np.linalg.eigh(gram)
+    variance = np.clip(variance[::-1], 0, None)
+    u = u[:, ::-1]
+
+    total_variance = variance.sum()
+    if total_variance == 0:
+        rank = 0
+        explained_variance = 1.0
+    else:
+        cumulative = np.cumsum(variance) / total_variance
+        rank = int(np.searchsorted(cumulative, 1.0 - tolerance) + 1)
+        rank = min(rank, np.count_nonzero(variance))
+        if max_rank is not None:
+            rank = min(rank, max_rank)
+        explained_variance = float(cumulative[rank - 1]) if rank > 0 else 0.0
+
+    # The time coefficients are the projections of the anomalies on the
+    # modes; since the modes are orthonormal, they are u * singular_values
+    singular_values = np.sqrt(variance[:rank])
+    modes = (u[:, :rank].T @ anomalies) / singular_values[:, np.newaxis]
+    coefficients = anomalies @ modes.T
+
+    residual = anomalies - coefficients @ modes
+    max_error = float(np.max(np.abs(residual))) if residual.size else 0.0
+    rms_error = float(np.sqrt(np.mean(residual**2))) if residual.size else 0.0
+
+    LOGGER.info(
+        "Using %s modes out of %s; explained variance: %.6f; "
+        "approximation error of the source fields: max %.3e, rms %.3e",
+        rank,
+        len(variance),
+        explained_variance,
+        max_error,
+        rms_error,
+    )
+
+    return LowRankDecomposition(
+        mean=mean,
+        modes=modes,
+        coefficients=coefficients,
+        explained_variance=explained_variance,
+        max_error=max_error,
+        rms_error=rms_error,
+    )
@@ -0,0 +1,205 @@
+import argparse
+import logging
+from datetime import date
+
+import numpy as np
+from bitsea.utilities.argparse_types import existing_file_path
+from bitsea.utilities.argparse_types import path_inside_an_existing_dir
+
+from mitgcm_inputs.commands import COMMAND_MAP
+from mitgcm_inputs.kext_climatology.climatology import build_climatology
+from mitgcm_inputs.kext_climatology.climatology import DEFAULT_BINARY_DTYPE
+from mitgcm_inputs.kext_climatology.climatology import is_netcdf
+from mitgcm_inputs.kext_climatology.climatology import read_binary_field
+from mitgcm_inputs.kext_climatology.climatology import write_climatology
+from mitgcm_inputs.tools.build_cache import CacheSpec
+from mitgcm_inputs.tools.read_netcdf_coordinates import (
+    read_netcdf_coordinates,
+)
+
+if __name__ == "__main__":
+    LOGGER = logging.getLogger()
+else:
+    LOGGER = logging.getLogger(__name__)
+
+
+COMMAND_NAME = "kext_climatology"
+
+CACHE_SPEC = CacheSpec(output_files=("output",))
+
+
+def sub_arguments(subparser):
+    parser = subparser.add_parser(
+        COMMAND_NAME, help=COMMAND_MAP[COMMAND_NAME].help
+    )
+
+    parser.add_argument(
+        "-i",
+        "--inputs",
+        required=True,
+        nargs="+",
+        type=existing_file_path,
+        help="""
+        The files of the time series, in chronological order. The files
+        with the ".nc" suffix are read as netCDF files, all the others as
+        raw binary files (one 2D frame for each day, without headers)
+        """,
+    )
+
+    parser.add_argument(
+        "-o",
+        "--output",
+        required=True,
+        type=path_inside_an_existing_dir,
+        help="Path of the output netCDF file",
+    )
+
+    parser.add_argument(
+        "--shape",
+        required=False,
+        nargs=2,
+        type=int,
+        metavar=("NY", "NX"),
+        default=None,
+        help="The shape of the frames of the binary files",
+    )
+
+    parser.add_argument(
+        "--dtype",
+        required=False,
+        type=np.dtype,
+        default=np.dtype(DEFAULT_BINARY_DTYPE),
+        help=f"""
+        The dtype of the values of the binary files (the default,
+        "{DEFAULT_BINARY_DTYPE}", is the big-endian float32 used by MITgcm)
+        """,
+    )
+
+    parser.add_argument(
+        "--start-date",
+        required=False,
+        type=date.fromisoformat,
+        default=None,
+        help="""
+        The date (YYYY-MM-DD) of the first frame; it is required for the
+        files that do not have a time coordinate (e.g., the binary files)
+        """,
+    )
+
+    parser.add_argument(
+        "--longitude",
+        required=False,
+        type=existing_file_path,
+        default=None,
+        help="""
+        A binary file with the longitude of the cells (e.g., the XC file
+        of MITgcm); required when the first input is a binary file
+        """,
+    )
+
+    parser.add_argument(
+        "--latitude",
+        required=False,
+        type=existing_file_path,
+        default=None,
+        help="""
+        A binary file with the latitude of the cells (e.g., the YC file of
+        MITgcm); required when the first input is a binary file
+        """,
+    )
+
+    parser.add_argument(
+        "--land-mask",
+        required=False,
+        type=existing_file_path,
+        default=None,
+        help="""
+        A binary file with the fraction of water of each cell (e.g., the
+        hFacC file of MITgcm); the cells whose value is lower than the
+        water threshold are masked, and every water cell must have at least
+        one value in the time series. By default, only the cells that are
+        NaN on every frame are masked. On the water cells, the days of the
+        year without any value are interpolated from the closest days.
+        """,
+    )
+
+    parser.add_argument(
+        "--water-threshold",
+        required=False,
+        type=float,
+        default=1.0,
+        help="""
+        The minimum value of the land mask for a water cell (the default
+        keeps only the full cells)
+        """,
+    )
+
+    parser.add_argument(
+        "--variable",
+        required=False,
+        type=str,
+        default="kExt",
+        help="The name of the variable read from the netCDF files",
+    )
+
+
+def main(args: argparse.Namespace) -> int:
+    if args.cmd != COMMAND_NAME:
+        LOGGER.error(
+            "K extinction climatology command has been invoked with "
+            "command: %s",
+            args.cmd,
+        )
+        return 1
+
+    shape = tuple(args.shape) if args.shape is not None else None
+
+    if is_netcdf(args.inputs[0]):
+        longitude, latitude = read_netcdf_coordinates(
+            args.inputs[0], args.variable
+        )
+        if shape is not None and shape != longitude.shape:
+            LOGGER.error(
+                "The shape of the frames of %s is %s, but %s has been "
+                "submitted",
+                args.inputs[0],
+                longitude.shape,
+                shape,
+            )
+            return 2
+        shape = longitude.shape
+    else:
+        if shape is None or args.longitude is None or args.latitude is None:
+            LOGGER.error(
+                "The shape of the frames, the longitude and the latitude "
+                "must be submitted when the inputs are binary files"
+            )
+            return 2
+        longitude = read_binary_field(args.longitude, shape, args.dtype)
+        latitude = read_binary_field(args.latitude, shape, args.dtype)
+
+    water_cells = None
+    if args.land_mask is not None:
+        land_mask = read_binary_field(args.land_mask, shape, args.dtype)
+        water_cells = land_mask >= args.water_threshold
+        LOGGER.debug(
+            "%s water cells out of %s",
+            np.count_nonzero(water_cells),
+            land_mask.size,
+        )
+
+    climatology = build_climatology(
+        args.inputs,
+        longitude.astype(np.float64),
+        latitude.astype(np.float64),
+        water_cells=water_cells,
+        start_date=args.start_date,
+        binary_dtype=args.dtype,
+        variable=args.variable,
+    )
+
+    LOGGER.info("Writing output file: %s", args.output)
+    write_climatology(climatology, args.output)
+    LOGGER.info("Execution completed!")
+
+    return 0
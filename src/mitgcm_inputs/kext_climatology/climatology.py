@@ -0,0 +1,389 @@
+import logging
+from collections.abc import Iterable
+from collections.abc import Iterator
+from datetime import date
+from datetime import timedelta
+from os import PathLike
+from pathlib import Path
+
+import numpy as np
+import xarray as xr
+from numpy.typing import DTypeLike
+
+# The climatology has a value for each day of a non-leap year; the 29th of
+# February is merged with the 28th
+N_DAYS = 365
+
+# The dtype of the MITgcm binary files (big-endian float32)
+DEFAULT_BINARY_DTYPE = ">f4"
+
+NETCDF_SUFFIXES = (".nc", ".nc4", ".netcdf")
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+def day_of_year_index(current_date: date) -> int:
+    """
+    Return the index (from 0 to 364) of the day of the climatology that
+    contains `current_date`; the 29th of February is mapped on the same day
+    of the 28th.
+    """
+    if current_date.month == 2 and current_date.day == 29:
+        current_date = current_date.replace(day=28)
+    # 2001 is not a leap year
+    return current_date.replace(year=2001).timetuple().tm_yday - 1
+
+
+def read_binary_field(
+    file_path: PathLike, shape: tuple[int, int], dtype: DTypeLike
+) -> np.ndarray:
+    """
+    Read a 2D field (e.g., a coordinate or a mask) from a raw binary file.
+    """
+    field = np.fromfile(file_path, dtype=dtype)
+    if field.size != shape[0] * shape[1]:
+        raise ValueError(
+            f"File {file_path} contains {field.size} values, but a field "
+            f"with shape {shape} is expected"
+        )
+    return field.reshape(shape)
+
+
+def iter_binary_frames(
+    file_path: PathLike, shape: tuple[int, int], dtype: DTypeLike
+) -> Iterator[np.ndarray]:
+    """
+    Iterate over the 2D frames of a raw binary time series (one frame after
+    the other, without any header, as written by MITgcm).
+
+    The file is memory-mapped, so only the current frame is read from the
+    disk.
+    """
+    dtype = np.dtype(dtype)
+    frame_size = shape[0] * shape[1] * dtype.itemsize
+    file_size = Path(file_path).stat().st_size
+    if file_size % frame_size != 0:
+        raise ValueError(
+            f"The size of file {file_path} ({file_size} bytes) is not a "
+            f"multiple of the size of a frame with shape {shape} and dtype "
+            f"{dtype} ({frame_size} bytes)"
+        )
+    n_frames = file_size // frame_size
+    LOGGER.debug("File %s contains %s frames", file_path, n_frames)
+    if n_frames == 0:
+        return
+
+    frames = np.memmap(
+        file_path, dtype=dtype, mode="r", shape=(n_frames,) + tuple(shape)
+    )
+    yield from frames
+
+
+def _netcdf_dates(time_values: np.ndarray) -> list[date] | None:
+    if not np.issubdtype(time_values.dtype, np.datetime64):
+        return None
+    days = time_values.astype("datetime64[D]").astype(object)
+    return list(days)
+
+
+def iter_netcdf_frames(
+    file_path: PathLike, variable: str
+) -> Iterator[tuple[date | None, np.ndarray]]:
+    """
+    Iterate over the 2D frames of a variable of a netCDF file, whose first
+    dimension must be the time.
+
+    The file is opened lazily and only the current frame is read. If the
+    time coordinate contains dates, they are returned together with the
+    frames; otherwise, the date is None.
+    """
+    with xr.open_dataset(file_path, engine="netcdf4") as dataset:
+        data = dataset[variable]
+        time_dim = data.dims[0]
+        dates = None
+        if time_dim in dataset.coords:
+            dates = _netcdf_dates(dataset[time_dim].values)
+
+        LOGGER.debug(
+            "Variable %s of file %s contains %s frames",
+            variable,
+            file_path,
+            data.shape[0],
+        )
+        for i in range(data.shape[0]):
+            frame = data.isel({time_dim: i}).values
+            yield (dates[i] if dates is not None else None), frame
+
+
+def is_netcdf(file_path: PathLike) -> bool:
+    return Path(file_path).suffix.lower() in NETCDF_SUFFIXES
+
+
+def fill_circular_gaps(values: np.ndarray, chunk_size: int = 4096) -> int:
+    """
+    Replace (in place) the NaN values of each column of a 2D array (one row
+    for each day of the year) with a linear interpolation of the closest
+    valid values before and after them. The days are periodic: the gaps at
+    the beginning of the year are interpolated using the values at its end.
+    The columns without any valid value are left unchanged.
+
+    Returns the number of values that have been filled.
+    """
+    n_days = values.shape[0]
+    gaps = np.isnan(values)
+    to_fill = np.flatnonzero(np.any(gaps, axis=0) & ~np.all(gaps, axis=0))
+
+    # Three copies of the year, so that the valid values before and after
+    # each day of the central copy are always found
+    days = np.arange(3 * n_days)[:, np.newaxis]
+    central = slice(n_days, 2 * n_days)
+    n_filled = 0
+    for start in range(0, len(to_fill), chunk_size):
+        columns = to_fill[slice(start, start + chunk_size)]
+        extended = np.tile(values[:, columns], (3, 1))
+        valid = ~np.isnan(extended)
+
+        previous = np.maximum.accumulate(np.where(valid, days, -1), axis=0)
+        following = np.where(valid, days, 3 * n_days)[::-1]
+        following = np.minimum.accumulate(following, axis=0)[::-1]
+        previous = previous[central]
+        following = following[central]
+
+        previous_values = np.take_along_axis(extended, previous, axis=0)
+        following_values = np.take_along_axis(extended, following, axis=0)
+        distance = following - previous
+        weights = np.divide(
+            days[central] - previous,
+            distance,
+            out=np.zeros(distance.shape),
+            where=distance > 0,
+        )
+        filled = previous_values + weights * (
+            following_values - previous_values
+        )
+
+        column_gaps = gaps[:, columns]
+        values[:, columns] = np.where(column_gaps, filled, values[:, columns])
+        n_filled += np.count_nonzero(column_gaps)
+    return n_filled
+
+
+class DayOfYearAccumulator:
+    """
+    Accumulate the running sums and counts of a time series of 2D fields for
+    each day of the year.
+
+    Only the cells selected by `water_cells` are stored; the values that are
+    not finite (e.g., NaN on land) are ignored. The memory required does not
+    depend on the length of the time series.
+
+    Args:
+        water_cells: A 2D boolean array with the cells that must be
+            accumulated
+    """
+
+    def __init__(self, water_cells: np.ndarray):
+        self.water_cells = np.asarray(water_cells, dtype=bool)
+        n_cells = np.count_nonzero(self.water_cells)
+        self.sums = np.zeros((N_DAYS, n_cells), dtype=np.float64)
+        self.counts = np.zeros((N_DAYS, n_cells), dtype=np.uint32)
+        self.n_frames = 0
+
+    def add(self, day_index: int, frame: np.ndarray):
+        values = np.asarray(frame[self.water_cells], dtype=np.float64)
+        finite = np.isfinite(values)
+        self.sums[day_index, finite] += values[finite]
+        self.counts[day_index] += finite
+        self.n_frames += 1
+
+    def empty_cells(self) -> np.ndarray:
+        """
+        Return a 2D boolean array that is True on the accumulated cells that
+        have not received any value.
+        """
+        empty = np.zeros(self.water_cells.shape, dtype=bool)
+        empty[self.water_cells] = np.all(self.counts == 0, axis=0)
+        return empty
+
+    def mean(self, dtype: DTypeLike = np.float32) -> np.ndarray:
+        """
+        Return a 3D array with the mean of each day of the year.
+
+        If a cell has no value on some days, these days are interpolated
+        from the closest days with a value (see `fill_circular_gaps`). The
+        cells without any value (see `empty_cells`) are NaN.
+        """
+        output = np.full(
+            (N_DAYS,) + self.water_cells.shape, np.nan, dtype=dtype
+        )
+        with np.errstate(invalid="ignore", divide="ignore"):
+            day_means = self.sums / self.counts
+        day_means[self.counts == 0] = np.nan
+
+        missing_days = np.flatnonzero(np.all(self.counts == 0, axis=1))
+        if len(missing_days) > 0:
+            LOGGER.warning(
+                "%s days of the year do not have any value: %s",
+                len(missing_days),
+                (missing_days + 1).tolist(),
+            )
+
+        sampled = np.any(self.counts > 0, axis=0)
+        cells_with_gaps = np.count_nonzero(
+            sampled & np.any(self.counts == 0, axis=0)
+        )
+        if cells_with_gaps > 0:
+            n_filled = fill_circular_gaps(day_means)
+            LOGGER.warning(
+                "%s cells do not have a value for some days of the year; "
+                "%s missing values have been interpolated from the closest "
+                "days",
+                cells_with_gaps,
+                n_filled,
+            )
+
+        output[:, self.water_cells] = day_means
+        return output
+
+
+def iter_dated_frames(
+    input_files: Iterable[PathLike],
+    start_date: date | None,
+    shape: tuple[int, int] | None,
+    binary_dtype: DTypeLike = DEFAULT_BINARY_DTYPE,
+    variable: str = "kExt",
+) -> Iterator[tuple[date, np.ndarray]]:
+    """
+    Iterate over the frames of a sequence of daily time series.
+
+    The frames of all the files are considered consecutive days. The date of
+    each frame is taken from the time coordinate of the netCDF files, when
+    it is available; otherwise it is the day after the previous frame (the
+    first frame is on `start_date`).
+    """
+    next_date = start_date
+    for input_file in input_files:
+        LOGGER.info("Reading file %s", input_file)
+        if is_netcdf(input_file):
+            frames = iter_netcdf_frames(input_file, variable)
+        else:
+            if shape is None:
+                raise ValueError(
+                    f"The shape of the frames of {input_file} must be "
+                    f"specified"
+                )
+            binary_frames = iter_binary_frames(input_file, shape, binary_dtype)
+            frames = ((None, frame) for frame in binary_frames)
+
+        for frame_date, frame in frames:
+            if frame_date is None:
+                if next_date is None:
+                    raise ValueError(
+                        f"File {input_file} does not contain any date; the "
+                        f"date of the first frame must be specified"
+                    )
+                frame_date = next_date
+            yield frame_date, frame
+            next_date = frame_date + timedelta(days=1)
+
+
+def build_climatology(
+    input_files: Iterable[PathLike],
+    longitude: np.ndarray,
+    latitude: np.ndarray,
+    water_cells: np.ndarray | None = None,
+    start_date: date | None = None,
+    binary_dtype: DTypeLike = DEFAULT_BINARY_DTYPE,
+    variable: str = "kExt",
+    output_dtype: DTypeLike = np.float32,
+) -> xr.Dataset:
+    """
+    Build a day-of-year climatology from one or more daily time series.
+
+    The frames are read one at a time and added to the running sums of
+    their day of the year; the cells outside `water_cells` are masked as
+    soon as each frame is read. The days of the year without a value on a
+    water cell are interpolated from the closest days that have one, so
+    that the land-sea mask of the climatology is the same on every day.
+    The result has the same structure of the `kExt_climatology.nc` file
+    used by the k_extinction command.
+
+    Parameters:
+    input_files (Iterable[PathLike]): The files of the time series; the
+        files whose suffix is ".nc" are read as netCDF files, all the others
+        as raw binary files.
+    longitude (np.ndarray): The 2D longitude of the cells of the frames.
+    latitude (np.ndarray): The 2D latitude of the cells of the frames.
+    water_cells (np.ndarray | None): A 2D boolean array that is False on
+        land; every water cell must have at least one value in the time
+        series. If it is None, the cells without any finite value are land.
+    start_date (date | None): The date of the first frame, required for the
+        files that do not contain a time coordinate.
+    binary_dtype (DTypeLike): The dtype of the values of the binary files.
+    variable (str): The name of the variable read from the netCDF files.
+    output_dtype (DTypeLike): The dtype of the climatological values.
+
+    Returns:
+    xr.Dataset: A dataset with the `kExt` variable (one field for each day
+    of the year) and 2D `longitude` and `latitude` coordinates
+    """
+    shape = longitude.shape
+    explicit_water_cells = water_cells is not None
+    if water_cells is None:
+        water_cells = np.ones(shape, dtype=bool)
+    if water_cells.shape != shape:
+        raise ValueError(
+            f"The land-sea mask has shape {water_cells.shape}, but the "
+            f"coordinates have shape {shape}"
+        )
+
+    accumulator = DayOfYearAccumulator(water_cells)
+    for frame_date, frame in iter_dated_frames(
+        input_files, start_date, shape, binary_dtype, variable
+    ):
+        if frame.shape != shape:
+            raise ValueError(
+                f"The frame of {frame_date} has shape {frame.shape}, but "
+                f"the coordinates have shape {shape}"
+            )
+        accumulator.add(day_of_year_index(frame_date), frame)
+    LOGGER.info("%s frames have been read", accumulator.n_frames)
+
+    empty_cells = accumulator.empty_cells()
+    n_empty = np.count_nonzero(empty_cells)
+    if n_empty > 0 and explicit_water_cells:
+        raise ValueError(
+            f"{n_empty} water cells of the land-sea mask do not have any "
+            f"value in the time series"
+        )
+    if n_empty > 0:
+        LOGGER.info("%s cells without any value are considered land", n_empty)
+
+    return xr.Dataset(
+        data_vars={
+            "kExt": (("day", "y", "x"), accumulator.mean(output_dtype)),
+        },
+        coords={
+            "day": np.arange(1, N_DAYS + 1),
+            "longitude": (("y", "x"), longitude),
+            "latitude": (("y", "x"), latitude),
+        },
+    )
+
+
+def write_climatology(
+    climatology: xr.Dataset, output_file: PathLike, compression_level: int = 4
+):
+    """
+    Save a climatology on a netCDF file, compressing the kExt variable.
+    """
+    encoding = {
+        "kExt": {
+            "zlib": True,
+            "complevel": compression_level,
+            "_FillValue": np.nan,
+            "chunksizes": (1,) + climatology["kExt"].shape[1:],
+        }
+    }
+    climatology.to_netcdf(output_file, engine="netcdf4", encoding=encoding)
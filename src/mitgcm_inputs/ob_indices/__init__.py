@@ -3,11 +3,12 @@ import json
 import logging
 
 import xarray as xr
-from bitsea.commons.mask import MaskWithRivers
 from bitsea.utilities.argparse_types import existing_file_path
 from bitsea.utilities.argparse_types import path_inside_an_existing_dir
 
-from mitgcm_inputs.ob_indices.ob_indices import generate_ob_indices
+from mitgcm_inputs.commands import COMMAND_MAP
+from mitgcm_inputs.ob_indices.ob_indices import write_ob_indices
+from mitgcm_inputs.tools.build_cache import CacheSpec
 from mitgcm_inputs.tools.read_mesh_mask import read_mesh_mask
 
 if __name__ == "__main__":
@@ -18,10 +19,12 @@ else:
 
 COMMAND_NAME = "ob_indices"
 
+CACHE_SPEC = CacheSpec(output_files=("ob_indices", "nudge_indices"))
+
 
 def sub_arguments(subparser):
     parser = subparser.add_parser(
-        COMMAND_NAME, help="Generate OB indices for rivers and sponge layers"
+        COMMAND_NAME, help=COMMAND_MAP[COMMAND_NAME].help
     )
 
     parser.add_argument(
@@ -117,28 +120,18 @@ def main(args: argparse.Namespace) -> int:
             file_with_river, mask_and_scale=False, engine="netcdf4"
         ) as river_ds:
             river_map = river_ds["rivers"].load()
-
-        river_mask = MaskWithRivers(
-            grid=domain_mask.grid,
-            zlevels=domain_mask.zlevels,
-            mask_array=domain_mask[:],
-            river_positions=river_map,
-        )
         rivers_positions = json.loads(args.rivers_positions.read_text())
-        mesh_mask = river_mask
     else:
+        river_map = None
         rivers_positions = []
-        mesh_mask = domain_mask
 
-    open_bc_indices, ob_sponge = generate_ob_indices(
-        mask=mesh_mask,
+    write_ob_indices(
+        domain_mask,
         sponge_extent=args.sponge_extent,
+        river_map=river_map,
         rivers_positions=rivers_positions,
+        ob_indices_file=args.ob_indices,
+        nudge_indices_file=args.nudge_indices,
     )
 
-    if args.ob_indices is not None:
-        args.ob_indices.write_text(open_bc_indices)
-    if args.nudge_indices is not None:
-        args.nudge_indices.write_text(ob_sponge)
-
     return 0
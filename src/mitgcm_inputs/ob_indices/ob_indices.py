@@ -3,10 +3,13 @@ from collections.abc import Mapping
 from collections.abc import Sequence
 from enum import Enum
 from itertools import product as cart_prod
+from pathlib import Path
 from typing import Any
 
 import numpy as np
+import xarray as xr
 from bitsea.commons.mask import Mask
+from bitsea.commons.mask import MaskWithRivers
 from bitsea.components.component_mask_2d import ComponentMask2D
 
 LOGGER = logging.getLogger(__name__)
@@ -213,3 +216,53 @@ def generate_ob_indices(
         ob_sponge += "\n"
 
     return ob_indices, ob_sponge
+
+
+def write_ob_indices(
+    domain_mask: Mask,
+    sponge_extent: int,
+    river_map: xr.DataArray | None = None,
+    rivers_positions: Sequence[Mapping[str, Any]] = (),
+    ob_indices_file: Path | None = None,
+    nudge_indices_file: Path | None = None,
+):
+    """
+    Generate the OB indices of a domain (see `generate_ob_indices`) and
+    write them on the output files.
+
+    Args:
+        domain_mask: The meshmask of the domain.
+        sponge_extent: The extent of the sponge layer in number of cells.
+        river_map: A map that associates each river cell with its river id;
+            if it is None, the meshmask is used as it is (i.e., there are no
+            rivers on the domain).
+        rivers_positions: The content of the json file that describes the
+            position of the mouths of the rivers (empty if there are no
+            rivers on the domain).
+        ob_indices_file: The file where the OB indices are written (if it
+            is not None).
+        nudge_indices_file: The file where the nudge indices are written
+            (if it is not None).
+    """
+    if river_map is not None:
+        mesh_mask = MaskWithRivers(
+            grid=domain_mask.grid,
+            zlevels=domain_mask.zlevels,
+            mask_array=domain_mask[:],
+            river_positions=river_map,
+        )
+    else:
+        mesh_mask = domain_mask
+
+    open_bc_indices, ob_sponge = generate_ob_indices(
+        mask=mesh_mask,
+        sponge_extent=sponge_extent,
+        rivers_positions=rivers_positions,
+    )
+
+    if ob_indices_file is not None:
+        LOGGER.info("Writing OB indices into %s", ob_indices_file)
+        ob_indices_file.write_text(open_bc_indices)
+    if nudge_indices_file is not None:
+        LOGGER.info("Writing nudge indices into %s", nudge_indices_file)
+        nudge_indices_file.write_text(ob_sponge)
@@ -1,6 +1,7 @@
 import argparse
 import json
 import logging
+import tarfile
 from collections import OrderedDict
 from collections.abc import Iterable
 from collections.abc import Sequence
@@ -11,6 +12,7 @@ from typing import Literal
 
 import dask.array as da
 import numpy as np
+import pandas as pd
 import xarray as xr
 from bitsea.commons.mask import Mask
 from bitsea.utilities.argparse_types import existing_dir_path
@@ -18,7 +20,13 @@ from bitsea.utilities.argparse_types import existing_file_path
 from numpy.typing import DTypeLike
 from ogs_riverger.read_config import RiverConfig
 
+from mitgcm_inputs.tools.async_writer import iter_blocks
 from mitgcm_inputs.tools.read_mesh_mask import read_mesh_mask
+from mitgcm_inputs.tools.tar_utils import add_stream_member
+from mitgcm_inputs.tools.tar_utils import DEFAULT_COMPRESSION_LEVEL
+from mitgcm_inputs.tools.tar_utils import open_tar_writer
+from mitgcm_inputs.tools.tar_utils import set_tar_file_ownerships
+from mitgcm_inputs.tools.tar_utils import StreamMember
 
 LOGGER = logging.getLogger(__name__)
 
@@ -179,12 +187,32 @@ def get_spatial_description_from_meshmask(input_file: Path):
     Returns:
         A spatial description of our domain
     """
-    mask = read_mesh_mask(input_file)
+    return spatial_description_from_mask(read_mesh_mask(input_file))
+
+
+def spatial_description_from_mask(
+    mask: Mask, bathymetry: np.ndarray | None = None
+) -> xr.Dataset:
+    """
+    Build the spatial description (see
+    `get_spatial_description_from_meshmask`) of a meshmask that has already
+    been read.
+
+    Args:
+        mask: The meshmask of the domain.
+        bathymetry: The bathymetry of the meshmask (i.e., the output of
+            `mask.bathymetry()`); if it is None, it is computed.
+
+    Returns:
+        A spatial description of our domain
+    """
+    if bathymetry is None:
+        bathymetry = mask.bathymetry()
 
     spatial_description = mask.to_xarray()
 
     bathy = xr.DataArray(
-        mask.bathymetry(),
+        bathymetry,
         dims=("latitude", "longitude"),
     )
     spatial_description["bathymetry"] = bathy
@@ -664,6 +692,119 @@ def build_conc_and_relax_variables(
     return sources, salinity_and_concs
 
 
+def write_rbcs_files(
+    spatial_description: xr.Dataset,
+    sewage_positions: pd.DataFrame,
+    rivers_config: RiverConfig,
+    river_positions: Sequence[dict],
+    output_dir: Path,
+    compression_level: int = DEFAULT_COMPRESSION_LEVEL,
+    compress: bool = True,
+):
+    """
+    Write the archives with the concentration and the relaxation values for
+    the tracers (conc.tar.gz and relax.tar.gz) and the RBCS_names.txt file
+    inside `output_dir`.
+
+    Args:
+        spatial_description: The spatial description of the domain (see
+            `get_spatial_description_from_meshmask`).
+        sewage_positions: The sewage discharges inside the domain (see
+            `read_sewage_positions`).
+        rivers_config: The configuration of the rivers.
+        river_positions: The content of the json file that describes the
+            position of the mouths of the rivers.
+        output_dir: The directory where the files are written.
+        compression_level: The gzip compression level of the archives.
+        compress: If False, the archives are plain (uncompressed) tar files,
+            named conc.tar and relax.tar.
+    """
+
+    # This function checks if a river has the E. coli tracer enabled
+    def has_tracer(river):
+        river_id = river["id"]
+        if river_id not in rivers_config.root:
+            raise IndexError(
+                f"River id {river_id} not found in the main river config"
+            )
+        return len(rivers_config.root[river_id].concentrations) > 0
+
+    # Keep only rivers with tracers
+    rivers = tuple(r for r in river_positions if has_tracer(r))
+
+    sources, conc_and_relax = build_conc_and_relax_variables(
+        spatial_description=spatial_description,
+        sewage_points=sewage_positions.to_dict(orient="records"),
+        rivers=rivers,
+    )
+
+    if len(sources) == 0:
+        LOGGER.info(
+            "No tracers found for this domain, exiting without writing any "
+            "file"
+        )
+        return
+
+    archive_suffix = ".tar.gz" if compress else ".tar"
+
+    conc_file_path = output_dir / f"conc{archive_suffix}"
+    LOGGER.info("Compressing conc files into %s", conc_file_path)
+    with open_tar_writer(conc_file_path, compression_level, compress) as tar:
+        # Create the directory conc inside the file
+        relax_dir = tarfile.TarInfo(name="conc")
+        relax_dir.type = tarfile.DIRTYPE
+        set_tar_file_ownerships(relax_dir)
+        relax_dir.mode = 0o755
+        tar.addfile(relax_dir)
+
+        for data_var in conc_and_relax.data_vars:
+            if not data_var.startswith("conc"):
+                continue
+            current_conc_data = conc_and_relax[data_var].values
+            add_stream_member(
+                tar,
+                StreamMember(
+                    name=f"conc/{data_var}_bottom_fluxes.bin",
+                    size=current_conc_data.size * np.dtype("f4").itemsize,
+                    blocks=iter_blocks(current_conc_data, "f4"),
+                ),
+            )
+
+    config_string = build_domain_config_string(sources)
+    point_source_output = output_dir / "RBCS_names.txt"
+    LOGGER.info("Writing file %s", point_source_output)
+    point_source_output.write_text(config_string)
+
+    if not any(s["kind"] == "sewage" for s in sources):
+        LOGGER.info("No sewage inside this domain, skipping relaxation files")
+        return
+
+    relax_files = {
+        "relaxed_salinity": "bottom_sources_S_relaxation.bin",
+        "salinity_mask": "bottom_sources_S_mask.bin",
+    }
+    relax_file_path = output_dir / f"relax{archive_suffix}"
+    LOGGER.info("Compressing relax files into %s", relax_file_path)
+    with open_tar_writer(relax_file_path, compression_level, compress) as tar:
+        # Create the directory relax inside the file
+        relax_dir = tarfile.TarInfo(name="relax")
+        relax_dir.type = tarfile.DIRTYPE
+        set_tar_file_ownerships(relax_dir)
+        relax_dir.mode = 0o755
+        tar.addfile(relax_dir)
+
+        for var_name, file_name in relax_files.items():
+            current_data_array = conc_and_relax[var_name].values
+            add_stream_member(
+                tar,
+                StreamMember(
+                    name=f"relax/{file_name}",
+                    size=current_data_array.size * np.dtype("f4").itemsize,
+                    blocks=iter_blocks(current_data_array, "f4"),
+                ),
+            )
+
+
 def main():
     args = argument()
 
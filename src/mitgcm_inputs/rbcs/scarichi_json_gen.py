@@ -17,6 +17,22 @@ from mitgcm_inputs.tools.read_mesh_mask import read_mesh_mask
 LOGGER = logging.getLogger()
 
 
+# The Copernicus Marine product (and the period) from which the average
+# salinity at the sewage discharges is computed
+SALINITY_DATASET_ID = "cmems_mod_med_phy-sal_my_4.2km_P1M-m"
+SALINITY_START_DATETIME = "2012-01-01T00:00:00"
+SALINITY_END_DATETIME = "2021-12-31T00:00:00"
+
+# The description of the downloaded salinity used by the build cache (see
+# `CacheSpec.remote_inputs`); the product is a reanalysis, so the data of a
+# given period does not change
+SALINITY_REMOTE_INPUTS = (
+    SALINITY_DATASET_ID,
+    SALINITY_START_DATETIME,
+    SALINITY_END_DATETIME,
+)
+
+
 def argument():
     parser = argparse.ArgumentParser(description="""
     Reads sewage info on excel file and for all the domains
@@ -91,20 +107,16 @@ def load_salinity_dataset(
         The salinity dataset averaged over the time dimension within the
         specified geographic and depth constraints.
     """
-    t0 = "2012-01-01T00:00:00"
-    t1 = "2021-12-31T00:00:00"
-    dataset = "cmems_mod_med_phy-sal_my_4.2km_P1M-m"
-
     sal = cm.open_dataset(
-        dataset_id=dataset,
+        dataset_id=SALINITY_DATASET_ID,
         # dataset_version = version,
         variables=["so"],
         minimum_longitude=minimum_longitude,
         maximum_longitude=maximum_longitude,
         minimum_latitude=minimum_latitude,
         maximum_latitude=maximum_latitude,
-        start_datetime=t0,
-        end_datetime=t1,
+        start_datetime=SALINITY_START_DATETIME,
+        end_datetime=SALINITY_END_DATETIME,
         maximum_depth=maximum_depth,
     ).mean(dim="time")
 
@@ -113,7 +125,7 @@ def load_salinity_dataset(
 
 
 def read_sewage_positions(
-    excel_file: Path, meshmask_file: Path
+    excel_file: Path, meshmask_file: Path | Mask
 ) -> pd.DataFrame:
     """
     Reads the Excel file that describes the position of the sewage discharges.
@@ -126,6 +138,7 @@ def read_sewage_positions(
     Args:
         excel_file: The path of the excel_file that must be read
         meshmask_file: the mesh mask file that describes the current domain
+          (or the meshmask itself, if it has already been read)
 
     Returns:
         A pandas dataframe containing the sewage discharges; each row is a
@@ -152,8 +165,11 @@ def read_sewage_positions(
     filtered_df = df[df["Dominio"] > 0]
     LOGGER.info("Excel file read")
 
-    LOGGER.debug("Reading meshmask file %s", meshmask_file)
-    domain_mask = read_mesh_mask(meshmask_file)
+    if isinstance(meshmask_file, Mask):
+        domain_mask = meshmask_file
+    else:
+        LOGGER.debug("Reading meshmask file %s", meshmask_file)
+        domain_mask = read_mesh_mask(meshmask_file)
 
     x0, x1 = domain_mask.lon.min() - 0.5, domain_mask.lon.max() + 0.5
     y0, y1 = domain_mask.lat.min() - 0.5, domain_mask.lat.max() + 0.5
@@ -1,15 +1,25 @@
 import argparse
 import logging
+from pathlib import Path
 
 import numpy as np
 from bitsea.utilities.argparse_types import dir_to_be_created_if_not_exists
 from bitsea.utilities.argparse_types import existing_file_path
 
+from mitgcm_inputs.commands import COMMAND_MAP
+from mitgcm_inputs.surface_deposition.gridded import OutputFrequency
+from mitgcm_inputs.surface_deposition.gridded import RegriddingMethod
+from mitgcm_inputs.surface_deposition.gridded import (
+    write_gridded_surface_deposition,
+)
 from mitgcm_inputs.surface_deposition.surface_deposition import (
     compute_surface_deposition,
 )
+from mitgcm_inputs.tools.build_cache import CacheSpec
+from mitgcm_inputs.tools.cache_utils import default_cache_dir
 from mitgcm_inputs.tools.read_mesh_mask import read_mesh_mask
 from mitgcm_inputs.tools.save_dataset import save_dataset
+from mitgcm_inputs.tools.weights_cache import WeightsCache
 
 if __name__ == "__main__":
     LOGGER = logging.getLogger()
@@ -19,11 +29,14 @@ else:
 
 COMMAND_NAME = "surface_deposition"
 
+CACHE_SPEC = CacheSpec(
+    output_dirs=("output",), ignored=("cache_dir", "no_cache")
+)
+
 
 def sub_arguments(subparser):
     parser = subparser.add_parser(
-        COMMAND_NAME,
-        help="Generate the surface deposition climatological data",
+        COMMAND_NAME, help=COMMAND_MAP[COMMAND_NAME].help
     )
 
     parser.add_argument(
@@ -51,6 +64,70 @@ def sub_arguments(subparser):
         help="Name of the output files",
     )
 
+    parser.add_argument(
+        "--n-days",
+        required=False,
+        type=int,
+        default=None,
+        help="""
+        If this option is submitted, each output file contains N_DAYS
+        identical frames (one for each day) instead of a single field
+        """,
+    )
+
+    parser.add_argument(
+        "-s",
+        "--source",
+        required=False,
+        type=existing_file_path,
+        default=None,
+        help="""
+        A netCDF file with a gridded climatology of the deposition (one
+        variable for each output file, with dimensions record, latitude and
+        longitude on a rectilinear grid). If it is submitted, its records
+        are regridded on the domain and interpolated in time; otherwise,
+        the deposition is constant. In both cases, every cell of the output
+        has a deposition value, land cells included (the gridded source is
+        regridded on the land cells as on the water ones)
+        """,
+    )
+
+    parser.add_argument(
+        "--regridding",
+        required=False,
+        type=RegriddingMethod,
+        choices=tuple(RegriddingMethod),
+        default=RegriddingMethod.BILINEAR,
+        help="The algorithm used to regrid the gridded source",
+    )
+
+    parser.add_argument(
+        "--frequency",
+        required=False,
+        type=OutputFrequency,
+        choices=tuple(OutputFrequency),
+        default=OutputFrequency.DAILY,
+        help="The time step of the frames regridded from the gridded source",
+    )
+
+    parser.add_argument(
+        "--cache-dir",
+        required=False,
+        type=Path,
+        default=None,
+        help=f"""
+        Directory where the regridding weights of each domain are stored,
+        so that they can be reused by the following executions. By default,
+        it is {default_cache_dir()}
+        """,
+    )
+
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Do not read or write the cache of the regridding weights",
+    )
+
 
 def main(args: argparse.Namespace) -> int:
     if args.cmd != COMMAND_NAME:
@@ -60,11 +137,45 @@ def main(args: argparse.Namespace) -> int:
         )
         return 1
 
-    mask = read_mesh_mask(args.mask)
+    if args.n_days is not None and args.n_days < 1:
+        LOGGER.error("The number of days must be positive")
+        return 2
+
+    if args.source is not None and args.n_days is not None:
+        LOGGER.error(
+            "The number of days can not be submitted together with a "
+            "gridded source"
+        )
+        return 2
 
-    output_data = compute_surface_deposition(mask)
+    mask = read_mesh_mask(args.mask)
     output_dtype = np.float32
 
+    if args.source is not None:
+        if args.no_cache:
+            cache = None
+        else:
+            cache_dir = args.cache_dir
+            if cache_dir is None:
+                cache_dir = default_cache_dir()
+            LOGGER.debug("Using cache directory %s", cache_dir)
+            cache = WeightsCache(cache_dir)
+
+        write_gridded_surface_deposition(
+            mask,
+            args.source,
+            args.output,
+            args.output_name,
+            method=args.regridding,
+            frequency=args.frequency,
+            cache=cache,
+            output_dtype=output_dtype,
+        )
+        LOGGER.info("Execution completed!")
+        return 0
+
+    output_data = compute_surface_deposition(mask, n_days=args.n_days)
+
     save_dataset(
         output_data,
         args.output,
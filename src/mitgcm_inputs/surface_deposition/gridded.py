@@ -0,0 +1,460 @@
+import logging
+from collections.abc import Sequence
+from enum import StrEnum
+from os import PathLike
+from pathlib import Path
+from typing import NamedTuple
+
+import numpy as np
+import xarray as xr
+from bitsea.commons.mask import Mask
+from numpy.typing import DTypeLike
+
+from mitgcm_inputs.surface_deposition.surface_deposition import VAR_VALUES
+from mitgcm_inputs.tools.async_writer import AsyncWriter
+from mitgcm_inputs.tools.interpolation import bilinear_interpolator
+from mitgcm_inputs.tools.interpolation import cell_edges
+from mitgcm_inputs.tools.interpolation import conservative_interpolator
+from mitgcm_inputs.tools.interpolation import nearest_interpolator
+from mitgcm_inputs.tools.interpolation import rectilinear_axes
+from mitgcm_inputs.tools.interpolation import replace_invalid_rows
+from mitgcm_inputs.tools.interpolation import SparseInterpolator
+from mitgcm_inputs.tools.read_netcdf_coordinates import (
+    read_netcdf_coordinates,
+)
+from mitgcm_inputs.tools.weights_cache import fingerprint_arrays
+from mitgcm_inputs.tools.weights_cache import WeightsCache
+
+LOGGER = logging.getLogger(__name__)
+
+
+# This number is part of the keys of the regridding weights saved inside the
+# cache; it must be increased every time the way in which the weights are
+# computed changes
+CACHE_VERSION = 2
+
+N_DAYS = 365
+
+DAYS_PER_MONTH = (31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+
+
+class RegriddingMethod(StrEnum):
+    """
+    The algorithms that can be used to regrid the deposition fields.
+
+    Attributes:
+        BILINEAR: Bilinear interpolation of the source cells around the
+            center of each cell of the meshmask
+        CONSERVATIVE: First-order conservative remapping (the average of
+            the source cells that overlap each cell of the meshmask,
+            weighted by the area of the overlap); the meshmask must be a
+            rectilinear longitude-latitude grid
+    """
+
+    BILINEAR = "bilinear"
+    CONSERVATIVE = "conservative"
+
+
+class OutputFrequency(StrEnum):
+    """
+    The time step of the frames written on the output files.
+
+    Attributes:
+        DAILY: One frame for each day of the year (365 frames)
+        MONTHLY: One frame for each month (12 frames)
+    """
+
+    DAILY = "daily"
+    MONTHLY = "monthly"
+
+
+def record_days(n_records: int) -> np.ndarray:
+    """
+    Return the time (in days since the beginning of the year) of the center
+    of each record of a climatology.
+
+    A climatology with 12 records is assumed to be monthly, so its records
+    are placed in the middle of each month; otherwise, the records are
+    equally spaced along the year.
+    """
+    if n_records == len(DAYS_PER_MONTH):
+        month_length = np.array(DAYS_PER_MONTH, dtype=np.float64)
+        return np.cumsum(month_length) - 0.5 * month_length
+    return (np.arange(n_records) + 0.5) * N_DAYS / n_records
+
+
+def frame_days(frequency: OutputFrequency) -> np.ndarray:
+    """
+    Return the time (in days since the beginning of the year) of the center
+    of each frame of the output files.
+    """
+    if OutputFrequency(frequency) == OutputFrequency.MONTHLY:
+        return record_days(len(DAYS_PER_MONTH))
+    return np.arange(N_DAYS) + 0.5
+
+
+def time_interpolation(
+    source_days: np.ndarray, target_days: np.ndarray, period: float = N_DAYS
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Compute the weights of the linear interpolation in time of a periodic
+    climatology: the value of each target time is `(1 - w) * previous +
+    w * following`, where the last record of the year precedes the first
+    one.
+
+    Args:
+        source_days: The (increasing) times of the records.
+        target_days: The times where the climatology must be evaluated.
+        period: The length of the period.
+
+    Returns:
+        The index of the previous record, the index of the following record
+        and the weight `w` of the following record for each target time.
+    """
+    source_days = np.asarray(source_days, dtype=np.float64)
+    target_days = np.asarray(target_days, dtype=np.float64) % period
+    n_records = len(source_days)
+    if n_records == 1:
+        zeros = np.zeros(len(target_days), dtype=int)
+        return zeros, zeros, np.zeros(len(target_days))
+
+    extended = np.concatenate(
+        ([source_days[-1] - period], source_days, [source_days[0] + period])
+    )
+    index = np.searchsorted(extended, target_days, side="right") - 1
+    index = np.clip(index, 0, n_records)
+    weight = (target_days - extended[index]) / (
+        extended[index + 1] - extended[index]
+    )
+    return (index - 1) % n_records, index % n_records, weight
+
+
+class GriddedSource(NamedTuple):
+    """
+    A gridded climatology of the surface deposition, stored in a netCDF
+    file.
+
+    Each variable has dimensions (record, latitude, longitude) and it is
+    defined on a rectilinear grid; the cells that are not finite on the
+    first record of some variable are not used.
+
+    Attributes:
+        data_file: The path of the netCDF file.
+        variables: The names of the variables that are read.
+        longitude: The 1D longitude axis of the grid.
+        latitude: The 1D latitude axis of the grid.
+        source_cells: A 2D boolean array that is True on the valid cells.
+        n_records: The number of records of each variable.
+    """
+
+    data_file: Path
+    variables: tuple[str, ...]
+    longitude: np.ndarray
+    latitude: np.ndarray
+    source_cells: np.ndarray
+    n_records: int
+
+    @property
+    def record_days(self) -> np.ndarray:
+        return record_days(self.n_records)
+
+    def read_records(
+        self, variable: str, window: tuple[slice, slice] | None = None
+    ) -> np.ndarray:
+        """
+        Return an array with shape (n_records, n_cells) with the values of a
+        variable on the valid cells inside `window` (a pair of slices along
+        the latitude and the longitude; by default, the whole grid).
+
+        The records are read one at a time, and only the window is read
+        from each of them, so the whole variable is never loaded in memory.
+        """
+        if window is None:
+            window = (slice(None), slice(None))
+        window_cells = self.source_cells[window]
+        with xr.open_dataset(self.data_file, engine="netcdf4") as data:
+            values = data[variable]
+            records = np.empty(
+                (self.n_records, np.count_nonzero(window_cells)),
+                dtype=values.dtype,
+            )
+            for r in range(self.n_records):
+                record = values.isel(
+                    {
+                        values.dims[0]: r,
+                        values.dims[1]: window[0],
+                        values.dims[2]: window[1],
+                    }
+                )
+                records[r] = record.values[window_cells]
+        return records
+
+
+def open_gridded_source(
+    data_file: PathLike, variables: Sequence[str] = tuple(VAR_VALUES)
+) -> GriddedSource:
+    """
+    Read the grid of a gridded climatology of the surface deposition; the
+    values of the variables are read later, one variable at a time.
+    """
+    variables = tuple(variables)
+    LOGGER.debug("Opening gridded source: %s", data_file)
+    longitude, latitude = read_netcdf_coordinates(data_file, variables[0])
+    axes = rectilinear_axes(longitude, latitude)
+    if axes is None:
+        raise ValueError(
+            f"The grid of file {data_file} must be a rectilinear "
+            f"longitude-latitude grid"
+        )
+
+    source_cells = np.ones(longitude.shape, dtype=bool)
+    n_records = None
+    with xr.open_dataset(data_file, engine="netcdf4") as data:
+        for variable in variables:
+            if variable not in data.variables:
+                raise ValueError(
+                    f"Variable {variable} not found in file {data_file}"
+                )
+            values = data[variable]
+            if values.ndim != 3 or values.shape[1:] != longitude.shape:
+                raise ValueError(
+                    f"Variable {variable} of file {data_file} must have "
+                    f"dimensions (record, latitude, longitude)"
+                )
+            if n_records is None:
+                n_records = values.shape[0]
+            elif values.shape[0] != n_records:
+                raise ValueError(
+                    f"The variables of file {data_file} have a different "
+                    f"number of records"
+                )
+            first_record = values.isel({values.dims[0]: 0}).values
+            source_cells &= np.isfinite(first_record)
+
+    return GriddedSource(
+        data_file=Path(data_file),
+        variables=variables,
+        longitude=axes[0],
+        latitude=axes[1],
+        source_cells=source_cells,
+        n_records=n_records,
+    )
+
+
+def _check_coverage(
+    source: GriddedSource, mesh_lon: np.ndarray, mesh_lat: np.ndarray
+):
+    for name, axis, points in (
+        ("longitude", source.longitude, mesh_lon),
+        ("latitude", source.latitude, mesh_lat),
+    ):
+        if np.min(points) < np.min(axis) or np.max(points) > np.max(axis):
+            raise ValueError(
+                f"The {name} of the meshmask (from {np.min(points):.2f} to "
+                f"{np.max(points):.2f}) is outside of the range of the "
+                f"gridded source (from {np.min(axis):.2f} to "
+                f"{np.max(axis):.2f})"
+            )
+
+
+def build_regridder(
+    meshmask: Mask,
+    source: GriddedSource,
+    method: RegriddingMethod = RegriddingMethod.BILINEAR,
+    cache: WeightsCache | None = None,
+) -> SparseInterpolator:
+    """
+    Build the operator that regrids the valid cells of the source on all
+    the surface cells of the meshmask (land included, see
+    `write_gridded_surface_deposition`).
+
+    The cells of the meshmask that can not be obtained with `method` (for
+    example, because all the source cells around them are NaN) receive the
+    value of the closest valid source cell.
+
+    The weights depend only on the grid of the source, on its valid cells
+    and on the meshmask: if a cache is provided, they are read from the
+    cache when possible and written inside the cache otherwise, so they are
+    computed only once for each pair of source grid and meshmask (even if
+    the values of the source change).
+    """
+    method = RegriddingMethod(method)
+    mesh_lon = meshmask.xlevels.ravel()
+    mesh_lat = meshmask.ylevels.ravel()
+    _check_coverage(source, mesh_lon, mesh_lat)
+
+    weights_key = None
+    if cache is not None:
+        source_fingerprint = fingerprint_arrays(
+            source.longitude, source.latitude, source.source_cells
+        )
+        mesh_fingerprint = fingerprint_arrays(
+            meshmask.xlevels, meshmask.ylevels
+        )
+        weights_key = (
+            f"sdep_v{CACHE_VERSION}_{method}_{source_fingerprint[:32]}_"
+            f"{mesh_fingerprint[:32]}"
+        )
+        interpolator = cache.get_interpolator(weights_key)
+        if interpolator is not None:
+            LOGGER.info(
+                "Regridding weights found in cache %s", cache.cache_dir
+            )
+            return interpolator
+
+    LOGGER.debug("Computing the %s regridding weights", method)
+    if method == RegriddingMethod.CONSERVATIVE:
+        mesh_axes = rectilinear_axes(meshmask.xlevels, meshmask.ylevels)
+        if mesh_axes is None:
+            raise ValueError(
+                "The conservative regridding requires a rectilinear meshmask"
+            )
+        interpolator = conservative_interpolator(
+            cell_edges(source.longitude),
+            cell_edges(source.latitude),
+            source.source_cells,
+            cell_edges(mesh_axes[0]),
+            cell_edges(mesh_axes[1]),
+            np.ones(meshmask.shape[1:], dtype=bool),
+        )
+    else:
+        interpolator = bilinear_interpolator(
+            source.longitude,
+            source.latitude,
+            source.source_cells,
+            mesh_lon,
+            mesh_lat,
+        )
+
+    missing = ~interpolator.valid
+    if np.any(missing):
+        LOGGER.debug(
+            "%s points have no valid source cell around them; they receive "
+            "the value of the closest one",
+            np.count_nonzero(missing),
+        )
+        source_lon, source_lat = np.meshgrid(source.longitude, source.latitude)
+        fallback = nearest_interpolator(
+            source_lon[source.source_cells],
+            source_lat[source.source_cells],
+            mesh_lon[missing],
+            mesh_lat[missing],
+        )
+        interpolator = replace_invalid_rows(interpolator, fallback)
+
+    if cache is not None:
+        cache.put_interpolator(weights_key, interpolator)
+    return interpolator
+
+
+def _crop_to_used_cells(
+    source: GriddedSource, interpolator: SparseInterpolator
+) -> tuple[tuple[slice, slice], SparseInterpolator]:
+    """
+    Find the smallest window of the source grid that contains all the
+    source cells used by the interpolator (i.e., the bounding box of the
+    meshmask enlarged by the stencil of the regridding, including the
+    cells chosen by the nearest-neighbour fallback).
+
+    Returns:
+        A tuple with the slices that define the window and the
+        interpolator rewritten in terms of the valid cells of the window;
+        it produces the same values of the original one.
+    """
+    used_cells = np.zeros(source.source_cells.shape, dtype=bool)
+    used_columns = np.zeros(interpolator.n_source, dtype=bool)
+    used_columns[interpolator.weights.indices] = True
+    used_cells[source.source_cells] = used_columns
+
+    window = []
+    for axis in range(2):
+        indices = np.flatnonzero(used_cells.any(axis=1 - axis))
+        if len(indices) == 0:
+            window.append(slice(0, 0))
+        else:
+            window.append(slice(int(indices[0]), int(indices[-1]) + 1))
+    window = (window[0], window[1])
+
+    cell_columns = np.full(source.source_cells.shape, -1, dtype=np.int64)
+    cell_columns[source.source_cells] = np.arange(interpolator.n_source)
+    window_columns = cell_columns[window][source.source_cells[window]]
+    return window, SparseInterpolator(
+        interpolator.weights[:, window_columns], interpolator.valid
+    )
+
+
+def write_gridded_surface_deposition(
+    meshmask: Mask,
+    data_file: PathLike,
+    output_dir: Path,
+    output_name_mask: str,
+    method: RegriddingMethod = RegriddingMethod.BILINEAR,
+    frequency: OutputFrequency = OutputFrequency.DAILY,
+    cache: WeightsCache | None = None,
+    variables: Sequence[str] = tuple(VAR_VALUES),
+    output_dtype: DTypeLike = np.float32,
+):
+    """
+    Regrid a gridded climatology of the surface deposition on the meshmask
+    and write a binary file for each variable.
+
+    The records of each variable are regridded all together with a single
+    sparse product (the regridding weights are computed once, see
+    `build_regridder`); then the frames of the output are obtained by the
+    linear interpolation in time of the two records that surround them
+    (see `time_interpolation`) and they are written one at a time, so only
+    the regridded records of one variable are kept in memory. Only the
+    window of the source grid used by the regridding weights is read from
+    the data file, one record at a time (see `GriddedSource.read_records`).
+    Like the constant deposition written by `compute_surface_deposition`,
+    the output has a value on every cell of the domain: the land cells are
+    regridded in the same way as the water ones (MITgcm does not use them).
+
+    Args:
+        meshmask: The meshmask that defines the domain.
+        data_file: The netCDF file with the gridded climatology (see
+            `GriddedSource`); its values must have the same units of
+            `VAR_VALUES`.
+        output_dir: The directory where the files are written.
+        output_name_mask: The name of the files; "${VAR}" is replaced by
+            the name of the variable.
+        method: The regridding algorithm.
+        frequency: The time step of the output frames.
+        cache: The cache of the regridding weights.
+        variables: The variables that are regridded.
+        output_dtype: The dtype of the values saved on the files.
+    """
+    LOGGER.info("Regridding surface deposition from %s", data_file)
+    source = open_gridded_source(data_file, variables)
+    interpolator = build_regridder(meshmask, source, method, cache)
+    window, interpolator = _crop_to_used_cells(source, interpolator)
+    LOGGER.debug(
+        "Reading a window of shape %s of the source grid %s",
+        tuple(w.stop - w.start for w in window),
+        source.source_cells.shape,
+    )
+
+    previous, following, weight = time_interpolation(
+        source.record_days, frame_days(frequency)
+    )
+    LOGGER.debug(
+        "Interpolating %s records on %s frames",
+        source.n_records,
+        len(weight),
+    )
+
+    frame = np.empty(meshmask.shape[1:], dtype=output_dtype)
+    with AsyncWriter() as writer:
+        for variable in source.variables:
+            LOGGER.debug("Processing variable: %s", variable)
+            records = interpolator.apply(
+                source.read_records(variable, window).T
+            ).T
+            file_output_path = Path(output_dir) / output_name_mask.replace(
+                "${VAR}", variable
+            )
+            for p, f, w in zip(previous, following, weight):
+                frame[:] = ((1.0 - w) * records[p] + w * records[f]).reshape(
+                    frame.shape
+                )
+                writer.write(file_output_path, frame)
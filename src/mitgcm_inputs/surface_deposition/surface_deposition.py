@@ -18,23 +18,46 @@ VAR_VALUES = MappingProxyType(
 
 
 def compute_surface_deposition(
-    meshmask: Mask, var_values: Mapping[str, float] = VAR_VALUES
+    meshmask: Mask,
+    var_values: Mapping[str, float] = VAR_VALUES,
+    n_days: int | None = None,
 ):
+    """
+    Build the surface deposition fields; each variable has the same value on
+    all the cells of the domain.
+
+    The variables are read-only broadcast views of their values, so they do
+    not use any memory (and `save_dataset` writes them without expanding
+    them).
+
+    Args:
+        meshmask: The meshmask that defines the domain.
+        var_values: The value of each variable.
+        n_days: If it is not None, the variables also have a "day"
+            dimension with `n_days` identical frames (the layout of the
+            files of the legacy code); otherwise, they are 2D fields.
+    """
     LOGGER.info("Computing surface deposition")
 
     LOGGER.debug("Meshmask shape: %s", meshmask.shape)
-    surface_decomposition_dataset = xr.Dataset(
-        coords={
-            "latitude": (("x", "y"), meshmask.ylevels),
-            "longitude": (("x", "y"), meshmask.xlevels),
-        },
-    )
+    coords = {
+        "latitude": (("x", "y"), meshmask.ylevels),
+        "longitude": (("x", "y"), meshmask.xlevels),
+    }
+    var_shape = meshmask.shape[1:]
+    var_dims = ("x", "y")
+    if n_days is not None:
+        coords["day"] = np.arange(1, n_days + 1)
+        var_shape = (n_days,) + var_shape
+        var_dims = ("day",) + var_dims
+
+    surface_decomposition_dataset = xr.Dataset(coords=coords)
 
     for var_name, var_value in var_values.items():
         LOGGER.debug("Processing variable: %s", var_name)
         var_data = xr.DataArray(
-            data=np.broadcast_to(var_value, meshmask.shape[1:]),
-            dims=("x", "y"),
+            data=np.broadcast_to(var_value, var_shape),
+            dims=var_dims,
         )
         surface_decomposition_dataset[var_name] = var_data
 
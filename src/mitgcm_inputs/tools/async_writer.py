@@ -0,0 +1,295 @@
+import logging
+import os
+import threading
+from collections.abc import Iterator
+from concurrent.futures import Future
+from concurrent.futures import ThreadPoolExecutor
+from os import PathLike
+from pathlib import Path
+from time import perf_counter
+
+import numpy as np
+from numpy.typing import DTypeLike
+
+LOGGER = logging.getLogger(__name__)
+
+
+# The number of threads that write on the disk
+DEFAULT_WRITER_THREADS = 2
+
+# The maximum number of blocks that have been submitted but not yet written
+DEFAULT_MAX_PENDING = 8
+
+# The maximum size (in bytes) of the blocks into which the arrays that must
+# be converted to a different dtype are split
+DEFAULT_CHUNK_SIZE = 64 * 1024**2
+
+# The maximum memory (in bytes) used by the blocks converted by
+# `AsyncWriter.write_array` that are waiting to be written; it is split
+# among the pending blocks
+DEFAULT_CONVERSION_MEMORY = 64 * 1024**2
+
+
+def _repeated_axes(array: np.ndarray) -> int:
+    """
+    Return how many leading axes of `array` have zero stride, i.e. along how
+    many leading axes the array repeats the same values without storing
+    them. If the array is a view of a single value, this is `array.ndim`.
+    """
+    repeated_axes = 0
+    is_broadcast = False
+    for axis_len, stride in zip(array.shape, array.strides):
+        if axis_len == 1:
+            repeated_axes += 1
+            continue
+        if stride != 0:
+            break
+        repeated_axes += 1
+        is_broadcast = True
+    return repeated_axes if is_broadcast else 0
+
+
+def iter_blocks(
+    array: np.ndarray,
+    output_dtype: DTypeLike | None = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Iterator[np.ndarray]:
+    """
+    Split an array in contiguous blocks of `output_dtype` that, written one
+    after the other, produce the same bytes of
+    `array.astype(output_dtype).tobytes()`.
+
+    If the array is contiguous and it already has the output dtype, it is
+    yielded as it is. If it is a broadcast view (e.g., produced by
+    `np.broadcast_to`) whose leading axes are repetitions of the same
+    values, only one block made of copies of the repeated pattern is
+    allocated (at most `chunk_size` bytes, or one pattern, if it is larger)
+    and it is yielded as many times as needed. Otherwise, the array is
+    converted a block of rows of at most `chunk_size` bytes at a time.
+    """
+    array = np.asarray(array)
+    if output_dtype is None:
+        output_dtype = array.dtype
+    output_dtype = np.dtype(output_dtype)
+    if array.size == 0:
+        return
+
+    if (
+        array.dtype == output_dtype and array.flags.c_contiguous
+    ) or array.ndim == 0:
+        yield array.astype(output_dtype, copy=False)
+        return
+
+    repeated_axes = _repeated_axes(array)
+    if repeated_axes > 0:
+        # The values of the array are `pattern` repeated `n_repetitions`
+        # times
+        pattern = np.ascontiguousarray(
+            array[(0,) * repeated_axes], dtype=output_dtype
+        ).reshape(-1)
+        n_repetitions = int(np.prod(array.shape[:repeated_axes]))
+        patterns_per_block = min(
+            n_repetitions, max(1, chunk_size // pattern.nbytes)
+        )
+        LOGGER.debug(
+            "Writing a pattern of %s values repeated %s times",
+            pattern.size,
+            n_repetitions,
+        )
+        block = np.tile(pattern, patterns_per_block)
+        full_blocks, remainder = divmod(n_repetitions, patterns_per_block)
+        for _ in range(full_blocks):
+            yield block
+        if remainder > 0:
+            yield block[: remainder * pattern.size]
+        return
+
+    row_size = output_dtype.itemsize * int(np.prod(array.shape[1:]))
+    rows_per_chunk = max(1, chunk_size // max(row_size, 1))
+    for start in range(0, array.shape[0], rows_per_chunk):
+        rows = slice(start, start + rows_per_chunk)
+        yield np.ascontiguousarray(array[rows], dtype=output_dtype)
+
+
+class _OutputFile:
+    def __init__(self, file_path: Path):
+        self.path = file_path
+        self.fd = os.open(
+            file_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644
+        )
+        # The position where the next submitted block will be written
+        self.offset = 0
+        self.written_bytes = 0
+        self.write_time = 0.0
+        self.opening_time = perf_counter()
+
+
+class AsyncWriter:
+    """
+    A write-behind writer for binary files.
+
+    The blocks of data submitted to this object are written on the disk by a
+    small pool of threads, so the caller can go on computing the next
+    blocks while the previous ones are being written. Each block is written
+    at the position that follows the previous block of the same file
+    (using `os.pwrite`), so the blocks of a file can be written in any order
+    and by any thread, and several files can be written at the same time.
+
+    The number of blocks that have been submitted but not yet written is
+    bounded by `max_pending`: when this threshold is reached, the caller
+    waits until a block has been written. In this way, the memory used by
+    the pending blocks is bounded; in particular, the blocks converted by
+    `write_array` are at most `conversion_memory / max_pending` bytes each
+    (or one row of the array, if it is larger), so all together they never
+    use more than `conversion_memory` bytes.
+
+    This class must be used as a context manager; when the context is
+    closed, all the pending blocks are written, the files are closed and the
+    throughput of each file is reported in the log.
+
+    Args:
+        max_workers: The number of threads that write the blocks.
+        max_pending: The maximum number of blocks waiting to be written.
+        conversion_memory: The maximum memory (in bytes) used by the blocks
+            converted by `write_array` that are waiting to be written.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = DEFAULT_WRITER_THREADS,
+        max_pending: int = DEFAULT_MAX_PENDING,
+        conversion_memory: int = DEFAULT_CONVERSION_MEMORY,
+    ):
+        if max_workers < 1 or max_pending < 1:
+            raise ValueError(
+                "The number of workers and of pending blocks must be positive"
+            )
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="async_writer"
+        )
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._chunk_size = max(1, conversion_memory // max_pending)
+        self._lock = threading.Lock()
+        self._files: dict[Path, _OutputFile] = {}
+        self._errors: list[BaseException] = []
+        self._closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close(raise_errors=exc_type is None)
+
+    def _get_file(self, file_path: PathLike) -> _OutputFile:
+        if self._closed:
+            raise ValueError("The writer has already been closed")
+        file_path = Path(file_path)
+        if file_path not in self._files:
+            LOGGER.info("Writing output file: %s", file_path)
+            self._files[file_path] = _OutputFile(file_path)
+        return self._files[file_path]
+
+    def _raise_errors(self):
+        with self._lock:
+            if self._errors:
+                raise self._errors[0]
+
+    def _write_block(
+        self, output_file: _OutputFile, block: np.ndarray, offset: int
+    ):
+        start_time = perf_counter()
+        data = memoryview(block.reshape(-1).view(np.uint8))
+        n_bytes = len(data)
+        while data:
+            written = os.pwrite(output_file.fd, data, offset)
+            data = data[written:]
+            offset += written
+        elapsed = perf_counter() - start_time
+        with self._lock:
+            output_file.written_bytes += n_bytes
+            output_file.write_time += elapsed
+
+    def _block_done(self, future: Future):
+        self._slots.release()
+        error = future.exception()
+        if error is not None:
+            with self._lock:
+                self._errors.append(error)
+
+    def _submit(self, output_file: _OutputFile, block: np.ndarray):
+        self._raise_errors()
+        offset = output_file.offset
+        output_file.offset += block.nbytes
+
+        self._slots.acquire()
+        future = self._executor.submit(
+            self._write_block, output_file, block, offset
+        )
+        future.add_done_callback(self._block_done)
+
+    def write(
+        self,
+        file_path: PathLike,
+        array: np.ndarray,
+        output_dtype: DTypeLike | None = None,
+    ):
+        """
+        Append a copy of `array` (converted to `output_dtype`, if it is not
+        None) to a file. Since the array is copied, the caller can modify it
+        as soon as this method returns (e.g., to reuse it for the next day).
+        """
+        output_file = self._get_file(file_path)
+        block = np.array(array, dtype=output_dtype, order="C", copy=True)
+        self._submit(output_file, block)
+
+    def write_array(
+        self,
+        file_path: PathLike,
+        array: np.ndarray,
+        output_dtype: DTypeLike | None = None,
+    ):
+        """
+        Append a (large) array to a file without copying it.
+
+        The array is split in blocks by `iter_blocks` and each block is
+        submitted as it is: if the array is contiguous and it already has
+        the output dtype, the caller must not modify it until the writer is
+        closed. The memory used by the conversion of the other arrays is
+        bounded by `conversion_memory` (see the documentation of the
+        class).
+        """
+        output_file = self._get_file(file_path)
+        for block in iter_blocks(array, output_dtype, self._chunk_size):
+            self._submit(output_file, block)
+
+    def close(self, raise_errors: bool = True):
+        """
+        Wait until all the pending blocks have been written and close the
+        files. If some block could not be written, the first error is
+        raised (unless `raise_errors` is False).
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self._executor.shutdown(wait=True)
+
+        for output_file in self._files.values():
+            os.close(output_file.fd)
+            total_time = perf_counter() - output_file.opening_time
+            size_mb = output_file.written_bytes / 1024**2
+            if output_file.write_time > 0:
+                throughput = size_mb / output_file.write_time
+            else:
+                throughput = float("inf")
+            LOGGER.info(
+                "File %s: %.1f MB written in %.2f s of I/O (%.1f MB/s); "
+                "%.2f s since the file has been opened",
+                output_file.path,
+                size_mb,
+                output_file.write_time,
+                throughput,
+                total_time,
+            )
+
+        if raise_errors:
+            self._raise_errors()
@@ -0,0 +1,394 @@
+import argparse
+import enum
+import errno
+import hashlib
+import json
+import logging
+import os
+import shutil
+from collections.abc import Callable
+from collections.abc import Iterable
+from functools import lru_cache
+from importlib.metadata import PackageNotFoundError
+from importlib.metadata import version
+from pathlib import Path
+from tempfile import mkdtemp
+from time import perf_counter
+from typing import Any
+from typing import NamedTuple
+
+from mitgcm_inputs.tools.cache_utils import default_cache_dir
+from mitgcm_inputs.tools.cache_utils import fingerprint_file
+
+LOGGER = logging.getLogger(__name__)
+
+
+# Increase this number when the layout of the entries of the cache changes
+BUILD_CACHE_VERSION = 1
+
+# The maximum size (in bytes) of the build cache; when this threshold is
+# exceeded, the least recently used entries are removed
+DEFAULT_MAX_BUILD_CACHE_SIZE = 64 * 1024**3
+
+# The names of the files inside each entry of the cache
+MANIFEST_NAME = "manifest.json"
+OUTPUT_FILE_NAME = "file"
+
+# The arguments that never change the outputs of a command
+_ALWAYS_IGNORED = ("cmd", "build_cache", "build_cache_dir")
+
+PACKAGE_DIR = Path(__file__).resolve().parent.parent
+
+
+def default_build_cache_dir() -> Path:
+    """
+    Returns the default directory of the build cache, i.e. the `builds`
+    directory inside the default cache directory (see `default_cache_dir`).
+    """
+    return default_cache_dir() / "builds"
+
+
+class CacheSpec(NamedTuple):
+    """
+    Describe how the outputs of a command depend on its arguments.
+
+    Every argument of the command that is not listed here is considered an
+    input: if it is a path, the content of the file (or of all the files
+    inside the directory) contributes to the key of the cache; otherwise,
+    its value does.
+
+    Attributes:
+        output_files: The names of the arguments that are paths of output
+            files. Only the name of the file (not its directory) contributes
+            to the key.
+        output_dirs: The names of the arguments that are directories where
+            the command writes its outputs; all the files created or
+            modified inside these directories are cached.
+        ignored: The names of the arguments that do not change the outputs
+            (e.g., the number of workers or the directory of other caches).
+        implicit_inputs: Files read by the command that are not passed as
+            arguments (e.g., data files shipped with the package).
+        remote_inputs: A description of the data downloaded by the command
+            (e.g., the id of a dataset and the time range that is
+            downloaded). The data can not be hashed before it is
+            downloaded, so this description contributes to the key in its
+            place: the data identified by the same description must never
+            change.
+    """
+
+    output_files: tuple[str, ...] = ()
+    output_dirs: tuple[str, ...] = ()
+    ignored: tuple[str, ...] = ()
+    implicit_inputs: tuple[Path, ...] = ()
+    remote_inputs: tuple[str, ...] = ()
+
+
+@lru_cache(maxsize=1)
+def package_fingerprint() -> str:
+    """
+    Return a string that identifies the code of this package: its version
+    and a hash of its source files (so that a modified checkout without a
+    new version does not reuse stale outputs).
+    """
+    try:
+        package_version = version("mitgcm_inputs")
+    except PackageNotFoundError:
+        package_version = "unknown"
+
+    hasher = hashlib.sha256()
+    for source_file in sorted(PACKAGE_DIR.rglob("*.py")):
+        hasher.update(str(source_file.relative_to(PACKAGE_DIR)).encode())
+        hasher.update(source_file.read_bytes())
+    return f"{package_version}+{hasher.hexdigest()[:16]}"
+
+
+def _fingerprint_path(path: Path) -> Any:
+    if path.is_file():
+        return ["file", fingerprint_file(path)]
+    if path.is_dir():
+        return [
+            "dir",
+            [
+                [str(f.relative_to(path)), fingerprint_file(f)]
+                for f in sorted(path.rglob("*"))
+                if f.is_file()
+            ],
+        ]
+    return ["missing", str(path)]
+
+
+def _fingerprint_value(value: Any) -> Any:
+    if isinstance(value, Path):
+        return _fingerprint_path(value)
+    if isinstance(value, (list, tuple)):
+        return [_fingerprint_value(v) for v in value]
+    if isinstance(value, enum.Enum):
+        return str(value.value)
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return str(value)
+
+
+def _snapshot(directory: Path) -> dict[Path, tuple[int, ...]]:
+    # The change time is updated by every write, even when the modification
+    # time is restored afterwards (e.g., by shutil.copy2)
+    if not directory.is_dir():
+        return {}
+    snapshot = {}
+    for file_path in directory.rglob("*"):
+        if file_path.is_file():
+            file_stat = file_path.stat()
+            snapshot[file_path] = (
+                file_stat.st_ino,
+                file_stat.st_size,
+                file_stat.st_mtime_ns,
+                file_stat.st_ctime_ns,
+            )
+    return snapshot
+
+
+def _link_or_copy(source: Path, destination: Path):
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        os.link(source, destination)
+    except OSError as e:
+        if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK):
+            raise
+        shutil.copy2(source, destination)
+
+
+def _detach(file_path: Path):
+    # A file restored from the cache is a hard link to the file inside the
+    # cache: if a command truncated it and wrote it again, it would also
+    # modify the cache. Here we replace it with an independent copy.
+    if not file_path.is_file() or file_path.stat().st_nlink < 2:
+        return
+    tmp_path = file_path.with_name(f".{file_path.name}.detach")
+    shutil.copy2(file_path, tmp_path)
+    os.replace(tmp_path, file_path)
+
+
+class BuildCache:
+    """
+    A directory where the outputs of the commands are stored, indexed by a
+    hash of everything they depend on: the name of the command, its
+    arguments, the content of its input files and the code of this package.
+
+    When a command is executed with the same inputs of a previous execution,
+    its outputs are restored from the cache (as hard links, when the cache
+    and the outputs are on the same filesystem, otherwise as copies)
+    instead of being computed again. Each entry is a directory that is
+    written under a temporary name and then renamed, so that concurrent
+    processes never see a partial entry. The size of the cache is bounded:
+    the least recently used entries are removed until the total size is
+    smaller than `max_size`.
+
+    Args:
+        cache_dir: The directory of the cache; it is created if it does not
+            exist.
+        max_size: The maximum size of the cache, in bytes.
+    """
+
+    def __init__(
+        self,
+        cache_dir: os.PathLike,
+        max_size: int = DEFAULT_MAX_BUILD_CACHE_SIZE,
+    ):
+        self.cache_dir = Path(cache_dir)
+        self.max_size = max_size
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def key(
+        self, command: str, spec: CacheSpec, args: argparse.Namespace
+    ) -> str:
+        """
+        Compute the key of an execution of a command.
+        """
+        excluded = set(_ALWAYS_IGNORED) | set(spec.ignored)
+        excluded |= set(spec.output_files) | set(spec.output_dirs)
+
+        description = {
+            "cache_version": BUILD_CACHE_VERSION,
+            "package": package_fingerprint(),
+            "command": command,
+            "arguments": {
+                name: _fingerprint_value(value)
+                for name, value in sorted(vars(args).items())
+                if name not in excluded
+            },
+            "implicit_inputs": [
+                _fingerprint_path(Path(p)) for p in spec.implicit_inputs
+            ],
+            "remote_inputs": list(spec.remote_inputs),
+            "output_names": {
+                name: Path(getattr(args, name)).name
+                for name in spec.output_files
+                if getattr(args, name) is not None
+            },
+        }
+        serialized = json.dumps(description, sort_keys=True)
+        return hashlib.sha256(serialized.encode()).hexdigest()
+
+    def _entry_dir(self, key: str) -> Path:
+        return self.cache_dir / key
+
+    def restore(self, key: str, outputs: dict[str, Path]) -> bool:
+        """
+        Restore the outputs saved with the given key. `outputs` associates
+        the name of each output argument with its path. Return False if the
+        key is not inside the cache.
+        """
+        entry_dir = self._entry_dir(key)
+        try:
+            manifest = json.loads((entry_dir / MANIFEST_NAME).read_text())
+        except (FileNotFoundError, json.JSONDecodeError):
+            return False
+        if set(manifest) != set(outputs):
+            return False
+
+        for name, files in manifest.items():
+            for relative_path in files:
+                if relative_path:
+                    source = entry_dir / name / relative_path
+                    target = outputs[name] / relative_path
+                else:
+                    source = entry_dir / name / OUTPUT_FILE_NAME
+                    target = outputs[name]
+                target.unlink(missing_ok=True)
+                try:
+                    _link_or_copy(source, target)
+                except FileNotFoundError:
+                    # The entry has been evicted by another process
+                    return False
+                LOGGER.debug("Restored %s from the build cache", target)
+
+        # The modification time is used to track which entries have been
+        # used more recently
+        os.utime(entry_dir / MANIFEST_NAME)
+        return True
+
+    def store(
+        self,
+        key: str,
+        outputs: dict[str, Path],
+        output_dirs: Iterable[str],
+        snapshots: dict[str, dict[Path, tuple[int, ...]]],
+    ):
+        """
+        Save the outputs of an execution. For the output directories, only
+        the files that are different from `snapshots` (taken before the
+        execution) are saved. The output files that the execution has not
+        written (e.g., because there was nothing to write) are saved as
+        missing, and they are not restored.
+        """
+        output_dirs = set(output_dirs)
+        entry_dir = self._entry_dir(key)
+        if entry_dir.exists():
+            return
+
+        tmp_dir = Path(mkdtemp(dir=self.cache_dir, prefix=".tmp_"))
+        try:
+            manifest = {}
+            for name, path in outputs.items():
+                if name not in output_dirs:
+                    manifest[name] = []
+                    if path.is_file():
+                        _link_or_copy(path, tmp_dir / name / OUTPUT_FILE_NAME)
+                        manifest[name].append("")
+                    continue
+                before = snapshots.get(name, {})
+                after = _snapshot(path)
+                changed = sorted(
+                    f for f, state in after.items() if before.get(f) != state
+                )
+                manifest[name] = []
+                for file_path in changed:
+                    relative_path = file_path.relative_to(path)
+                    _link_or_copy(file_path, tmp_dir / name / relative_path)
+                    manifest[name].append(str(relative_path))
+            (tmp_dir / MANIFEST_NAME).write_text(json.dumps(manifest))
+            os.rename(tmp_dir, entry_dir)
+        except OSError as e:
+            # Another process may have stored the same entry in the meantime
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            if not entry_dir.exists():
+                LOGGER.warning("Unable to write the build cache: %s", e)
+            return
+
+        LOGGER.debug("Build cache entry %s written", key)
+        self.evict()
+
+    def evict(self):
+        """
+        Remove the least recently used entries until the size of the cache
+        is smaller than `max_size`.
+        """
+        entries = []
+        for entry_dir in self.cache_dir.iterdir():
+            manifest = entry_dir / MANIFEST_NAME
+            if entry_dir.name.startswith(".tmp_") or not manifest.is_file():
+                continue
+            try:
+                entry_size = sum(
+                    f.stat().st_size
+                    for f in entry_dir.rglob("*")
+                    if f.is_file()
+                )
+                entries.append(
+                    (manifest.stat().st_mtime_ns, entry_size, entry_dir)
+                )
+            except FileNotFoundError:
+                # The entry has been evicted by another process
+                continue
+
+        total_size = sum(e[1] for e in entries)
+        for _, entry_size, entry_dir in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            LOGGER.debug("Removing %s from the build cache", entry_dir)
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            total_size -= entry_size
+
+
+def run_cached(
+    cache: BuildCache,
+    command: str,
+    spec: CacheSpec,
+    args: argparse.Namespace,
+    main: Callable[[argparse.Namespace], int],
+) -> int:
+    """
+    Execute `main(args)` unless its outputs are already inside the build
+    cache, in which case they are restored. The outputs of a successful
+    execution (return code 0) are saved inside the cache.
+    """
+    start_time = perf_counter()
+    key = cache.key(command, spec, args)
+    outputs = {
+        name: Path(getattr(args, name))
+        for name in spec.output_files + spec.output_dirs
+        if getattr(args, name) is not None
+    }
+
+    if cache.restore(key, outputs):
+        LOGGER.info(
+            "Outputs of %s restored from the build cache in %.2f s",
+            command,
+            perf_counter() - start_time,
+        )
+        return 0
+    LOGGER.info("Outputs of %s not found in the build cache", command)
+
+    snapshots = {}
+    for name, path in outputs.items():
+        if name in spec.output_dirs:
+            for file_path in _snapshot(path):
+                _detach(file_path)
+            snapshots[name] = _snapshot(path)
+        else:
+            _detach(path)
+
+    return_code = main(args)
+    if return_code == 0:
+        cache.store(key, outputs, spec.output_dirs, snapshots)
+    return return_code
@@ -0,0 +1,44 @@
+import hashlib
+import os
+from functools import lru_cache
+from pathlib import Path
+
+
+def default_cache_dir() -> Path:
+    """
+    Returns the default directory of the cache, i.e. the `mitgcm_inputs`
+    directory inside `$XDG_CACHE_HOME` (or `~/.cache` if this variable is not
+    defined).
+    """
+    xdg_cache = os.environ.get("XDG_CACHE_HOME", "")
+    if xdg_cache:
+        cache_root = Path(xdg_cache)
+    else:
+        cache_root = Path.home() / ".cache"
+    return cache_root / "mitgcm_inputs"
+
+
+@lru_cache(maxsize=16)
+def _fingerprint_file(
+    file_path: Path, _size: int, _mtime_ns: int, chunk_size: int
+) -> str:
+    hasher = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def fingerprint_file(file_path: os.PathLike, chunk_size: int = 2**22) -> str:
+    """
+    Compute a hash of the content of a file.
+
+    The file is read in chunks of `chunk_size` bytes, so it never needs to be
+    loaded in memory. The result is memoized for as long as the size and the
+    modification time of the file do not change.
+    """
+    file_path = Path(file_path).resolve()
+    file_stat = file_path.stat()
+    return _fingerprint_file(
+        file_path, file_stat.st_size, file_stat.st_mtime_ns, chunk_size
+    )
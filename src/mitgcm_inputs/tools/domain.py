@@ -0,0 +1,49 @@
+import logging
+from functools import cached_property
+from pathlib import Path
+from time import perf_counter
+
+import numpy as np
+from bitsea.commons.mask import Mask
+
+from mitgcm_inputs.tools.read_mesh_mask import read_mesh_mask
+
+LOGGER = logging.getLogger(__name__)
+
+
+class Domain:
+    """
+    A meshmask together with the fields derived from it that are needed by
+    more than one generator.
+
+    The meshmask is read only once and each derived field is computed the
+    first time it is requested; after that, the same array is returned to
+    every generator that uses this object. The arrays must be considered
+    read-only.
+
+    Args:
+        meshmask: The meshmask that defines the domain.
+    """
+
+    def __init__(self, meshmask: Mask):
+        self.meshmask = meshmask
+
+    @classmethod
+    def from_file(cls, mask_file_path: Path) -> "Domain":
+        start_time = perf_counter()
+        meshmask = read_mesh_mask(mask_file_path)
+        LOGGER.info(
+            "Meshmask %s read in %.2f s",
+            mask_file_path,
+            perf_counter() - start_time,
+        )
+        return cls(meshmask)
+
+    @cached_property
+    def bathymetry(self) -> np.ndarray:
+        """
+        The depth of the bottom of each water column (see
+        `Mask.bathymetry`).
+        """
+        LOGGER.debug("Computing the bathymetry of the domain")
+        return self.meshmask.bathymetry()
@@ -0,0 +1,526 @@
+import logging
+
+import numpy as np
+from scipy.ndimage import binary_dilation
+from scipy.sparse import csr_matrix
+from scipy.sparse import diags
+from scipy.sparse import kron
+from scipy.spatial import cKDTree
+from scipy.spatial import Delaunay
+
+LOGGER = logging.getLogger(__name__)
+
+
+class SparseInterpolator:
+    """
+    A linear interpolation operator stored as a sparse weight matrix.
+
+    Each row of the weight matrix refers to a target point and contains the
+    weights that must be applied to the source values to obtain the
+    interpolated value on that point. Target points that can not be
+    interpolated (for example, because they are outside the convex hull of
+    the source points) are flagged as invalid and receive NaN.
+
+    Since the weights depend only on the geometry, they can be computed once
+    and then applied to as many fields as needed: applying the operator to
+    a (n_source, n_fields) matrix interpolates all the fields with a single
+    sparse-matrix × dense-matrix product.
+
+    Args:
+        weights: A sparse matrix with shape (n_target, n_source)
+        valid: A 1D boolean array with n_target elements; it is False for
+            the target points that can not be interpolated
+    """
+
+    def __init__(self, weights: csr_matrix, valid: np.ndarray):
+        if weights.shape[0] != valid.shape[0]:
+            raise ValueError(
+                f"The weight matrix has {weights.shape[0]} rows but the "
+                f"validity mask has {valid.shape[0]} elements"
+            )
+        self.weights = csr_matrix(weights)
+        self.valid = np.asarray(valid, dtype=bool)
+
+    @property
+    def n_target(self) -> int:
+        return self.weights.shape[0]
+
+    @property
+    def n_source(self) -> int:
+        return self.weights.shape[1]
+
+    def apply(self, values: np.ndarray) -> np.ndarray:
+        """
+        Interpolate one or more fields on the target points.
+
+        Args:
+            values: An array with shape (n_source,) or (n_source, n_fields)
+
+        Returns:
+            An array of float64 with shape (n_target,) or
+            (n_target, n_fields); the rows of the invalid target points are
+            filled with NaN.
+        """
+        values = np.asarray(values)
+        if values.shape[0] != self.n_source:
+            raise ValueError(
+                f"Expected {self.n_source} source values, received an array "
+                f"with shape {values.shape}"
+            )
+        output = np.asarray(
+            self.weights @ values.astype(np.float64, copy=False)
+        )
+        output[~self.valid] = np.nan
+        return output
+
+
+def barycentric_interpolator(
+    triangulation: Delaunay, target_points: np.ndarray
+) -> SparseInterpolator:
+    """
+    Build the piecewise linear interpolator defined by a triangulation.
+
+    For each target point, this function finds the simplex of the
+    triangulation that contains it and computes its barycentric coordinates;
+    these are the weights of the vertices of the simplex. The result is the
+    same interpolation performed by `scipy.interpolate.LinearNDInterpolator`,
+    but the simplex search is executed only once.
+
+    Args:
+        triangulation: The Delaunay triangulation of the source points
+        target_points: An array with shape (n_target, n_dims) with the
+            coordinates of the points where the values must be interpolated
+
+    Returns:
+        A SparseInterpolator with shape (n_target, n_source)
+    """
+    target_points = np.asarray(target_points, dtype=np.float64)
+    n_target, n_dims = target_points.shape
+    n_source = triangulation.points.shape[0]
+
+    LOGGER.debug("Locating %s points inside the triangulation", n_target)
+    simplices = triangulation.find_simplex(target_points)
+    valid = simplices >= 0
+    LOGGER.debug(
+        "%s points are outside the triangulation", np.count_nonzero(~valid)
+    )
+
+    # For each simplex, `transform` stores the inverse of the matrix that
+    # maps the barycentric coordinates into the cartesian ones (the first
+    # n_dims rows) and the position of its last vertex (the last row)
+    transform = triangulation.transform[simplices[valid]]
+    delta = target_points[valid] - transform[:, n_dims, :]
+    partial_coords = np.einsum("ijk,ik->ij", transform[:, :n_dims, :], delta)
+    barycentric_coords = np.column_stack(
+        (partial_coords, 1.0 - partial_coords.sum(axis=1))
+    )
+
+    rows = np.repeat(np.flatnonzero(valid), n_dims + 1)
+    cols = triangulation.simplices[simplices[valid]].ravel()
+
+    weights = csr_matrix(
+        (barycentric_coords.ravel(), (rows, cols)),
+        shape=(n_target, n_source),
+    )
+    return SparseInterpolator(weights, valid)
+
+
+def _axis_weights(
+    axis: np.ndarray, points: np.ndarray
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Locate some points on a monotonic axis.
+
+    Returns:
+        Three arrays with the same shape of `points`: the index `i` of the
+        axis element that precedes each point (so that the point is between
+        `axis[i]` and `axis[i + 1]`), the weight of `axis[i + 1]` in the
+        linear interpolation and a boolean array that is False for the points
+        that are outside the axis.
+    """
+    descending = axis[-1] < axis[0]
+    if descending:
+        axis = axis[::-1]
+
+    valid = (points >= axis[0]) & (points <= axis[-1])
+    index = np.searchsorted(axis, points, side="right") - 1
+    index = np.clip(index, 0, len(axis) - 2)
+    weight = (points - axis[index]) / (axis[index + 1] - axis[index])
+
+    if descending:
+        index = len(axis) - 2 - index
+        weight = 1.0 - weight
+    return index, weight, valid
+
+
+def bilinear_interpolator(
+    axis_x: np.ndarray,
+    axis_y: np.ndarray,
+    source_cells: np.ndarray,
+    target_x: np.ndarray,
+    target_y: np.ndarray,
+) -> SparseInterpolator:
+    """
+    Build the bilinear interpolator of a regular (rectilinear) source grid.
+
+    The position of the targets is computed separately on each axis, and
+    only once for each distinct coordinate: for a target grid that is also
+    regular, this means that the search is performed on the 1D axes of the
+    target grid. The four corners of the source cell that contains each
+    target receive the usual bilinear weights; corners that are not source
+    cells (for example, land cells) are discarded and the weights of the
+    remaining corners are normalized so that their sum is 1. Targets that
+    are outside the source grid or whose corners are all discarded are
+    flagged as invalid.
+
+    Args:
+        axis_x: The 1D array of the coordinates of the columns of the source
+            grid; it must be strictly monotonic.
+        axis_y: The 1D array of the coordinates of the rows of the source
+            grid; it must be strictly monotonic.
+        source_cells: A 2D boolean array with shape (len(axis_y),
+            len(axis_x)); the columns of the weight matrix are the True cells
+            of this array, in C order.
+        target_x: The x coordinate of each target point
+        target_y: The y coordinate of each target point
+
+    Returns:
+        A SparseInterpolator with shape (n_target, source_cells.sum())
+    """
+    if len(axis_x) < 2 or len(axis_y) < 2:
+        raise ValueError("The source grid must have at least 2x2 cells")
+
+    unique_x, x_inverse = np.unique(target_x, return_inverse=True)
+    unique_y, y_inverse = np.unique(target_y, return_inverse=True)
+    ix, wx, x_valid = _axis_weights(np.asarray(axis_x), unique_x)
+    iy, wy, y_valid = _axis_weights(np.asarray(axis_y), unique_y)
+
+    ix, wx, x_valid = ix[x_inverse], wx[x_inverse], x_valid[x_inverse]
+    iy, wy, y_valid = iy[y_inverse], wy[y_inverse], y_valid[y_inverse]
+    n_target = len(ix)
+
+    # The column of the weight matrix of each source cell (-1 for the cells
+    # that are not source cells)
+    source_index = np.full(source_cells.shape, -1, dtype=np.int64)
+    source_index[source_cells] = np.arange(np.count_nonzero(source_cells))
+
+    corner_cols = np.stack(
+        (
+            source_index[iy, ix],
+            source_index[iy, ix + 1],
+            source_index[iy + 1, ix],
+            source_index[iy + 1, ix + 1],
+        ),
+        axis=1,
+    )
+    corner_weights = np.stack(
+        (
+            (1.0 - wy) * (1.0 - wx),
+            (1.0 - wy) * wx,
+            wy * (1.0 - wx),
+            wy * wx,
+        ),
+        axis=1,
+    )
+    corner_weights[corner_cols < 0] = 0.0
+
+    weight_sum = corner_weights.sum(axis=1)
+    valid = x_valid & y_valid & (weight_sum > 0)
+    corner_weights[valid] /= weight_sum[valid, np.newaxis]
+
+    keep = valid[:, np.newaxis] & (corner_weights > 0)
+    rows = np.broadcast_to(np.arange(n_target)[:, np.newaxis], keep.shape)
+    weights = csr_matrix(
+        (corner_weights[keep], (rows[keep], corner_cols[keep])),
+        shape=(n_target, np.count_nonzero(source_cells)),
+    )
+    return SparseInterpolator(weights, valid)
+
+
+def cell_edges(centers: np.ndarray) -> np.ndarray:
+    """
+    Compute the edges of the cells of a 1D axis from their centers.
+
+    The inner edges are the midpoints between two consecutive centers; the
+    first and the last cells are assumed to be symmetric around their
+    centers. The result has one element more than `centers`.
+    """
+    centers = np.asarray(centers, dtype=np.float64)
+    if len(centers) < 2:
+        raise ValueError("An axis must have at least 2 cells")
+    midpoints = 0.5 * (centers[1:] + centers[:-1])
+    return np.concatenate(
+        (
+            [2.0 * centers[0] - midpoints[0]],
+            midpoints,
+            [2.0 * centers[-1] - midpoints[-1]],
+        )
+    )
+
+
+def _axis_overlaps(
+    source_edges: np.ndarray, target_edges: np.ndarray
+) -> csr_matrix:
+    """
+    Compute which fraction of each target interval is covered by each source
+    interval of a 1D axis.
+
+    Both arrays of edges must be strictly monotonic (but they do not need to
+    share the same direction).
+
+    Returns:
+        A sparse matrix with shape (n_target, n_source)
+    """
+    n_source = len(source_edges) - 1
+    n_target = len(target_edges) - 1
+
+    source_descending = source_edges[-1] < source_edges[0]
+    if source_descending:
+        source_edges = source_edges[::-1]
+    target_descending = target_edges[-1] < target_edges[0]
+    if target_descending:
+        target_edges = target_edges[::-1]
+
+    target_start = target_edges[:-1]
+    target_end = target_edges[1:]
+
+    # The source intervals that overlap the target i are the ones between
+    # first[i] (included) and last[i] (excluded)
+    first = np.searchsorted(source_edges, target_start, side="right") - 1
+    last = np.searchsorted(source_edges, target_end, side="left")
+    first = np.clip(first, 0, n_source)
+    last = np.clip(last, first, n_source)
+
+    counts = last - first
+    rows = np.repeat(np.arange(n_target), counts)
+    row_starts = np.cumsum(counts) - counts
+    offsets = np.arange(len(rows)) - np.repeat(row_starts, counts)
+    cols = np.repeat(first, counts) + offsets
+
+    overlap = np.minimum(
+        target_end[rows], source_edges[cols + 1]
+    ) - np.maximum(target_start[rows], source_edges[cols])
+    fraction = overlap / (target_end[rows] - target_start[rows])
+    keep = fraction > 0
+
+    rows = rows[keep]
+    cols = cols[keep]
+    if source_descending:
+        cols = n_source - 1 - cols
+    if target_descending:
+        rows = n_target - 1 - rows
+    return csr_matrix(
+        (fraction[keep], (rows, cols)), shape=(n_target, n_source)
+    )
+
+
+def conservative_interpolator(
+    source_lon_edges: np.ndarray,
+    source_lat_edges: np.ndarray,
+    source_cells: np.ndarray,
+    target_lon_edges: np.ndarray,
+    target_lat_edges: np.ndarray,
+    target_cells: np.ndarray,
+) -> SparseInterpolator:
+    """
+    Build the first-order conservative remapping between two rectilinear
+    longitude-latitude grids.
+
+    The value of each target cell is the average of the source cells that
+    overlap it, weighted by the area of the overlap on the sphere. Since the
+    two grids are rectilinear, the area of the overlap is the product of
+    the overlap in longitude and of the overlap in sin(latitude), so the
+    weights are computed separately on each axis. Source cells that are not
+    in `source_cells` are discarded and the weights of the remaining ones
+    are normalized so that their sum is 1; therefore, the integral of the
+    field is preserved exactly only where the target cells are fully
+    covered by valid source cells. Targets that do not overlap any valid
+    source cell are flagged as invalid.
+
+    Args:
+        source_lon_edges: The longitudes (in degrees) of the edges of the
+            columns of the source grid (see `cell_edges`).
+        source_lat_edges: The latitudes (in degrees) of the edges of the
+            rows of the source grid.
+        source_cells: A 2D boolean array with shape (len(source_lat_edges) -
+            1, len(source_lon_edges) - 1); the columns of the weight matrix
+            are the True cells of this array, in C order.
+        target_lon_edges: The longitudes of the edges of the columns of the
+            target grid.
+        target_lat_edges: The latitudes of the edges of the rows of the
+            target grid.
+        target_cells: A 2D boolean array with the shape of the target grid;
+            the rows of the weight matrix are the True cells of this array,
+            in C order.
+
+    Returns:
+        A SparseInterpolator with shape (target_cells.sum(),
+        source_cells.sum())
+    """
+    lon_weights = _axis_overlaps(
+        np.asarray(source_lon_edges, dtype=np.float64),
+        np.asarray(target_lon_edges, dtype=np.float64),
+    )
+    lat_weights = _axis_overlaps(
+        np.sin(np.deg2rad(source_lat_edges)),
+        np.sin(np.deg2rad(target_lat_edges)),
+    )
+
+    # The rows of the Kronecker product are the cells of the target grid in
+    # C order (latitude first), the columns are the cells of the source grid
+    weights = kron(lat_weights, lon_weights, format="csr")
+    weights = weights[np.flatnonzero(target_cells.reshape(-1))]
+    weights = weights[:, np.flatnonzero(source_cells.reshape(-1))].tocsr()
+
+    weight_sum = np.asarray(weights.sum(axis=1)).reshape(-1)
+    valid = weight_sum > 0
+    scale = np.zeros_like(weight_sum)
+    scale[valid] = 1.0 / weight_sum[valid]
+    weights = csr_matrix(diags(scale) @ weights)
+    weights.eliminate_zeros()
+    return SparseInterpolator(weights, valid)
+
+
+def nearest_interpolator(
+    source_x: np.ndarray,
+    source_y: np.ndarray,
+    target_x: np.ndarray,
+    target_y: np.ndarray,
+) -> SparseInterpolator:
+    """
+    Build the operator that assigns to each target point the value of the
+    closest source point (in the plane of the coordinates).
+
+    Returns:
+        A SparseInterpolator with shape (len(target_x), len(source_x))
+    """
+    n_source = len(source_x)
+    n_target = len(target_x)
+    if n_source == 0:
+        return SparseInterpolator(
+            csr_matrix((n_target, 0)), np.zeros(n_target, dtype=bool)
+        )
+    tree = cKDTree(np.column_stack((source_x, source_y)))
+    _, nearest = tree.query(np.column_stack((target_x, target_y)))
+    weights = csr_matrix(
+        (np.ones(n_target), (np.arange(n_target), nearest)),
+        shape=(n_target, n_source),
+    )
+    return SparseInterpolator(weights, np.ones(n_target, dtype=bool))
+
+
+def neighbour_cells(
+    axis_x: np.ndarray,
+    axis_y: np.ndarray,
+    target_x: np.ndarray,
+    target_y: np.ndarray,
+    radius: int,
+) -> np.ndarray:
+    """
+    Find the cells of a rectilinear grid that are close to some targets.
+
+    Returns:
+        A 2D boolean array with shape (len(axis_y), len(axis_x)) that is True
+        on the cells that are at most `radius` cells away from the corners of
+        the grid cell that contains at least one of the targets.
+    """
+    ix, _, _ = _axis_weights(np.asarray(axis_x), np.asarray(target_x))
+    iy, _, _ = _axis_weights(np.asarray(axis_y), np.asarray(target_y))
+
+    near = np.zeros((len(axis_y), len(axis_x)), dtype=bool)
+    near[iy, ix] = True
+    # The cell (iy, ix) is the lower left corner of the grid cell; the other
+    # corners are one step ahead on each axis
+    structure = np.ones((2 * radius + 2, 2 * radius + 2), dtype=bool)
+    return binary_dilation(near, structure=structure, origin=(-1, -1))
+
+
+def change_sources(
+    interpolator: SparseInterpolator, source_columns: np.ndarray, n_source: int
+) -> SparseInterpolator:
+    """
+    Rewrite an interpolator in terms of a larger set of source points.
+
+    Args:
+        interpolator: The original interpolator
+        source_columns: For each source point of the original interpolator,
+            its index inside the new set of source points
+        n_source: The number of the new source points
+
+    Returns:
+        An interpolator that produces the same values of the original one
+        when applied to the new source points
+    """
+    weights = interpolator.weights.tocoo()
+    new_weights = csr_matrix(
+        (weights.data, (weights.row, source_columns[weights.col])),
+        shape=(interpolator.n_target, n_source),
+    )
+    return SparseInterpolator(new_weights, interpolator.valid)
+
+
+def replace_invalid_rows(
+    interpolator: SparseInterpolator, fallback: SparseInterpolator
+) -> SparseInterpolator:
+    """
+    Combine two interpolators that share the same source points.
+
+    The rows of `fallback` are the weights of the invalid targets of
+    `interpolator`, in the same order; the result uses the weights of
+    `interpolator` for its valid targets and the ones of `fallback` for all
+    the others.
+    """
+    invalid_rows = np.flatnonzero(~interpolator.valid)
+    if fallback.n_target != len(invalid_rows):
+        raise ValueError(
+            f"The fallback interpolator has {fallback.n_target} targets but "
+            f"{len(invalid_rows)} are needed"
+        )
+    if fallback.n_source != interpolator.n_source:
+        raise ValueError("The two interpolators have different sources")
+
+    primary = interpolator.weights.tocoo()
+    secondary = fallback.weights.tocoo()
+    weights = csr_matrix(
+        (
+            np.concatenate((primary.data, secondary.data)),
+            (
+                np.concatenate((primary.row, invalid_rows[secondary.row])),
+                np.concatenate((primary.col, secondary.col)),
+            ),
+        ),
+        shape=interpolator.weights.shape,
+    )
+    valid = interpolator.valid.copy()
+    valid[invalid_rows] = fallback.valid
+    return SparseInterpolator(weights, valid)
+
+
+def rectilinear_axes(
+    x: np.ndarray, y: np.ndarray
+) -> tuple[np.ndarray, np.ndarray] | None:
+    """
+    Check if a grid described by 2D coordinates is rectilinear.
+
+    A grid is rectilinear if `x` is constant along the columns, `y` is
+    constant along the rows and both are strictly monotonic.
+
+    Returns:
+        The 1D axes (x along the columns, y along the rows) if the grid is
+        rectilinear, None otherwise
+    """
+    if x.ndim != 2 or x.shape != y.shape or min(x.shape) < 2:
+        return None
+
+    axis_x = x[0, :]
+    axis_y = y[:, 0]
+    if not np.array_equal(x, np.broadcast_to(axis_x, x.shape)):
+        return None
+    if not np.array_equal(y, np.broadcast_to(axis_y[:, np.newaxis], y.shape)):
+        return None
+
+    for axis in (axis_x, axis_y):
+        steps = np.diff(axis)
+        if not (np.all(steps > 0) or np.all(steps < 0)):
+            return None
+    return axis_x, axis_y
@@ -0,0 +1,33 @@
+from os import PathLike
+
+import numpy as np
+import xarray as xr
+
+
+def read_netcdf_coordinates(
+    file_path: PathLike, variable: str
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Read the longitude and the latitude of a variable of a netCDF file and
+    return them as two 2D arrays with the same shape of its frames.
+    """
+    with xr.open_dataset(file_path, engine="netcdf4") as dataset:
+        for lon_name, lat_name in (("longitude", "latitude"), ("lon", "lat")):
+            if lon_name in dataset.variables and lat_name in dataset.variables:
+                break
+        else:
+            raise ValueError(
+                f"Unable to find the coordinates of file {file_path}"
+            )
+        longitude = dataset[lon_name].values
+        latitude = dataset[lat_name].values
+        frame_shape = dataset[variable].shape[1:]
+
+    if longitude.ndim == 1 and latitude.ndim == 1:
+        longitude, latitude = np.meshgrid(longitude, latitude)
+    if longitude.shape != frame_shape or latitude.shape != frame_shape:
+        raise ValueError(
+            f"The coordinates of file {file_path} do not match the shape of "
+            f"variable {variable} ({frame_shape})"
+        )
+    return longitude, latitude
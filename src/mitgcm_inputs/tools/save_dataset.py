@@ -4,6 +4,8 @@ from pathlib import Path
 import numpy as np
 import xarray as xr
 
+from mitgcm_inputs.tools.async_writer import AsyncWriter
+
 LOGGER = logging.getLogger(__name__)
 
 
@@ -13,10 +15,19 @@ def save_dataset(
     output_name_mask: str,
     output_dtype: np.typing.DTypeLike = np.float32,
 ):
-    for var_name in dataset.data_vars:
-        file_output_name = output_name_mask.replace("${VAR}", var_name)
-        file_output_path = output_dir / file_output_name
+    """
+    Write each variable of a dataset on a different binary file.
 
-        LOGGER.info("Writing output file: %s", file_output_path)
-        with open(file_output_path, "wb") as fw:
-            fw.write(dataset[var_name].values.astype(output_dtype).tobytes())
+    The variables are submitted to an `AsyncWriter`, so the conversion of
+    the values of a variable to `output_dtype` overlaps with the writing of
+    the previous ones, and several files are written at the same time.
+    Variables that are broadcast views (e.g., a constant value repeated on
+    all the cells and on all the days) are never expanded in memory.
+    """
+    with AsyncWriter() as writer:
+        for var_name in dataset.data_vars:
+            file_output_name = output_name_mask.replace("${VAR}", var_name)
+            file_output_path = output_dir / file_output_name
+            writer.write_array(
+                file_output_path, dataset[var_name].values, output_dtype
+            )
@@ -1,9 +1,39 @@
 import grp
+import io
+import logging
 import os
 import pwd
 import tarfile
+import zlib
+from collections import deque
+from collections.abc import Iterable
+from collections.abc import Iterator
+from concurrent.futures import Future
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from functools import lru_cache
+from os import PathLike
+from time import perf_counter
 from time import time
+from typing import NamedTuple
+
+import numpy as np
+
+LOGGER = logging.getLogger(__name__)
+
+
+# The size of the buffer used to read the blocks of a member that is
+# streamed into an archive
+STREAM_BUFFER_SIZE = 1024**2
+
+# The same compression level used by `tarfile` for the "w:gz" mode
+DEFAULT_COMPRESSION_LEVEL = 9
+
+# The number of threads that compress the blocks of a gzip stream
+DEFAULT_COMPRESSION_THREADS = min(8, os.cpu_count() or 1)
+
+# The size of the uncompressed blocks that are compressed independently
+DEFAULT_GZIP_BLOCK_SIZE = 4 * 1024**2
 
 
 @lru_cache(maxsize=1)
@@ -52,3 +82,269 @@ def set_tar_file_ownerships(tar_pointer: tarfile.TarInfo):
     tar_pointer.uname = user_description["uname"]
     tar_pointer.gname = user_description["gname"]
     tar_pointer.mtime = int(time())
+
+
+class StreamMember(NamedTuple):
+    """
+    A file of a tar archive whose content is produced on the fly.
+
+    Attributes:
+        name: The name of the member inside the archive.
+        size: The size of the member, in bytes; it must be known in advance
+            because it is written in the header of the member.
+        blocks: An iterable of numpy arrays (or bytes-like objects) whose
+            bytes, concatenated, are the content of the member. Each block
+            is read before the next one is requested, so the same buffer can
+            be yielded several times.
+    """
+
+    name: str
+    size: int
+    blocks: Iterable
+
+
+class _BlockReader(io.RawIOBase):
+    """
+    A read-only binary stream that returns the bytes of a sequence of blocks.
+    """
+
+    def __init__(self, blocks: Iterable):
+        self._blocks = iter(blocks)
+        self._current = memoryview(b"")
+        self.bytes_read = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def _next_block(self) -> bool:
+        for block in self._blocks:
+            if isinstance(block, np.ndarray):
+                block = np.ascontiguousarray(block).reshape(-1).view(np.uint8)
+            self._current = memoryview(block).cast("B")
+            if len(self._current) > 0:
+                return True
+        return False
+
+    def readinto(self, buffer) -> int:
+        if len(self._current) == 0 and not self._next_block():
+            return 0
+        n_bytes = min(len(buffer), len(self._current))
+        buffer[:n_bytes] = self._current[:n_bytes]
+        self._current = self._current[n_bytes:]
+        self.bytes_read += n_bytes
+        return n_bytes
+
+
+def add_stream_member(
+    tar: tarfile.TarFile, member: StreamMember, arcname: str | None = None
+):
+    """
+    Add a member to a tar archive reading its content from its blocks, so
+    that the content never needs to be written on a temporary file.
+
+    The ownership and the modification time of the member are the ones of
+    the current user (see `set_tar_file_ownerships`).
+
+    Args:
+        tar: An archive opened in write mode.
+        member: The member that is added.
+        arcname: The name of the member inside the archive; if it is None,
+            `member.name` is used.
+
+    Raises:
+        ValueError: If the blocks do not contain exactly `member.size`
+            bytes.
+    """
+    tar_info = tarfile.TarInfo(member.name if arcname is None else arcname)
+    tar_info.size = member.size
+    tar_info.mode = 0o644
+    set_tar_file_ownerships(tar_info)
+
+    reader = _BlockReader(member.blocks)
+    stream = io.BufferedReader(reader, buffer_size=STREAM_BUFFER_SIZE)
+    try:
+        tar.addfile(tar_info, stream)
+    except OSError as e:
+        # `tarfile` raises an OSError when the stream ends too early
+        if reader.bytes_read < member.size:
+            raise ValueError(
+                f"Member {tar_info.name} contains {reader.bytes_read} bytes "
+                f"instead of {member.size}"
+            ) from e
+        raise
+    if stream.read(1):
+        raise ValueError(
+            f"Member {tar_info.name} contains more than {member.size} bytes"
+        )
+
+
+def _compress_block(block: bytes, compression_level: int) -> bytes:
+    # wbits=31 produces a complete gzip member (header, deflate stream and
+    # trailer); zlib releases the GIL while it compresses
+    compressor = zlib.compressobj(compression_level, zlib.DEFLATED, 31)
+    return compressor.compress(block) + compressor.flush()
+
+
+class ParallelGzipWriter:
+    """
+    A write-only binary file that compresses its content with gzip using
+    several threads, in the same way of `pigz`.
+
+    The data is split in blocks of `block_size` bytes that are compressed
+    independently by a pool of threads; each block becomes a member of a
+    multi-member gzip stream (RFC 1952), which is decompressed by `gzip`,
+    `tar -xzf` and `tarfile` exactly as a single-member one. The
+    compressed blocks are written on the file in order; the number of
+    blocks that are being compressed is bounded, so the memory used does not
+    depend on the size of the file. Compressing the blocks independently
+    makes the file slightly larger than the one produced by a single
+    stream.
+
+    Args:
+        output_file: The path of the file that is written.
+        compression_level: The zlib compression level (from 0 to 9).
+        workers: The number of threads that compress the blocks.
+        block_size: The size (in bytes) of the uncompressed blocks.
+    """
+
+    def __init__(
+        self,
+        output_file: PathLike,
+        compression_level: int = DEFAULT_COMPRESSION_LEVEL,
+        workers: int = DEFAULT_COMPRESSION_THREADS,
+        block_size: int = DEFAULT_GZIP_BLOCK_SIZE,
+    ):
+        if not 0 <= compression_level <= 9:
+            raise ValueError(f"Invalid compression level: {compression_level}")
+        if workers < 1:
+            raise ValueError("The number of workers must be positive")
+        self.name = os.fspath(output_file)
+        self.mode = "wb"
+        self._compression_level = compression_level
+        self._block_size = block_size
+        self._max_pending = 2 * workers
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="gzip_writer"
+        )
+        self._pending: deque[Future] = deque()
+        self._buffer = bytearray()
+        self._position = 0
+        self._compressed_size = 0
+        self._start_time = perf_counter()
+        self._file = open(output_file, "wb")
+        self.closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._abort()
+
+    def tell(self) -> int:
+        """
+        Return the number of uncompressed bytes written so far.
+        """
+        return self._position
+
+    def write(self, data) -> int:
+        if self.closed:
+            raise ValueError("I/O operation on closed file")
+        data = memoryview(data).cast("B")
+        n_bytes = len(data)
+        self._position += n_bytes
+        while len(data) > 0:
+            free_space = self._block_size - len(self._buffer)
+            self._buffer += data[:free_space]
+            data = data[free_space:]
+            if len(self._buffer) >= self._block_size:
+                self._submit_buffer()
+        return n_bytes
+
+    def _submit_buffer(self):
+        block = bytes(self._buffer)
+        self._buffer.clear()
+        self._pending.append(
+            self._executor.submit(
+                _compress_block, block, self._compression_level
+            )
+        )
+        while len(self._pending) > self._max_pending:
+            self._write_next()
+
+    def _write_next(self):
+        compressed_block = self._pending.popleft().result()
+        self._file.write(compressed_block)
+        self._compressed_size += len(compressed_block)
+
+    def flush(self):
+        """
+        Compress the data written so far and write it on the file; this
+        closes the current gzip member.
+        """
+        if len(self._buffer) > 0:
+            self._submit_buffer()
+        while self._pending:
+            self._write_next()
+        self._file.flush()
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            self.flush()
+        finally:
+            self.closed = True
+            self._executor.shutdown(wait=True)
+            self._file.close()
+
+        elapsed = perf_counter() - self._start_time
+        LOGGER.info(
+            "%s: %.1f MB compressed into %.1f MB in %.2f s (%.1f MB/s)",
+            self.name,
+            self._position / 1024**2,
+            self._compressed_size / 1024**2,
+            elapsed,
+            self._position / 1024**2 / max(elapsed, 1e-9),
+        )
+
+    def _abort(self):
+        self.closed = True
+        for future in self._pending:
+            future.cancel()
+        self._executor.shutdown(wait=True)
+        self._file.close()
+
+
+@contextmanager
+def open_tar_writer(
+    output_file: PathLike,
+    compression_level: int = DEFAULT_COMPRESSION_LEVEL,
+    compress: bool = True,
+    workers: int = DEFAULT_COMPRESSION_THREADS,
+) -> Iterator[tarfile.TarFile]:
+    """
+    Open a tar archive for writing.
+
+    If `compress` is True, the archive is compressed with gzip by a
+    `ParallelGzipWriter` (so it can be read as a usual tar.gz archive);
+    otherwise, it is a plain tar archive.
+
+    Args:
+        output_file: The path of the archive.
+        compression_level: The gzip compression level (from 0 to 9).
+        compress: If False, the archive is not compressed.
+        workers: The number of threads that compress the archive.
+    """
+    if not compress:
+        with tarfile.open(output_file, "w") as tar:
+            yield tar
+        return
+
+    with ParallelGzipWriter(
+        output_file, compression_level, workers
+    ) as gzip_file:
+        with tarfile.open(fileobj=gzip_file, mode="w") as tar:
+            yield tar
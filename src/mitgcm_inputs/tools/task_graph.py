@@ -0,0 +1,172 @@
+import logging
+from collections.abc import Callable
+from collections.abc import Iterable
+from concurrent.futures import FIRST_COMPLETED
+from concurrent.futures import Future
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait
+from time import perf_counter
+from typing import Any
+from typing import NamedTuple
+
+LOGGER = logging.getLogger(__name__)
+
+
+class Task(NamedTuple):
+    """
+    A node of a task graph.
+
+    Attributes:
+        name: The name of the task; it must be unique inside the graph.
+        function: The function executed by the task; it receives, as
+            positional arguments, the results of its dependencies (in the
+            same order of `dependencies`).
+        dependencies: The names of the tasks that must be completed before
+            this one.
+    """
+
+    name: str
+    function: Callable[..., Any]
+    dependencies: tuple[str, ...] = ()
+
+
+class TaskReport(NamedTuple):
+    """
+    The timing of a task that has been executed.
+
+    Attributes:
+        name: The name of the task.
+        start_time: When the task started (in seconds since the start of
+            the graph).
+        end_time: When the task ended (in seconds since the start of the
+            graph).
+    """
+
+    name: str
+    start_time: float
+    end_time: float
+
+    @property
+    def elapsed_time(self) -> float:
+        return self.end_time - self.start_time
+
+
+def _check_graph(tasks: dict[str, Task]):
+    for task in tasks.values():
+        for dependency in task.dependencies:
+            if dependency not in tasks:
+                raise ValueError(
+                    f'Task "{task.name}" depends on "{dependency}", which is '
+                    "not a task of the graph"
+                )
+
+    # Remove the tasks without dependencies until nothing is left; if this
+    # is not possible, there is a cycle
+    remaining = {name: set(task.dependencies) for name, task in tasks.items()}
+    while remaining:
+        ready = [name for name, deps in remaining.items() if not deps]
+        if not ready:
+            raise ValueError(
+                "The graph contains a cycle among the tasks "
+                f"{sorted(remaining)}"
+            )
+        for name in ready:
+            del remaining[name]
+        for deps in remaining.values():
+            deps.difference_update(ready)
+
+
+def log_task_reports(reports: Iterable[TaskReport]):
+    """
+    Write on the log when each task started and how long it took, in the
+    order in which the tasks started.
+    """
+    reports = sorted(reports, key=lambda r: r.start_time)
+    name_length = max((len(r.name) for r in reports), default=0)
+    LOGGER.info("Timing of the tasks:")
+    for report in reports:
+        LOGGER.info(
+            "    %s started after %8.2f s, completed in %8.2f s",
+            report.name.ljust(name_length),
+            report.start_time,
+            report.elapsed_time,
+        )
+
+
+def run_task_graph(
+    tasks: Iterable[Task], max_workers: int = 4
+) -> tuple[dict[str, Any], dict[str, TaskReport]]:
+    """
+    Execute a graph of tasks in a pool of threads.
+
+    A task starts as soon as all its dependencies have been completed, so
+    the tasks that do not depend on each other run at the same time (at
+    most `max_workers` at once). The objects returned by a task are shared
+    (not copied) among all the tasks that depend on it, so they must be
+    considered read-only.
+
+    If a task raises an exception, the tasks that have not started yet are
+    not executed, the running ones are completed and the exception is
+    raised again.
+
+    Args:
+        tasks: The tasks of the graph.
+        max_workers: The maximum number of tasks executed at the same time.
+
+    Returns:
+        The result of each task and its timing, indexed by the name of the
+        task.
+    """
+    if max_workers < 1:
+        raise ValueError(
+            f"The number of workers must be positive: {max_workers}"
+        )
+
+    tasks = {task.name: task for task in tasks}
+    _check_graph(tasks)
+
+    graph_start = perf_counter()
+    results: dict[str, Any] = {}
+    reports: dict[str, TaskReport] = {}
+
+    def execute(task: Task) -> Any:
+        start_time = perf_counter() - graph_start
+        LOGGER.info("Starting task %s", task.name)
+        args = [results[dependency] for dependency in task.dependencies]
+        result = task.function(*args)
+        end_time = perf_counter() - graph_start
+        reports[task.name] = TaskReport(task.name, start_time, end_time)
+        LOGGER.info(
+            "Task %s completed in %.2f s", task.name, end_time - start_time
+        )
+        return result
+
+    waiting = dict(tasks)
+    running: dict[Future, str] = {}
+    with ThreadPoolExecutor(
+        max_workers=max_workers, thread_name_prefix="task_graph"
+    ) as executor:
+        try:
+            while waiting or running:
+                ready = [
+                    task
+                    for task in waiting.values()
+                    if all(dep in results for dep in task.dependencies)
+                ]
+                for task in ready:
+                    del waiting[task.name]
+                    running[executor.submit(execute, task)] = task.name
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    task_name = running.pop(future)
+                    if future.exception() is not None:
+                        LOGGER.error("Task %s failed", task_name)
+                    results[task_name] = future.result()
+        except BaseException:
+            for future in running:
+                future.cancel()
+            raise
+
+    log_task_reports(reports.values())
+    return results, reports
@@ -0,0 +1,202 @@
+import hashlib
+import logging
+import os
+import pickle  # nosec B403
+from pathlib import Path
+from tempfile import NamedTemporaryFile
+from typing import Any
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from mitgcm_inputs.tools.interpolation import SparseInterpolator
+
+LOGGER = logging.getLogger(__name__)
+
+
+# The maximum size (in bytes) of the files stored inside the cache; when this
+# threshold is exceeded, the least recently used files are removed
+DEFAULT_MAX_CACHE_SIZE = 2 * 1024**3
+
+
+def fingerprint_arrays(*arrays: np.ndarray) -> str:
+    """
+    Compute a hash of the content of some numpy arrays.
+
+    Besides the values of the arrays, the hash also depends on their shape
+    and dtype, so that two arrays that share the same bytes but that must be
+    interpreted differently produce two different fingerprints.
+    """
+    hasher = hashlib.sha256()
+    for array in arrays:
+        array = np.ascontiguousarray(array)
+        hasher.update(f"{array.dtype.str}{array.shape}".encode())
+        hasher.update(array.view(np.uint8).ravel())
+    return hasher.hexdigest()
+
+
+class WeightsCache:
+    """
+    A directory where the results of expensive geometric computations
+    (triangulations and interpolation weights) are stored, so that they can
+    be reused by the following executions.
+
+    Each object is stored in a different file, whose name is built from a
+    key provided by the user; the key should contain a fingerprint of all
+    the inputs that have been used to compute the object. The size of the
+    cache is bounded: every time a new file is written, the least recently
+    used files are removed until the total size is smaller than `max_size`.
+
+    Args:
+        cache_dir: The directory where the files will be written; it is
+            created if it does not exist.
+        max_size: The maximum size of the cache, in bytes.
+    """
+
+    def __init__(
+        self, cache_dir: os.PathLike, max_size: int = DEFAULT_MAX_CACHE_SIZE
+    ):
+        self.cache_dir = Path(cache_dir)
+        self.max_size = max_size
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, key: str, suffix: str) -> Path:
+        return self.cache_dir / f"{key}{suffix}"
+
+    def _touch(self, file_path: Path):
+        # The modification time is used to track which files have been used
+        # more recently
+        try:
+            os.utime(file_path)
+        except OSError:
+            LOGGER.debug("Unable to update the timestamp of %s", file_path)
+
+    def _discard(self, file_path: Path, error: Exception):
+        # A file that can not be read is treated as a cache miss; it is
+        # removed, so that it is replaced by the next write
+        LOGGER.warning(
+            "Unable to read %s from the cache (%s: %s); it will be computed "
+            "again",
+            file_path.name,
+            type(error).__name__,
+            error,
+        )
+        file_path.unlink(missing_ok=True)
+
+    def _write(self, file_path: Path, writer):
+        # We write on a temporary file and then we rename it, so that other
+        # processes that share the same cache never read a partial file
+        with NamedTemporaryFile(
+            dir=self.cache_dir, prefix=".tmp_", delete=False
+        ) as f:
+            tmp_path = Path(f.name)
+            try:
+                writer(f)
+            except BaseException:
+                f.close()
+                tmp_path.unlink(missing_ok=True)
+                raise
+        os.replace(tmp_path, file_path)
+        LOGGER.debug("Cache file %s written", file_path)
+        self.evict()
+
+    def evict(self):
+        """
+        Remove the least recently used files until the size of the cache is
+        smaller than `max_size`.
+        """
+        cache_files = []
+        for file_path in self.cache_dir.iterdir():
+            if file_path.name.startswith(".tmp_") or not file_path.is_file():
+                continue
+            try:
+                file_stat = file_path.stat()
+            except FileNotFoundError:
+                continue
+            cache_files.append(
+                (file_stat.st_mtime_ns, file_stat.st_size, file_path)
+            )
+
+        total_size = sum(f[1] for f in cache_files)
+        for _, file_size, file_path in sorted(cache_files):
+            if total_size <= self.max_size:
+                break
+            LOGGER.debug("Removing %s from the cache", file_path)
+            file_path.unlink(missing_ok=True)
+            total_size -= file_size
+
+    def get_interpolator(self, key: str) -> SparseInterpolator | None:
+        """
+        Return the interpolator saved with the given key or None if it is not
+        inside the cache.
+        """
+        file_path = self._path(key, ".npz")
+        try:
+            with np.load(file_path) as f:
+                weights = csr_matrix(
+                    (f["data"], f["indices"], f["indptr"]),
+                    shape=tuple(f["shape"]),
+                )
+                interpolator = SparseInterpolator(weights, f["valid"])
+        except FileNotFoundError:
+            return None
+        except (KeyError, ValueError, OSError) as e:
+            self._discard(file_path, e)
+            return None
+        LOGGER.debug("Interpolator %s read from the cache", key)
+        self._touch(file_path)
+        return interpolator
+
+    def put_interpolator(self, key: str, interpolator: SparseInterpolator):
+        """
+        Store an interpolator inside the cache using the given key.
+        """
+        weights = interpolator.weights
+
+        def writer(f):
+            np.savez(
+                f,
+                data=weights.data,
+                indices=weights.indices,
+                indptr=weights.indptr,
+                shape=np.asarray(weights.shape),
+                valid=interpolator.valid,
+            )
+
+        self._write(self._path(key, ".npz"), writer)
+
+    def get_object(self, key: str) -> Any | None:
+        """
+        Return a generic python object (e.g., a triangulation) saved with the
+        given key or None if it is not inside the cache.
+        """
+        file_path = self._path(key, ".pickle")
+        try:
+            with open(file_path, "rb") as f:
+                # The cache is a local directory written only by this package
+                obj = pickle.load(f)  # nosec B301
+        except FileNotFoundError:
+            return None
+        except (
+            pickle.UnpicklingError,
+            EOFError,
+            # Raised by the files written with different versions of the
+            # libraries (e.g., a class that has been renamed or moved)
+            AttributeError,
+            ImportError,
+            TypeError,
+        ) as e:
+            self._discard(file_path, e)
+            return None
+        LOGGER.debug("Object %s read from the cache", key)
+        self._touch(file_path)
+        return obj
+
+    def put_object(self, key: str, obj: Any):
+        """
+        Store a generic python object inside the cache using the given key.
+        """
+        self._write(
+            self._path(key, ".pickle"),
+            lambda f: pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL),
+        )
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+import xarray as xr
+from bitsea.commons.grid import RegularGrid
+from bitsea.commons.mask import Mask
+
+
+@pytest.fixture
+def meshmask() -> Mask:
+    """
+    A small regular meshmask with land, shallow and deep water cells.
+    """
+    lon = np.linspace(12.0, 18.0, 13)
+    lat = np.linspace(38.0, 44.0, 9)
+    grid = RegularGrid(lat=lat, lon=lon)
+
+    lon_2d, lat_2d = np.meshgrid(lon, lat)
+    depth = np.array([5.0, 20.0, 40.0, 60.0, 90.0, 150.0])
+    bathymetry = 80.0 * (1.0 + np.sin(lon_2d * 3.0) * np.cos(lat_2d * 2.0))
+    tmask = depth[:, None, None] <= bathymetry[None, :, :]
+    e3t = np.broadcast_to(
+        np.gradient(depth)[:, None, None], tmask.shape
+    ).copy()
+    return Mask(grid, depth, tmask, e3t=e3t)
+
+
+@pytest.fixture
+def climatology_file(tmp_path):
+    """
+    A climatology of the K extinction coefficients with the same structure
+    of `kExt_climatology.nc`, on a regular grid that covers `meshmask`.
+    """
+    lon = np.linspace(10.0, 20.0, 41)
+    lat = np.linspace(36.0, 46.0, 31)
+    lon_2d, lat_2d = np.meshgrid(lon, lat)
+
+    rng = np.random.default_rng(0)
+    days = np.arange(1, 366)
+    seasonal = 0.05 * np.cos(2 * np.pi * days / 365.0)
+    space = 0.1 + 0.02 * np.sin(lon_2d) * np.cos(lat_2d)
+    kext = seasonal[:, None, None] + space[None, :, :]
+    kext += 0.001 * rng.standard_normal(kext.shape)
+    kext = kext.astype(np.float32)
+
+    # A round island inside the domain
+    land = (lon_2d - 15.0) ** 2 + (lat_2d - 41.0) ** 2 < 1.0
+    kext[:, land] = np.nan
+
+    output_file = tmp_path / "kExt_climatology.nc"
+    xr.Dataset(
+        data_vars={"kExt": (("day", "y", "x"), kext)},
+        coords={
+            "longitude": (("y", "x"), lon_2d),
+            "latitude": (("y", "x"), lat_2d),
+        },
+    ).to_netcdf(output_file)
+    return output_file
@@ -0,0 +1,117 @@
+import numpy as np
+import pytest
+
+from mitgcm_inputs.tools.async_writer import AsyncWriter
+from mitgcm_inputs.tools.async_writer import iter_blocks
+
+
+def joined_bytes(blocks):
+    return b"".join(np.ascontiguousarray(b).tobytes() for b in blocks)
+
+
+SIGNED_ZEROS = np.array([[0.0, -0.0, 1.5], [-2.25, -0.0, 3.0]])
+
+
+@pytest.mark.parametrize(
+    "array",
+    [
+        np.arange(24, dtype=np.float32).reshape(4, 6),
+        np.arange(24, dtype=np.float64).reshape(4, 6),
+        np.arange(24, dtype=np.float64).reshape(4, 6)[:, ::2],
+        SIGNED_ZEROS,
+        np.broadcast_to(SIGNED_ZEROS, (5, 2, 3)),
+        np.broadcast_to(np.float64(-0.0), (7, 3)),
+        np.broadcast_to(np.arange(3.0), (10, 3)),
+    ],
+)
+@pytest.mark.parametrize("chunk_size", [1, 20, 1024])
+def test_iter_blocks_produces_the_bytes_of_astype(array, chunk_size):
+    blocks = list(iter_blocks(array, np.float32, chunk_size))
+    assert joined_bytes(blocks) == array.astype(np.float32).tobytes()
+    for block in blocks:
+        assert block.dtype == np.float32
+
+
+def test_iter_blocks_bounds_the_size_of_the_blocks():
+    array = np.arange(1000, dtype=np.float64).reshape(100, 10)
+    blocks = list(iter_blocks(array, np.float32, chunk_size=200))
+    # 200 bytes are 5 rows of 10 float32 values
+    assert len(blocks) == 20
+    assert max(b.nbytes for b in blocks) == 200
+
+
+def test_iter_blocks_reuses_the_pattern_of_broadcast_arrays():
+    array = np.broadcast_to(np.arange(4.0), (1000, 4))
+    blocks = list(iter_blocks(array, np.float32, chunk_size=64))
+    # Only one block is allocated; it is yielded several times
+    assert len(blocks) == 250
+    assert all(np.shares_memory(b, blocks[0]) for b in blocks)
+
+
+def test_async_writer_writes_the_blocks_in_order(tmp_path):
+    rng = np.random.default_rng(0)
+    days = [rng.uniform(size=(6, 7)) for _ in range(20)]
+    large = rng.uniform(size=(50, 6, 7))
+    output_file = tmp_path / "output.bin"
+    other_file = tmp_path / "other.bin"
+
+    with AsyncWriter(max_workers=3, max_pending=2) as writer:
+        frame = np.empty((6, 7), dtype=np.float32)
+        for day in days:
+            # The frame is reused: the writer must keep a copy
+            frame[:] = day
+            writer.write(output_file, frame)
+            writer.write(other_file, day, np.float32)
+        writer.write_array(output_file, large, np.float32)
+
+    expected = np.concatenate(
+        [np.asarray(days, dtype=np.float32).ravel(), large.ravel()]
+    ).astype(np.float32)
+    assert output_file.read_bytes() == expected.tobytes()
+    assert other_file.read_bytes() == (
+        np.asarray(days, dtype=np.float32).tobytes()
+    )
+
+
+def test_async_writer_writes_broadcast_arrays(tmp_path):
+    pattern = np.array([[0.0, -0.0, 1.5], [-2.25, 7.0, 3.0]])
+    arrays = [
+        np.broadcast_to(pattern, (50, 2, 3)),
+        np.broadcast_to(np.float64(-0.0), (20, 2, 3)),
+        np.broadcast_to(pattern[:, np.newaxis], (2, 10, 3)),
+    ]
+    output_file = tmp_path / "output.bin"
+
+    with AsyncWriter(max_pending=2) as writer:
+        for array in arrays:
+            writer.write_array(output_file, array, np.float32)
+
+    assert output_file.read_bytes() == b"".join(
+        a.astype(np.float32).tobytes() for a in arrays
+    )
+
+
+def test_async_writer_bounds_the_converted_blocks(tmp_path, monkeypatch):
+    sizes = []
+    original_submit = AsyncWriter._submit
+
+    def submit(self, output_file, block):
+        sizes.append(block.nbytes)
+        original_submit(self, output_file, block)
+
+    monkeypatch.setattr(AsyncWriter, "_submit", submit)
+    array = np.arange(4000, dtype=np.float64).reshape(400, 10)
+    with AsyncWriter(max_pending=4, conversion_memory=400) as writer:
+        writer.write_array(tmp_path / "output.bin", array, np.float32)
+
+    # Each block can use a quarter of the conversion memory (2 rows)
+    assert max(sizes) == 80
+    assert (tmp_path / "output.bin").read_bytes() == (
+        array.astype(np.float32).tobytes()
+    )
+
+
+def test_async_writer_raises_the_write_errors(tmp_path):
+    with pytest.raises(OSError):
+        with AsyncWriter() as writer:
+            writer.write(tmp_path / "missing_dir" / "output.bin", np.zeros(3))
@@ -0,0 +1,39 @@
+from pathlib import Path
+
+from mitgcm_inputs.batch.scheduler import _pick_next
+from mitgcm_inputs.batch.scheduler import BatchDomain
+from mitgcm_inputs.batch.scheduler import run_batch
+from mitgcm_inputs.domain.pipeline import DomainInputs
+
+
+def build_domain(name, memory_estimate, root=Path("/nonexistent")):
+    inputs = DomainInputs(
+        mask=root / f"{name}_meshmask.nc",
+        output_dir=root / name,
+        sewage_file=root / "sewage.xlsx",
+    )
+    return BatchDomain(name, inputs, memory_estimate)
+
+
+def test_pick_next_returns_the_largest_domain_that_fits():
+    pending = [build_domain(n, m) for n, m in (("a", 8), ("b", 5), ("c", 2))]
+
+    assert _pick_next(pending, used_memory=0, memory_budget=10).name == "a"
+    assert _pick_next(pending, used_memory=4, memory_budget=10).name == "b"
+    assert _pick_next(pending, used_memory=7, memory_budget=10).name == "c"
+    assert _pick_next(pending, used_memory=9, memory_budget=10) is None
+    assert _pick_next([], used_memory=0, memory_budget=10) is None
+
+
+def test_a_failed_domain_stops_the_batch(tmp_path):
+    # The meshmask of the largest domain does not exist, so it fails; since
+    # only one domain runs at a time, the other one is never started
+    domains = [
+        build_domain("small", 1, tmp_path),
+        build_domain("large", 2, tmp_path),
+    ]
+
+    assert not run_batch(domains, memory_budget=10, max_workers=1)
+
+    assert (tmp_path / "large").is_dir()
+    assert not (tmp_path / "small").exists()
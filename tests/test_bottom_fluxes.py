@@ -0,0 +1,47 @@
+import numpy as np
+
+from mitgcm_inputs.bottom_fluxes.bottom_fluxes import BenthicVar
+from mitgcm_inputs.bottom_fluxes.bottom_fluxes import compute_bottom_fluxes
+from mitgcm_inputs.bottom_fluxes.bottom_fluxes import write_bottom_fluxes
+from mitgcm_inputs.tools.save_dataset import save_dataset
+
+NAME_MASK = "${VAR}_bottom_fluxes.bin"
+
+
+def test_the_streaming_output_is_equal_to_the_dense_one(meshmask, tmp_path):
+    dense_dir = tmp_path / "dense"
+    sparse_dir = tmp_path / "sparse"
+    dense_dir.mkdir()
+    sparse_dir.mkdir()
+
+    save_dataset(compute_bottom_fluxes(meshmask), dense_dir, NAME_MASK)
+    write_bottom_fluxes(meshmask, sparse_dir, NAME_MASK)
+
+    for variable in BenthicVar:
+        file_name = NAME_MASK.replace("${VAR}", variable)
+        assert (sparse_dir / file_name).read_bytes() == (
+            dense_dir / file_name
+        ).read_bytes()
+
+
+def test_the_zero_fluxes_keep_the_sign_of_the_reference_flux(
+    meshmask, tmp_path
+):
+    write_bottom_fluxes(meshmask, tmp_path, NAME_MASK)
+    water = meshmask[0]
+    deep_water = water & (meshmask.bathymetry() >= 75.0)
+    assert np.any(deep_water)
+
+    days = {
+        variable: np.fromfile(
+            tmp_path / NAME_MASK.replace("${VAR}", variable), dtype=np.float32
+        ).reshape((-1,) + meshmask.shape[1:])
+        for variable in (BenthicVar.N, BenthicVar.O)
+    }
+    # The flux of O is negative: on water, its zeros are -0.0
+    assert np.all(days[BenthicVar.N][:, deep_water] == 0)
+    assert not np.any(np.signbit(days[BenthicVar.N][:, deep_water]))
+    assert np.all(days[BenthicVar.O][:, deep_water] == 0)
+    assert np.all(np.signbit(days[BenthicVar.O][:, deep_water]))
+    # The land cells are not affected
+    assert not np.any(np.signbit(days[BenthicVar.O][:, ~water]))
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from mitgcm_inputs.bottom_fluxes.bottom_fluxes import BenthicVar
+from mitgcm_inputs.bottom_fluxes.bottom_fluxes import compute_bottom_fluxes
+from mitgcm_inputs.bottom_fluxes.bottom_fluxes import write_bottom_fluxes
+from mitgcm_inputs.bottom_fluxes.budget import cell_areas
+from mitgcm_inputs.bottom_fluxes.budget import compute_budgets
+from mitgcm_inputs.bottom_fluxes.budget import read_budget
+
+NAME_MASK = "${VAR}_bottom_fluxes.bin"
+
+
+def test_the_closed_form_matches_the_integral_of_the_dense_fluxes(meshmask):
+    dense = compute_bottom_fluxes(meshmask)
+    areas = cell_areas(meshmask)
+    water = meshmask[0]
+
+    budgets = compute_budgets(meshmask)
+
+    assert set(budgets) == set(BenthicVar)
+    for variable, budget in budgets.items():
+        expected = np.sum(
+            dense[variable].values[:, water] * areas[water], axis=1
+        )
+        np.testing.assert_allclose(
+            budget.daily_flux, expected, rtol=1e-12, atol=0
+        )
+    assert budgets[BenthicVar.N].annual_budget > 0
+    assert budgets[BenthicVar.O].annual_budget < 0
+    assert budgets[BenthicVar.B].annual_budget == 0
+
+
+def test_the_closed_form_matches_the_budget_of_the_files(meshmask, tmp_path):
+    write_bottom_fluxes(meshmask, tmp_path, NAME_MASK)
+    areas = cell_areas(meshmask)
+
+    for variable, budget in compute_budgets(meshmask).items():
+        file_path = tmp_path / NAME_MASK.replace("${VAR}", variable)
+        file_budget = read_budget(file_path, variable, meshmask, areas)
+        # The files store float32 values
+        np.testing.assert_allclose(
+            file_budget.daily_flux, budget.daily_flux, rtol=1e-6, atol=0
+        )
+        assert file_budget.annual_budget == pytest.approx(
+            budget.annual_budget, rel=1e-6
+        )
+
+
+def test_read_budget_rejects_a_truncated_file(meshmask, tmp_path):
+    file_path = tmp_path / "truncated.bin"
+    n_cells = meshmask.shape[1] * meshmask.shape[2]
+    np.zeros(2 * n_cells + 1, dtype=np.float32).tofile(file_path)
+    with pytest.raises(ValueError):
+        read_budget(file_path, BenthicVar.N, meshmask)
@@ -0,0 +1,202 @@
+import argparse
+import os
+
+from mitgcm_inputs.domain.pipeline import run_generator
+from mitgcm_inputs.tools.build_cache import BuildCache
+from mitgcm_inputs.tools.build_cache import CacheSpec
+from mitgcm_inputs.tools.build_cache import run_cached
+
+SPEC = CacheSpec(
+    output_files=("output",), output_dirs=("output_dir",), ignored=("jobs",)
+)
+
+
+class Command:
+    """
+    A command that copies its input into its outputs, counting how many
+    times it has been executed.
+    """
+
+    def __init__(self):
+        self.executions = 0
+
+    def __call__(self, args: argparse.Namespace) -> int:
+        self.executions += 1
+        content = args.input.read_bytes()
+        args.output.write_bytes(content)
+        args.output_dir.mkdir(exist_ok=True)
+        (args.output_dir / "copy.bin").write_bytes(content)
+        return 0
+
+
+def build_args(tmp_path, jobs=1):
+    return argparse.Namespace(
+        cmd="copy",
+        input=tmp_path / "input.bin",
+        output=tmp_path / "output.bin",
+        output_dir=tmp_path / "output_dir",
+        jobs=jobs,
+    )
+
+
+def test_the_outputs_are_restored_when_the_inputs_do_not_change(tmp_path):
+    cache = BuildCache(tmp_path / "cache")
+    command = Command()
+    (tmp_path / "input.bin").write_bytes(b"first")
+
+    assert run_cached(cache, "copy", SPEC, build_args(tmp_path), command) == 0
+    assert command.executions == 1
+
+    (tmp_path / "output.bin").unlink()
+    (tmp_path / "output_dir" / "copy.bin").unlink()
+    # The ignored arguments do not change the key
+    args = build_args(tmp_path, jobs=4)
+    assert run_cached(cache, "copy", SPEC, args, command) == 0
+
+    assert command.executions == 1
+    assert (tmp_path / "output.bin").read_bytes() == b"first"
+    assert (tmp_path / "output_dir" / "copy.bin").read_bytes() == b"first"
+
+
+def test_a_different_input_is_a_miss(tmp_path):
+    cache = BuildCache(tmp_path / "cache")
+    command = Command()
+    args = build_args(tmp_path)
+
+    (tmp_path / "input.bin").write_bytes(b"first")
+    first_key = cache.key("copy", SPEC, args)
+    run_cached(cache, "copy", SPEC, args, command)
+
+    (tmp_path / "input.bin").write_bytes(b"second")
+    assert cache.key("copy", SPEC, args) != first_key
+    run_cached(cache, "copy", SPEC, args, command)
+
+    assert command.executions == 2
+    assert (tmp_path / "output.bin").read_bytes() == b"second"
+
+
+def test_restored_outputs_are_detached_from_the_cache(tmp_path):
+    cache = BuildCache(tmp_path / "cache")
+    command = Command()
+    args = build_args(tmp_path)
+
+    (tmp_path / "input.bin").write_bytes(b"first")
+    run_cached(cache, "copy", SPEC, args, command)
+    run_cached(cache, "copy", SPEC, args, command)
+    assert command.executions == 1
+
+    # The outputs are now restored from the cache (possibly as hard links);
+    # a new execution must not overwrite the content of the cache
+    (tmp_path / "input.bin").write_bytes(b"second")
+    run_cached(cache, "copy", SPEC, args, command)
+    assert (tmp_path / "output.bin").read_bytes() == b"second"
+
+    (tmp_path / "input.bin").write_bytes(b"first")
+    run_cached(cache, "copy", SPEC, args, command)
+    assert command.executions == 2
+    assert (tmp_path / "output.bin").read_bytes() == b"first"
+    assert (tmp_path / "output_dir" / "copy.bin").read_bytes() == b"first"
+
+
+def test_failed_executions_are_not_stored(tmp_path):
+    cache = BuildCache(tmp_path / "cache")
+    args = build_args(tmp_path)
+    (tmp_path / "input.bin").write_bytes(b"first")
+
+    assert run_cached(cache, "copy", SPEC, args, lambda _: 3) == 3
+    assert not cache.restore(
+        cache.key("copy", SPEC, args),
+        {"output": args.output, "output_dir": args.output_dir},
+    )
+
+
+def test_eviction_removes_the_least_recently_used_entries(tmp_path):
+    cache_dir = tmp_path / "cache"
+    command = Command()
+    args = build_args(tmp_path)
+
+    keys = {}
+    for content in (b"first", b"second"):
+        (tmp_path / "input.bin").write_bytes(content)
+        keys[content] = BuildCache(cache_dir).key("copy", SPEC, args)
+        run_cached(BuildCache(cache_dir), "copy", SPEC, args, command)
+
+    entry_sizes = {
+        content: sum(
+            f.stat().st_size
+            for f in (cache_dir / key).rglob("*")
+            if f.is_file()
+        )
+        for content, key in keys.items()
+    }
+    os.utime(cache_dir / keys[b"first"] / "manifest.json", ns=(1, 1))
+
+    # Only one entry fits inside the cache
+    BuildCache(cache_dir, max_size=max(entry_sizes.values())).evict()
+
+    assert not (cache_dir / keys[b"first"]).exists()
+    assert (cache_dir / keys[b"second"]).exists()
+
+
+def test_the_downloaded_data_is_part_of_the_key(tmp_path):
+    cache = BuildCache(tmp_path / "cache")
+    args = build_args(tmp_path)
+    (tmp_path / "input.bin").write_bytes(b"first")
+
+    first_spec = SPEC._replace(remote_inputs=("dataset", "2019", "2023"))
+    second_spec = SPEC._replace(remote_inputs=("dataset", "2019", "2024"))
+    assert cache.key("copy", first_spec, args) != cache.key(
+        "copy", second_spec, args
+    )
+
+
+def test_output_files_that_are_not_written_are_restored_as_missing(
+    tmp_path,
+):
+    cache = BuildCache(tmp_path / "cache")
+    spec = CacheSpec(output_files=("output", "skipped"))
+    args = argparse.Namespace(
+        cmd="copy",
+        input=tmp_path / "input.bin",
+        output=tmp_path / "output.bin",
+        skipped=tmp_path / "skipped.bin",
+    )
+    (tmp_path / "input.bin").write_bytes(b"first")
+
+    executions = []
+
+    def command(args: argparse.Namespace) -> int:
+        executions.append(args)
+        args.output.write_bytes(args.input.read_bytes())
+        return 0
+
+    run_cached(cache, "copy", spec, args, command)
+    (tmp_path / "output.bin").unlink()
+    run_cached(cache, "copy", spec, args, command)
+
+    assert len(executions) == 1
+    assert (tmp_path / "output.bin").read_bytes() == b"first"
+    assert not (tmp_path / "skipped.bin").exists()
+
+
+def test_the_generators_of_a_domain_are_restored_on_their_own(tmp_path):
+    cache = BuildCache(tmp_path / "cache")
+    spec = CacheSpec(output_files=("output",))
+    (tmp_path / "input.bin").write_bytes(b"first")
+    output_file = tmp_path / "output.bin"
+
+    executions = []
+
+    def generator():
+        executions.append(output_file)
+        output_file.write_bytes((tmp_path / "input.bin").read_bytes())
+
+    arguments = {"input": tmp_path / "input.bin", "output": output_file}
+    for build_cache in (None, cache, cache):
+        run_generator(build_cache, "copy", spec, arguments, generator)
+    assert len(executions) == 2
+
+    (tmp_path / "input.bin").write_bytes(b"second")
+    run_generator(cache, "copy", spec, arguments, generator)
+    assert len(executions) == 3
+    assert output_file.read_bytes() == b"second"
@@ -0,0 +1,81 @@
+import subprocess
+import sys
+
+import pytest
+
+from mitgcm_inputs.__main__ import argument
+from mitgcm_inputs.__main__ import load_command
+from mitgcm_inputs.__main__ import requested_command
+from mitgcm_inputs.commands import COMMAND_MAP
+from mitgcm_inputs.commands import COMMANDS
+
+
+def test_the_commands_have_unique_names():
+    assert len(COMMAND_MAP) == len(COMMANDS)
+    for command in COMMANDS:
+        assert COMMAND_MAP[command.name] is command
+
+
+@pytest.mark.parametrize("command", COMMANDS, ids=lambda c: c.name)
+def test_each_command_is_implemented_by_its_module(command):
+    module = load_command(command.name)
+    assert module.COMMAND_NAME == command.name
+    assert callable(module.sub_arguments)
+    assert callable(module.main)
+
+
+def test_requested_command():
+    assert requested_command(["bottom_fluxes", "-m", "mask.nc"]) == (
+        "bottom_fluxes"
+    )
+    assert requested_command(["--build-cache", "FLUXES", "-j", "2"]) == (
+        "FLUXES"
+    )
+    assert requested_command(["unknown"]) is None
+    assert requested_command([]) is None
+
+
+def test_only_the_invoked_command_is_imported(tmp_path):
+    mask_file = tmp_path / "meshmask.nc"
+    mask_file.touch()
+    script = f"""
+import sys
+from mitgcm_inputs.__main__ import argument
+
+args = argument(["bottom_fluxes", "-m", "{mask_file}", "-o", "{tmp_path}"])
+assert args.cmd == "bottom_fluxes", args
+print(" ".join(sorted(sys.modules)))
+"""
+    output = subprocess.run(
+        [sys.executable, "-c", script],
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    modules = set(output.stdout.split())
+
+    assert "mitgcm_inputs.bottom_fluxes" in modules
+    for command in COMMANDS:
+        if command.name != "bottom_fluxes":
+            assert command.module not in modules
+    assert "copernicusmarine" not in modules
+
+
+def test_the_arguments_of_the_invoked_command_are_parsed(tmp_path):
+    mask_file = tmp_path / "meshmask.nc"
+    mask_file.touch()
+    output_dir = tmp_path / "output"
+    args = argument(
+        [
+            "--build-cache",
+            "bottom_fluxes",
+            "-m",
+            str(mask_file),
+            "-o",
+            str(output_dir),
+        ]
+    )
+    assert args.cmd == "bottom_fluxes"
+    assert args.build_cache
+    assert args.mask == mask_file
+    assert args.output == output_dir
@@ -0,0 +1,24 @@
+import numpy as np
+
+from mitgcm_inputs.kext_climatology.climatology import fill_circular_gaps
+
+
+def test_fill_circular_gaps():
+    values = np.array(
+        [
+            [np.nan, 1.0, np.nan],
+            [2.0, np.nan, np.nan],
+            [np.nan, np.nan, np.nan],
+            [4.0, 4.0, np.nan],
+            [np.nan, 5.0, np.nan],
+        ]
+    )
+
+    n_filled = fill_circular_gaps(values, chunk_size=1)
+
+    assert n_filled == 5
+    # The first and the last days are interpolated across the end of the
+    # year; the column without values is left unchanged
+    np.testing.assert_allclose(values[:, 0], [8 / 3, 2.0, 3.0, 4.0, 10 / 3])
+    np.testing.assert_allclose(values[:, 1], [1.0, 2.0, 3.0, 4.0, 5.0])
+    assert np.all(np.isnan(values[:, 2]))
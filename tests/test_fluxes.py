@@ -0,0 +1,138 @@
+import tarfile
+
+import pytest
+
+from mitgcm_inputs.bottom_fluxes.bottom_fluxes import write_bottom_fluxes
+from mitgcm_inputs.fluxes import fluxes
+from mitgcm_inputs.fluxes.fluxes import FluxStage
+from mitgcm_inputs.fluxes.fluxes import iter_flux_members
+from mitgcm_inputs.fluxes.fluxes import iter_parallel_flux_members
+from mitgcm_inputs.fluxes.fluxes import write_archive
+from mitgcm_inputs.k_extinction.k_extinction import write_k_extinction
+from mitgcm_inputs.surface_deposition.surface_deposition import (
+    compute_surface_deposition,
+)
+from mitgcm_inputs.tools.domain import Domain
+from mitgcm_inputs.tools.save_dataset import save_dataset
+
+
+def read_archive(archive_file):
+    with tarfile.open(archive_file) as tar:
+        return {
+            member.name: tar.extractfile(member).read()
+            for member in tar.getmembers()
+            if member.isfile()
+        }
+
+
+def test_the_archive_contains_the_files_of_the_generators(
+    meshmask, climatology_file, tmp_path
+):
+    archive_file = tmp_path / "fluxes.tar.gz"
+    write_archive(
+        iter_flux_members(Domain(meshmask), data_file=climatology_file),
+        archive_file,
+    )
+
+    expected_dir = tmp_path / "expected"
+    expected_dir.mkdir()
+    write_bottom_fluxes(meshmask, expected_dir, "${VAR}_bottom_fluxes.bin")
+    save_dataset(
+        compute_surface_deposition(meshmask),
+        expected_dir,
+        "${VAR}_surface_fluxes.bin",
+    )
+    write_k_extinction(meshmask, expected_dir / "Kext.bin", climatology_file)
+
+    assert read_archive(archive_file) == {
+        f"fluxes/{path.name}": path.read_bytes()
+        for path in expected_dir.iterdir()
+    }
+
+
+@pytest.mark.parametrize("jobs", [1, 3])
+def test_the_parallel_archive_contains_the_serial_files(
+    meshmask, climatology_file, tmp_path, jobs
+):
+    serial_file = tmp_path / "serial" / "fluxes.tar.gz"
+    parallel_file = tmp_path / "parallel" / "fluxes.tar.gz"
+    serial_file.parent.mkdir()
+    parallel_file.parent.mkdir()
+
+    write_archive(
+        iter_flux_members(Domain(meshmask), data_file=climatology_file),
+        serial_file,
+    )
+    write_archive(
+        iter_parallel_flux_members(
+            Domain(meshmask), jobs, data_file=climatology_file
+        ),
+        parallel_file,
+    )
+
+    serial_members = read_archive(serial_file)
+    assert len(serial_members) == 8
+    assert read_archive(parallel_file) == serial_members
+    # The parallel stages do not leave any file behind
+    assert [p.name for p in parallel_file.parent.iterdir()] == [
+        parallel_file.name
+    ]
+
+
+def test_the_stages_wait_when_their_buffers_are_full(
+    meshmask, climatology_file, tmp_path, monkeypatch
+):
+    # Each stage can buffer only two small chunks, so the workers must wait
+    # for the archive many times
+    monkeypatch.setattr(fluxes, "STREAM_BUFFER_SIZE", 4096)
+    monkeypatch.setattr(fluxes, "STAGE_BUFFER_SIZE", 2 * 4096)
+
+    serial_members = {
+        member.name: b"".join(bytes(b) for b in member.blocks)
+        for member in iter_flux_members(
+            Domain(meshmask), data_file=climatology_file
+        )
+    }
+    parallel_members = {}
+    for member in iter_parallel_flux_members(
+        Domain(meshmask), 3, data_file=climatology_file
+    ):
+        chunks = list(member.blocks)
+        assert all(len(chunk) <= 4096 for chunk in chunks)
+        parallel_members[member.name] = b"".join(chunks)
+
+    assert parallel_members == serial_members
+
+
+def test_the_errors_of_the_workers_are_raised(
+    meshmask, climatology_file, monkeypatch
+):
+    original = fluxes.iter_stage_members
+
+    def failing_stage(stage, *args, **kwargs):
+        if stage == FluxStage.SURFACE_DEPOSITION:
+            raise RuntimeError("failed stage")
+        yield from original(stage, *args, **kwargs)
+
+    # The workers are forked, so they see the patched function
+    monkeypatch.setattr(fluxes, "iter_stage_members", failing_stage)
+    with pytest.raises(RuntimeError, match="failed stage"):
+        for member in iter_parallel_flux_members(
+            Domain(meshmask), 3, data_file=climatology_file
+        ):
+            for _ in member.blocks:
+                pass
+
+
+def test_the_workers_stop_when_the_archive_is_abandoned(
+    meshmask, climatology_file, monkeypatch
+):
+    monkeypatch.setattr(fluxes, "STAGE_BUFFER_SIZE", fluxes.STREAM_BUFFER_SIZE)
+    members = iter_parallel_flux_members(
+        Domain(meshmask), 3, data_file=climatology_file
+    )
+    member = next(members)
+    next(iter(member.blocks))
+    # The other workers are waiting for their queues to be read; closing
+    # the generator must not wait for them forever
+    members.close()
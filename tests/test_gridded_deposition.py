@@ -0,0 +1,203 @@
+import numpy as np
+import pytest
+import xarray as xr
+
+from mitgcm_inputs.surface_deposition.gridded import _crop_to_used_cells
+from mitgcm_inputs.surface_deposition.gridded import build_regridder
+from mitgcm_inputs.surface_deposition.gridded import frame_days
+from mitgcm_inputs.surface_deposition.gridded import open_gridded_source
+from mitgcm_inputs.surface_deposition.gridded import OutputFrequency
+from mitgcm_inputs.surface_deposition.gridded import record_days
+from mitgcm_inputs.surface_deposition.gridded import RegriddingMethod
+from mitgcm_inputs.surface_deposition.gridded import time_interpolation
+from mitgcm_inputs.surface_deposition.gridded import (
+    write_gridded_surface_deposition,
+)
+from mitgcm_inputs.tools.weights_cache import WeightsCache
+
+NAME_MASK = "${VAR}_surface_fluxes.bin"
+
+
+def linear_field(lon, lat):
+    return 1e-8 * (2.0 + 0.1 * lon - 0.05 * lat)
+
+
+@pytest.fixture
+def gridded_file(tmp_path):
+    """
+    A monthly climatology on a regular grid that covers `meshmask`: N1p is
+    a linear function of the coordinates multiplied by the number of the
+    month, N3n is constant on each month.
+    """
+    lon = np.arange(10.0, 20.01, 0.5)
+    lat = np.arange(36.0, 46.01, 0.5)
+    lon_2d, lat_2d = np.meshgrid(lon, lat)
+    months = np.arange(1.0, 13.0)[:, np.newaxis, np.newaxis]
+
+    n1p = months * linear_field(lon_2d, lat_2d)
+    n3n = np.broadcast_to(months * 1e-7, n1p.shape).copy()
+    # An invalid cell far from the domain
+    n1p[:, 0, 0] = np.nan
+
+    output_file = tmp_path / "deposition.nc"
+    xr.Dataset(
+        data_vars={
+            "N1p": (("time", "lat", "lon"), n1p),
+            "N3n": (("time", "lat", "lon"), n3n),
+        },
+        coords={"lon": lon, "lat": lat},
+    ).to_netcdf(output_file)
+    return output_file
+
+
+def read_frames(file_path, meshmask):
+    return np.fromfile(file_path, dtype=np.float32).reshape(
+        (-1,) + meshmask.shape[1:]
+    )
+
+
+def test_time_interpolation():
+    previous, following, weight = time_interpolation(
+        np.array([10.0, 100.0, 200.0]), np.array([10.0, 55.0, 300.0, 5.0])
+    )
+    np.testing.assert_array_equal(previous, [0, 0, 2, 2])
+    np.testing.assert_array_equal(following, [1, 1, 0, 0])
+    np.testing.assert_allclose(weight, [0.0, 0.5, 100 / 175, 170 / 175])
+
+
+def test_time_interpolation_of_a_single_record():
+    previous, following, weight = time_interpolation(
+        np.array([100.0]), np.array([0.0, 200.0])
+    )
+    np.testing.assert_array_equal(previous, [0, 0])
+    np.testing.assert_array_equal(following, [0, 0])
+    np.testing.assert_array_equal(weight, [0.0, 0.0])
+
+
+def test_the_monthly_records_are_in_the_middle_of_the_months():
+    days = record_days(12)
+    assert days[0] == 15.5
+    assert days[-1] == 365 - 15.5
+    np.testing.assert_array_equal(frame_days(OutputFrequency.MONTHLY), days)
+    assert len(frame_days(OutputFrequency.DAILY)) == 365
+
+
+def test_open_gridded_source(gridded_file):
+    source = open_gridded_source(gridded_file)
+    assert source.variables == ("N1p", "N3n")
+    assert source.n_records == 12
+    assert source.source_cells.shape == (21, 21)
+    assert np.count_nonzero(~source.source_cells) == 1
+    assert not source.source_cells[0, 0]
+
+
+@pytest.mark.parametrize(
+    "method", [RegriddingMethod.BILINEAR, RegriddingMethod.CONSERVATIVE]
+)
+def test_only_the_window_used_by_the_weights_is_read(
+    meshmask, gridded_file, method
+):
+    source = open_gridded_source(gridded_file)
+    interpolator = build_regridder(meshmask, source, method)
+    window, cropped = _crop_to_used_cells(source, interpolator)
+
+    # The window covers the domain (from 12 to 18 degrees of longitude and
+    # from 38 to 44 of latitude) plus the cells around it
+    lat_window, lon_window = window
+    assert source.latitude[lat_window][0] <= 38.0
+    assert source.latitude[lat_window][-1] >= 44.0
+    assert source.longitude[lon_window][0] <= 12.0
+    assert source.longitude[lon_window][-1] >= 18.0
+    assert cropped.n_source < interpolator.n_source
+
+    for variable in source.variables:
+        records = source.read_records(variable)
+        window_records = source.read_records(variable, window)
+        assert window_records.shape == (source.n_records, cropped.n_source)
+        np.testing.assert_array_equal(
+            cropped.apply(window_records.T), interpolator.apply(records.T)
+        )
+
+
+def test_monthly_bilinear_deposition(meshmask, gridded_file, tmp_path):
+    write_gridded_surface_deposition(
+        meshmask,
+        gridded_file,
+        tmp_path,
+        NAME_MASK,
+        frequency=OutputFrequency.MONTHLY,
+    )
+
+    n1p = read_frames(tmp_path / "N1p_surface_fluxes.bin", meshmask)
+    n3n = read_frames(tmp_path / "N3n_surface_fluxes.bin", meshmask)
+    assert n1p.shape[0] == n3n.shape[0] == 12
+
+    # The land cells are regridded like the water ones
+    expected = linear_field(meshmask.xlevels, meshmask.ylevels)
+    for month in range(12):
+        np.testing.assert_allclose(
+            n1p[month], (month + 1) * expected, rtol=1e-6
+        )
+        np.testing.assert_allclose(n3n[month], (month + 1) * 1e-7, rtol=1e-6)
+
+
+def test_daily_deposition_is_interpolated_in_time(
+    meshmask, gridded_file, tmp_path
+):
+    cache = WeightsCache(tmp_path / "cache")
+    write_gridded_surface_deposition(
+        meshmask,
+        gridded_file,
+        tmp_path,
+        NAME_MASK,
+        method=RegriddingMethod.CONSERVATIVE,
+        cache=cache,
+        variables=("N3n",),
+    )
+
+    n3n = read_frames(tmp_path / "N3n_surface_fluxes.bin", meshmask)
+    assert n3n.shape[0] == 365
+    assert not (tmp_path / "N1p_surface_fluxes.bin").exists()
+
+    # The conservative regridding preserves a constant field; in time, the
+    # value grows linearly between the middle of two months and it goes
+    # back from December to January
+    months = np.interp(
+        np.arange(365) + 0.5,
+        np.concatenate(([-15.5], record_days(12), [365 + 15.5])),
+        np.concatenate(([12.0], np.arange(1.0, 13.0), [1.0])),
+    )
+    np.testing.assert_allclose(
+        n3n,
+        np.broadcast_to(months[:, None, None] * 1e-7, n3n.shape),
+        rtol=1e-6,
+    )
+
+    # The weights are now read from the cache
+    source = open_gridded_source(gridded_file, ("N3n",))
+    assert any(cache.cache_dir.iterdir())
+    cached = build_regridder(
+        meshmask, source, RegriddingMethod.CONSERVATIVE, cache
+    )
+    computed = build_regridder(meshmask, source, RegriddingMethod.CONSERVATIVE)
+    np.testing.assert_array_equal(
+        cached.weights.toarray(), computed.weights.toarray()
+    )
+
+
+def test_a_domain_outside_of_the_source_is_rejected(meshmask, tmp_path):
+    output_file = tmp_path / "small.nc"
+    lon = np.arange(13.0, 15.01, 0.5)
+    lat = np.arange(39.0, 41.01, 0.5)
+    xr.Dataset(
+        data_vars={
+            "N1p": (("time", "lat", "lon"), np.ones((1, 5, 5))),
+            "N3n": (("time", "lat", "lon"), np.ones((1, 5, 5))),
+        },
+        coords={"lon": lon, "lat": lat},
+    ).to_netcdf(output_file)
+
+    with pytest.raises(ValueError):
+        write_gridded_surface_deposition(
+            meshmask, output_file, tmp_path, NAME_MASK
+        )
@@ -0,0 +1,196 @@
+import numpy as np
+import pytest
+from scipy.interpolate import LinearNDInterpolator
+from scipy.sparse import csr_matrix
+from scipy.spatial import Delaunay
+
+from mitgcm_inputs.tools.interpolation import barycentric_interpolator
+from mitgcm_inputs.tools.interpolation import bilinear_interpolator
+from mitgcm_inputs.tools.interpolation import cell_edges
+from mitgcm_inputs.tools.interpolation import conservative_interpolator
+from mitgcm_inputs.tools.interpolation import nearest_interpolator
+from mitgcm_inputs.tools.interpolation import rectilinear_axes
+from mitgcm_inputs.tools.interpolation import replace_invalid_rows
+from mitgcm_inputs.tools.interpolation import SparseInterpolator
+
+
+def linear_field(x, y):
+    return 2.0 * x - 3.0 * y + 1.0
+
+
+def test_sparse_interpolator_fills_invalid_targets_with_nan():
+    weights = csr_matrix(np.array([[0.5, 0.5], [0.0, 0.0]]))
+    interpolator = SparseInterpolator(weights, np.array([True, False]))
+
+    output = interpolator.apply(np.array([[1.0, 2.0], [3.0, 4.0]]))
+
+    np.testing.assert_array_equal(output[0], [2.0, 3.0])
+    assert np.all(np.isnan(output[1]))
+
+
+def test_sparse_interpolator_rejects_wrong_number_of_sources():
+    interpolator = SparseInterpolator(
+        csr_matrix((3, 2)), np.ones(3, dtype=bool)
+    )
+    with pytest.raises(ValueError):
+        interpolator.apply(np.zeros(3))
+
+
+def test_barycentric_interpolator_matches_scipy():
+    rng = np.random.default_rng(0)
+    source = rng.uniform(0, 10, size=(200, 2))
+    values = np.sin(source[:, 0]) + np.cos(source[:, 1])
+    targets = rng.uniform(-1, 11, size=(300, 2))
+    triangulation = Delaunay(source)
+
+    interpolator = barycentric_interpolator(triangulation, targets)
+    expected = LinearNDInterpolator(triangulation, values)(targets)
+
+    np.testing.assert_allclose(
+        interpolator.apply(values), expected, rtol=1e-12, atol=1e-12
+    )
+    np.testing.assert_array_equal(interpolator.valid, ~np.isnan(expected))
+
+
+@pytest.mark.parametrize("descending", [False, True])
+def test_bilinear_interpolator_is_exact_on_linear_fields(descending):
+    axis_x = np.linspace(0, 10, 11)
+    axis_y = np.linspace(30, 40, 6)
+    if descending:
+        axis_y = axis_y[::-1]
+    grid_x, grid_y = np.meshgrid(axis_x, axis_y)
+    source_cells = np.ones(grid_x.shape, dtype=bool)
+
+    target_x = np.array([0.0, 2.5, 9.99, 10.0, 11.0])
+    target_y = np.array([30.0, 33.3, 39.9, 40.0, 35.0])
+    interpolator = bilinear_interpolator(
+        axis_x, axis_y, source_cells, target_x, target_y
+    )
+    output = interpolator.apply(linear_field(grid_x, grid_y).ravel())
+
+    np.testing.assert_array_equal(
+        interpolator.valid, [True, True, True, True, False]
+    )
+    np.testing.assert_allclose(
+        output[:4], linear_field(target_x, target_y)[:4], rtol=1e-12
+    )
+    assert np.isnan(output[4])
+
+
+def test_bilinear_interpolator_discards_the_missing_corners():
+    axis = np.array([0.0, 1.0])
+    source_cells = np.array([[True, False], [True, True]])
+    interpolator = bilinear_interpolator(
+        axis, axis, source_cells, np.array([0.5]), np.array([0.5])
+    )
+
+    weights = interpolator.weights.toarray()
+    assert weights.shape == (1, 3)
+    np.testing.assert_allclose(weights.sum(axis=1), 1.0)
+    np.testing.assert_allclose(weights, [[1 / 3, 1 / 3, 1 / 3]])
+
+
+def test_bilinear_interpolator_flags_targets_without_corners():
+    axis = np.array([0.0, 1.0, 2.0])
+    source_cells = np.zeros((3, 3), dtype=bool)
+    source_cells[2, 2] = True
+    interpolator = bilinear_interpolator(
+        axis, axis, source_cells, np.array([0.5, 1.5]), np.array([0.5, 1.5])
+    )
+    np.testing.assert_array_equal(interpolator.valid, [False, True])
+
+
+def test_cell_edges():
+    np.testing.assert_allclose(
+        cell_edges(np.array([0.0, 1.0, 3.0])), [-0.5, 0.5, 2.0, 4.0]
+    )
+
+
+def test_conservative_interpolator_on_the_same_grid_is_the_identity():
+    lon_edges = cell_edges(np.linspace(0, 5, 6))
+    lat_edges = cell_edges(np.linspace(40, 44, 5))
+    cells = np.ones((4, 5), dtype=bool)
+    interpolator = conservative_interpolator(
+        lon_edges, lat_edges, cells, lon_edges, lat_edges, cells
+    )
+    np.testing.assert_allclose(
+        interpolator.weights.toarray(), np.eye(20), atol=1e-12
+    )
+
+
+def test_conservative_interpolator_preserves_the_integral():
+    source_lon = cell_edges(np.linspace(0.125, 3.875, 16))
+    source_lat = cell_edges(np.linspace(40.125, 41.875, 8))
+    source_cells = np.ones((8, 16), dtype=bool)
+    target_lon = np.array([0.0, 1.0, 2.0, 3.0, 4.0])
+    target_lat = np.array([40.0, 41.0, 42.0])
+    target_cells = np.ones((2, 4), dtype=bool)
+
+    rng = np.random.default_rng(1)
+    values = rng.uniform(size=source_cells.sum())
+    interpolator = conservative_interpolator(
+        source_lon,
+        source_lat,
+        source_cells,
+        target_lon,
+        target_lat,
+        target_cells,
+    )
+    output = interpolator.apply(values)
+
+    def areas(lon_edges, lat_edges):
+        d_lon = np.diff(lon_edges)
+        d_sin = np.diff(np.sin(np.deg2rad(lat_edges)))
+        return np.outer(d_sin, d_lon).ravel()
+
+    assert np.all(interpolator.valid)
+    np.testing.assert_allclose(
+        np.sum(output * areas(target_lon, target_lat)),
+        np.sum(values * areas(source_lon, source_lat)),
+        rtol=1e-12,
+    )
+
+
+def test_conservative_interpolator_ignores_invalid_sources():
+    edges = np.array([0.0, 1.0, 2.0])
+    source_cells = np.array([[True, False], [False, False]])
+    target_cells = np.ones((1, 1), dtype=bool)
+    interpolator = conservative_interpolator(
+        edges,
+        edges,
+        source_cells,
+        np.array([0.0, 2.0]),
+        np.array([0.0, 2.0]),
+        target_cells,
+    )
+    np.testing.assert_allclose(interpolator.apply(np.array([7.0])), [7.0])
+
+
+def test_nearest_interpolator_and_replace_invalid_rows():
+    source_x = np.array([0.0, 1.0, 2.0])
+    source_y = np.zeros(3)
+    primary = SparseInterpolator(
+        csr_matrix(np.array([[1.0, 0.0, 0.0], [0.0, 0.0, 0.0]])),
+        np.array([True, False]),
+    )
+    fallback = nearest_interpolator(
+        source_x, source_y, np.array([1.8]), np.array([0.1])
+    )
+
+    combined = replace_invalid_rows(primary, fallback)
+
+    assert np.all(combined.valid)
+    np.testing.assert_array_equal(
+        combined.apply(np.array([10.0, 20.0, 30.0])), [10.0, 30.0]
+    )
+
+
+def test_rectilinear_axes():
+    x, y = np.meshgrid(np.arange(4.0), np.arange(3.0)[::-1])
+    axes = rectilinear_axes(x, y)
+    assert axes is not None
+    np.testing.assert_array_equal(axes[0], np.arange(4.0))
+    np.testing.assert_array_equal(axes[1], np.arange(3.0)[::-1])
+
+    x[1, 1] += 0.1
+    assert rectilinear_axes(x, y) is None
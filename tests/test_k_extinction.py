@@ -0,0 +1,76 @@
+import numpy as np
+import xarray as xr
+from scipy.interpolate import LinearNDInterpolator
+from scipy.spatial import Delaunay
+
+from mitgcm_inputs.k_extinction.k_extinction import write_k_extinction
+
+
+def reference_k_extinction(meshmask, climatology_file) -> np.ndarray:
+    """
+    The K extinction coefficients computed as the first version of
+    `compute_k_extinction` did: one `LinearNDInterpolator` for each day,
+    built on the triangulation of all the water cells of the climatology.
+    """
+    climatology = xr.load_dataset(climatology_file)
+    kext = climatology["kExt"].to_masked_array()
+    water_data_cells = ~np.ma.getmaskarray(kext[0])
+    triangulation = Delaunay(
+        np.column_stack(
+            (
+                climatology.longitude.values[water_data_cells],
+                climatology.latitude.values[water_data_cells],
+            )
+        )
+    )
+
+    mesh_lon = meshmask.xlevels[meshmask[0]]
+    mesh_lat = meshmask.ylevels[meshmask[0]]
+    output = np.full((kext.shape[0],) + meshmask.shape[1:], np.nan)
+    for d in range(kext.shape[0]):
+        interpolator = LinearNDInterpolator(
+            triangulation, kext.data[d, water_data_cells]
+        )
+        output[d, meshmask[0]] = interpolator(mesh_lon, mesh_lat)
+    return output.astype(np.float32)
+
+
+def test_the_default_reproduces_the_first_version(
+    meshmask, climatology_file, tmp_path
+):
+    output_file = tmp_path / "kext.bin"
+    write_k_extinction(meshmask, output_file, climatology_file)
+
+    expected = reference_k_extinction(meshmask, climatology_file)
+    output = np.fromfile(output_file, dtype=np.float32)
+    # The weights are summed in a different order, so a few values may
+    # differ in the last bit
+    np.testing.assert_allclose(
+        output.reshape(expected.shape), expected, rtol=1e-6
+    )
+
+
+def test_the_cropped_climatology_covers_the_domain(
+    meshmask, climatology_file, tmp_path
+):
+    output_file = tmp_path / "kext.bin"
+    write_k_extinction(meshmask, output_file, climatology_file, crop_margin=0)
+
+    expected = reference_k_extinction(meshmask, climatology_file)
+    output = np.fromfile(output_file, dtype=np.float32)
+    output = output.reshape(expected.shape)
+    assert np.all(np.isfinite(output[:, meshmask[0]]))
+    # Only the diagonals chosen inside some cells may change
+    np.testing.assert_allclose(output, expected, atol=0.01)
+
+
+def test_the_workers_write_the_same_file(meshmask, climatology_file, tmp_path):
+    serial_file = tmp_path / "serial.bin"
+    parallel_file = tmp_path / "parallel.bin"
+
+    write_k_extinction(meshmask, serial_file, climatology_file, workers=1)
+    write_k_extinction(meshmask, parallel_file, climatology_file, workers=3)
+
+    n_cells = meshmask.shape[1] * meshmask.shape[2]
+    assert serial_file.stat().st_size == 365 * n_cells * 4
+    assert parallel_file.read_bytes() == serial_file.read_bytes()
@@ -0,0 +1,43 @@
+import numpy as np
+import xarray as xr
+
+from mitgcm_inputs.tools.save_dataset import save_dataset
+
+
+def test_the_files_contain_the_values_converted_to_the_output_dtype(
+    tmp_path,
+):
+    rng = np.random.default_rng(0)
+    values = rng.normal(size=(4, 3, 5))
+    values[0, 0, :2] = [0.0, -0.0]
+    dataset = xr.Dataset(
+        data_vars={
+            "float64": (("day", "y", "x"), values),
+            "float32": (("day", "y", "x"), values.astype(np.float32)),
+            "transposed": (
+                ("day", "y", "x"),
+                values.transpose(0, 2, 1).copy().transpose(0, 2, 1),
+            ),
+            "broadcast": (
+                ("day", "y", "x"),
+                np.broadcast_to(np.float64(-1.5), values.shape),
+            ),
+        }
+    )
+
+    save_dataset(dataset, tmp_path, "${VAR}.bin")
+
+    for var_name in dataset.data_vars:
+        expected = dataset[var_name].values.astype(np.float32).tobytes()
+        assert (tmp_path / f"{var_name}.bin").read_bytes() == expected
+
+
+def test_the_output_dtype_can_be_changed(tmp_path):
+    values = np.arange(12, dtype=np.float32).reshape(3, 4)
+    dataset = xr.Dataset(data_vars={"v": (("y", "x"), values)})
+
+    save_dataset(dataset, tmp_path, "${VAR}.bin", output_dtype=np.float64)
+
+    assert (tmp_path / "v.bin").read_bytes() == values.astype(
+        np.float64
+    ).tobytes()
@@ -0,0 +1,116 @@
+import json
+
+import numpy as np
+import pytest
+
+from mitgcm_inputs.bottom_fluxes.bottom_fluxes import background_fields
+from mitgcm_inputs.bottom_fluxes.bottom_fluxes import BENTHIC_FLUXES
+from mitgcm_inputs.bottom_fluxes.bottom_fluxes import BenthicVar
+from mitgcm_inputs.bottom_fluxes.bottom_fluxes import depth_variability_factor
+from mitgcm_inputs.bottom_fluxes.bottom_fluxes import FLUX_PARAMETERS
+from mitgcm_inputs.bottom_fluxes.bottom_fluxes import sparse_spatial_factor
+from mitgcm_inputs.bottom_fluxes.bottom_fluxes import write_bottom_fluxes
+from mitgcm_inputs.bottom_fluxes.scenarios import batch_sparse_spatial_factors
+from mitgcm_inputs.bottom_fluxes.scenarios import read_scenarios
+from mitgcm_inputs.bottom_fluxes.scenarios import write_scenarios
+
+NAME_MASK = "${VAR}_bottom_fluxes.bin"
+
+SCENARIOS = [
+    {"name": "reference"},
+    {
+        "name": "deep_decay",
+        "benthic_fluxes": {"O": -10.0},
+        "flux_parameters": {
+            "N": {"depth_zero_flux": 100.0},
+            "P": {"exp_coeff": 2, "multiplication_factor": 1.0},
+        },
+    },
+]
+
+
+def write_json(path, content):
+    path.write_text(json.dumps(content))
+    return path
+
+
+def test_read_scenarios(tmp_path):
+    scenarios = read_scenarios(write_json(tmp_path / "s.json", SCENARIOS))
+
+    assert [s.name for s in scenarios] == ["reference", "deep_decay"]
+    reference, deep_decay = scenarios
+    assert reference.benthic_fluxes == dict(BENTHIC_FLUXES)
+    assert deep_decay.benthic_fluxes[BenthicVar.O] == -10.0 / 86400
+    assert (
+        deep_decay.benthic_fluxes[BenthicVar.N] == BENTHIC_FLUXES[BenthicVar.N]
+    )
+    for variable, parameters in FLUX_PARAMETERS.items():
+        for name, value in parameters.items():
+            assert reference.flux_parameters[variable][name] == value
+    assert deep_decay.flux_parameters[BenthicVar.N]["depth_zero_flux"] == 100
+    assert deep_decay.flux_parameters[BenthicVar.N]["depth_start_decay"] == 25
+    assert deep_decay.flux_parameters[BenthicVar.P]["exp_coeff"] == 2
+
+
+@pytest.mark.parametrize(
+    "content",
+    [
+        [],
+        [{"name": "a"}, {"name": "a"}],
+        [{"name": "a/b"}],
+        [{"name": "a", "unknown": 1}],
+        [{"name": "a", "flux_parameters": {"N": {"unknown": 1.0}}}],
+    ],
+)
+def test_read_scenarios_rejects_invalid_files(tmp_path, content):
+    with pytest.raises(ValueError):
+        read_scenarios(write_json(tmp_path / "s.json", content))
+
+
+@pytest.mark.parametrize("variable", list(BenthicVar))
+def test_batch_spatial_factors_match_each_scenario(
+    meshmask, tmp_path, variable
+):
+    scenarios = read_scenarios(write_json(tmp_path / "s.json", SCENARIOS))
+    depth = meshmask.bathymetry()
+    backgrounds = background_fields(meshmask)
+
+    fields = batch_sparse_spatial_factors(
+        scenarios, variable, meshmask[0], depth, backgrounds
+    )
+
+    assert len(fields) == len(scenarios)
+    reference = sparse_spatial_factor(meshmask, variable, depth, backgrounds)
+    np.testing.assert_array_equal(fields[0].indices, reference.indices)
+    np.testing.assert_array_equal(fields[0].values, reference.values)
+
+    # The other scenario, computed on all the water cells
+    scenario = scenarios[1]
+    water_cells = np.flatnonzero(meshmask[0])
+    expected = depth_variability_factor(
+        depth.reshape(-1)[water_cells],
+        variable,
+        benthic_flux=scenario.benthic_fluxes[variable],
+        **scenario.flux_parameters[variable],
+    ).astype(np.float32)
+    active = expected != 0
+    np.testing.assert_array_equal(fields[1].indices, water_cells[active])
+    np.testing.assert_array_equal(fields[1].values, expected[active])
+
+
+def test_the_reference_scenario_writes_the_default_files(meshmask, tmp_path):
+    scenarios = read_scenarios(write_json(tmp_path / "s.json", SCENARIOS))
+    write_scenarios(meshmask, scenarios, tmp_path, NAME_MASK)
+    default_dir = tmp_path / "default"
+    default_dir.mkdir()
+    write_bottom_fluxes(meshmask, default_dir, NAME_MASK)
+
+    for variable in BenthicVar:
+        file_name = NAME_MASK.replace("${VAR}", variable)
+        assert (tmp_path / "reference" / file_name).read_bytes() == (
+            default_dir / file_name
+        ).read_bytes()
+    n_file = NAME_MASK.replace("${VAR}", BenthicVar.N)
+    assert (tmp_path / "deep_decay" / n_file).read_bytes() != (
+        default_dir / n_file
+    ).read_bytes()
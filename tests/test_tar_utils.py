@@ -0,0 +1,60 @@
+import gzip
+import tarfile
+
+import numpy as np
+import pytest
+
+from mitgcm_inputs.tools.tar_utils import add_stream_member
+from mitgcm_inputs.tools.tar_utils import open_tar_writer
+from mitgcm_inputs.tools.tar_utils import ParallelGzipWriter
+from mitgcm_inputs.tools.tar_utils import StreamMember
+
+
+def test_parallel_gzip_writer_is_a_valid_gzip_file(tmp_path):
+    rng = np.random.default_rng(0)
+    content = rng.integers(0, 4, size=100_000, dtype=np.uint8).tobytes()
+    output_file = tmp_path / "data.gz"
+
+    with ParallelGzipWriter(output_file, workers=3, block_size=4096) as f:
+        # Writes that are not aligned with the blocks
+        for start in range(0, len(content), 1000):
+            f.write(content[slice(start, start + 1000)])
+        assert f.tell() == len(content)
+
+    assert gzip.decompress(output_file.read_bytes()) == content
+
+
+def test_parallel_gzip_writer_of_an_empty_file(tmp_path):
+    output_file = tmp_path / "empty.gz"
+    with ParallelGzipWriter(output_file):
+        pass
+    assert gzip.decompress(output_file.read_bytes()) == b""
+
+
+@pytest.mark.parametrize("compress", [True, False])
+def test_stream_members_round_trip(tmp_path, compress):
+    days = np.arange(5 * 12, dtype=np.float32).reshape(5, 3, 4)
+    members = [
+        StreamMember("days.bin", days.nbytes, iter(days)),
+        StreamMember("text.txt", 5, [b"he", memoryview(b"llo")]),
+        StreamMember("empty.bin", 0, []),
+    ]
+    output_file = tmp_path / "archive.tar.gz"
+
+    with open_tar_writer(output_file, compress=compress) as tar:
+        for member in members:
+            add_stream_member(tar, member, arcname=f"archive/{member.name}")
+
+    with tarfile.open(output_file) as tar:
+        assert tar.getnames() == [f"archive/{m.name}" for m in members]
+        assert tar.extractfile("archive/days.bin").read() == days.tobytes()
+        assert tar.extractfile("archive/text.txt").read() == b"hello"
+        assert tar.extractfile("archive/empty.bin").read() == b""
+
+
+@pytest.mark.parametrize("size", [3, 7])
+def test_stream_member_with_a_wrong_size(tmp_path, size):
+    member = StreamMember("wrong.bin", size, [b"abcde"])
+    with pytest.raises(ValueError):
+        with open_tar_writer(tmp_path / "archive.tar.gz") as tar:
+            add_stream_member(tar, member)
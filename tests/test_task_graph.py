@@ -0,0 +1,59 @@
+import threading
+
+import pytest
+
+from mitgcm_inputs.tools.task_graph import run_task_graph
+from mitgcm_inputs.tools.task_graph import Task
+
+
+def test_tasks_receive_the_results_of_their_dependencies():
+    tasks = [
+        Task("sum", lambda a, b: a + b, ("a", "b")),
+        Task("a", lambda: 1),
+        Task("b", lambda a: a + 10, ("a",)),
+        Task("double", lambda s: 2 * s, ("sum",)),
+    ]
+    results, reports = run_task_graph(tasks, max_workers=2)
+
+    assert results == {"a": 1, "b": 11, "sum": 12, "double": 24}
+    for task in tasks:
+        for dependency in task.dependencies:
+            assert (
+                reports[dependency].end_time <= reports[task.name].start_time
+            )
+
+
+def test_independent_tasks_run_at_the_same_time():
+    # Each task waits until the other one has started: with a single
+    # thread, this would never happen
+    barrier = threading.Barrier(2, timeout=10)
+    tasks = [Task("a", barrier.wait), Task("b", barrier.wait)]
+    results, _ = run_task_graph(tasks, max_workers=2)
+    assert set(results) == {"a", "b"}
+
+
+def test_a_failure_stops_the_dependent_tasks():
+    executed = []
+
+    def fail():
+        raise RuntimeError("failure")
+
+    tasks = [
+        Task("fail", fail),
+        Task("after", lambda _: executed.append("after"), ("fail",)),
+    ]
+    with pytest.raises(RuntimeError, match="failure"):
+        run_task_graph(tasks, max_workers=2)
+    assert executed == []
+
+
+@pytest.mark.parametrize(
+    "tasks",
+    [
+        [Task("a", lambda b: b, ("b",)), Task("b", lambda a: a, ("a",))],
+        [Task("a", lambda c: c, ("c",))],
+    ],
+)
+def test_invalid_graphs(tasks):
+    with pytest.raises(ValueError):
+        run_task_graph(tasks)
@@ -0,0 +1,82 @@
+import os
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from mitgcm_inputs.tools.interpolation import SparseInterpolator
+from mitgcm_inputs.tools.weights_cache import fingerprint_arrays
+from mitgcm_inputs.tools.weights_cache import WeightsCache
+
+
+def build_interpolator():
+    weights = csr_matrix(np.array([[0.25, 0.75, 0.0], [0.0, 0.0, 0.0]]))
+    return SparseInterpolator(weights, np.array([True, False]))
+
+
+def test_fingerprint_depends_on_dtype_and_shape():
+    values = np.arange(6, dtype=np.int32)
+    assert fingerprint_arrays(values) == fingerprint_arrays(values.copy())
+    assert fingerprint_arrays(values) != fingerprint_arrays(
+        values.reshape(2, 3)
+    )
+    assert fingerprint_arrays(values) != fingerprint_arrays(
+        values.view(np.float32)
+    )
+
+
+def test_interpolator_round_trip(tmp_path):
+    cache = WeightsCache(tmp_path / "cache")
+    interpolator = build_interpolator()
+
+    assert cache.get_interpolator("weights") is None
+    cache.put_interpolator("weights", interpolator)
+    restored = cache.get_interpolator("weights")
+
+    assert restored is not None
+    np.testing.assert_array_equal(
+        restored.weights.toarray(), interpolator.weights.toarray()
+    )
+    np.testing.assert_array_equal(restored.valid, interpolator.valid)
+
+
+def test_object_round_trip(tmp_path):
+    cache = WeightsCache(tmp_path)
+    obj = {"points": np.arange(5.0), "name": "triangulation"}
+
+    assert cache.get_object("obj") is None
+    cache.put_object("obj", obj)
+    restored = cache.get_object("obj")
+
+    assert restored["name"] == obj["name"]
+    np.testing.assert_array_equal(restored["points"], obj["points"])
+
+
+def test_unreadable_entries_are_misses(tmp_path):
+    cache = WeightsCache(tmp_path)
+    (tmp_path / "weights.npz").write_bytes(b"not a npz file")
+    (tmp_path / "obj.pickle").write_bytes(b"not a pickle")
+
+    assert cache.get_interpolator("weights") is None
+    assert cache.get_object("obj") is None
+    assert not (tmp_path / "weights.npz").exists()
+    assert not (tmp_path / "obj.pickle").exists()
+
+
+def test_eviction_removes_the_least_recently_used_files(tmp_path):
+    payload = np.zeros(1000, dtype=np.uint8)
+    cache = WeightsCache(tmp_path, max_size=2500)
+    cache.put_object("first", payload)
+    cache.put_object("second", payload)
+
+    # The first entry is the oldest one, but reading it makes it the most
+    # recently used
+    first_path = tmp_path / "first.pickle"
+    os.utime(first_path, ns=(1, 1))
+    os.utime(tmp_path / "second.pickle", ns=(2, 2))
+    assert cache.get_object("first") is not None
+
+    cache.put_object("third", payload)
+
+    assert first_path.exists()
+    assert not (tmp_path / "second.pickle").exists()
+    assert (tmp_path / "third.pickle").exists()